@@ -2,16 +2,34 @@ from flask import Flask, Response, stream_with_context, jsonify, request
 from flask_cors import CORS
 import json
 import time
+import threading
 import datetime 
-import joblib
 import numpy as np
-import pandas as pd
 import logging
-from twilio.rest import Client
 import os
 from dotenv import load_dotenv
+from broadcaster import Hub, POLICIES, DROP_OLDEST, with_id, parse_event_id, count_event
+from frames import FrameCoalescer
+from batch_inference import BatchPredictor
+from model_registry import ModelRegistry, MODEL_DIR
+from prediction_cache import PredictionCache
+from registry import Registry
+from zones import get_zone_company, classify_zones
+from failure_reasons import infer_failure_reason
+from geofence import load_geofences, GEOFENCE_FILE
+from columnar_cache import open_records
+from ingest import RingBuffer, LiveConsumer, UdpListener, RTLS_UDP_PORT, parse_ndjson
+from feature_engine import FeatureEngine
+from replay import ReplayScheduler, parse_speed, record_time, REPLAY_MAX_GAP
+from serialization import dumps, sse_event, utc_timestamp, Fragments
+import log_pipeline
+import metrics
+import notifications
+from metrics import Histogram, Gauge, file_load_seconds
 
 app = Flask(__name__)
+# Process start for /health/live (import time of the app module)
+STARTED = time.monotonic()
 CORS(app, resources={r"/*": {"origins": ["http://localhost:3000", "http://localhost:5173"]}})
 
 
@@ -22,22 +40,30 @@ TWILIO_ACCOUNT_SID = os.environ.get("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = os.environ.get("TWILIO_AUTH_TOKEN")
 TWILIO_PHONE_NUMBER = os.environ.get("TWILIO_PHONE_NUMBER")
 
-twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+def twilio_transport():
+    # twilio is only imported (and a Client built) when NOTIFY_TRANSPORT is twilio
+    from twilio.rest import Client
+    return notifications.TwilioTransport(Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN), TWILIO_PHONE_NUMBER)
+
+
+# SMS alerts go through the notifier's queue and workers, never from the stream itself.
+# NOTIFY_TRANSPORT: "twilio" (default when credentials are set), "log" or "stub"
+notifications.register_transport("twilio", twilio_transport)
+NOTIFY_TRANSPORT = os.environ.get("NOTIFY_TRANSPORT", "twilio" if TWILIO_ACCOUNT_SID else "log")
+notifier = notifications.Dispatcher(notifications.make_transport(NOTIFY_TRANSPORT))
+# Comma-separated numbers; employees with a "phone_number" also get their own zone alerts
+SECURITY_ALERT_TO = [number for number in os.environ.get("SECURITY_ALERT_TO", "").split(",") if number]
+MAINTENANCE_ALERT_TO = [number for number in os.environ.get("MAINTENANCE_ALERT_TO", "").split(",") if number]
+
+# Configure logging: queued output, LOG_LEVEL (default INFO) changeable at runtime via /log/level
+log_pipeline.setup_logging()
 logger = logging.getLogger(__name__)
+# Per-event trace lines (DEBUG, sampled + rate limited) and alerts (rate limited)
+event_log = log_pipeline.event_logger("stream.events")
+alert_log = log_pipeline.rate_limited_logger("stream.alerts")
+unknown_devices = log_pipeline.WarningAggregator(logger)
 
-# Load the pre-trained ML model for RUL prediction
-try:
-    rul_model = joblib.load("../model/xgboost_model.pkl")
-    logger.info("Model loaded successfully: %s", rul_model)
-except FileNotFoundError:
-    logger.error("RUL model file not found at ../model/xgboost_model.pkl")
-    rul_model = None
-except Exception as e:
-    logger.error("Error loading model: %s", e)
-    rul_model = None
 RUL_THRESHOLD = 24
 
 BREAKDOWN_THRESHOLD = 5
@@ -58,12 +84,18 @@ MACHINE_INFO = [{"machine_id": 49, "mac_address": "28:3a:4d:31:a1:8d", "lat": "5
 
 
 
-employee_table = [{"name": "Tim", "company": "Apple", "role": "mechanic", "floor": "Ground Floor", "mac_address": "14:c2:13:93:ea:6b"},
-                   {"name": "Nick", "company": "Samsung", "role": "mechanic", "floor": "Ground Floor", "mac_address": "44:80:eb:82:3d:b3"},
-                   {"name": "Sanjana",  "company": "Nvidia", "role": "mechanic", "floor": "Ground Floor", "mac_address": "54:99:63:92:d0:f8"},
-                   {"name": "Aaryan", "company": "Apple", "role": "mechanic", "floor": "Ground Floor", "mac_address": "00:b3:62:2a:87:01"},
-                   {"name": "Sib", "company": "Samsung", "role": "mechanic", "floor": "Ground Floor", "mac_address": "f0:18:98:0a:01:a0"},
-                   {"name": "Charles",  "company": "Nvidia", "role": "mechanic", "floor": "Ground Floor", "mac_address": "20:ee:28:e1:8a:a7"}]
+EMPLOYEE_DATA_FILE = "../data/employee_table.json"
+
+# Employees and machines indexed by MAC / machine_id, reloaded when EMPLOYEE_DATA_FILE changes
+registry = Registry(EMPLOYEE_DATA_FILE, MACHINE_INFO)
+registry.watch()
+
+# Polygon zones per floor; falls back to the NVIDIA_LNG / APPLE_LAT thresholds in zones.py
+with file_load_seconds.labels(os.path.basename(GEOFENCE_FILE)).time():
+    geofences = load_geofences(GEOFENCE_FILE)
+
+# rtls_events() marker for "zone not classified yet"
+_UNCLASSIFIED = object()
 
 # employee_table = [{"name": "Tim","company": "Apple", "role": "staff", "floor": "ground", "mac_address": "9c:da:3e:7f:8e:24"},
 #                    {"name": "Nick","company": "Samsung", "role": "mechanic", "floor": "ground", "mac_address": "88:66:a5:14:63:be"},
@@ -80,226 +112,610 @@ features_col = ['time_in_cycles', 'voltmean_24h', 'rotatemean_24h', 'pressuremea
  'vibrationsd_5d', 'error1', 'error2', 'error3', 'error4', 'error5', 'comp1',
  'comp2', 'comp3', 'comp4', 'age', 'model_encoded', 'DI']
 
-NVIDIA_LNG = -0.9328
-APPLE_LAT = 51.46051109286201
-
+# RUL model versions in MODEL_DIR: loaded, checked against features_col and swapped in
+# by a watcher thread, scored with RUL_PREDICTOR (model_registry.py, tree_predictor.py).
+# The first load also happens in that thread, so importing the app does not wait for it.
+model_registry = ModelRegistry(MODEL_DIR, features_col)
+model_registry.watch()
+
+# Rolling features from raw telemetry posted to /ingest/telemetry
+telemetry = FeatureEngine(features_col)
+
+# Rows from all machine streams are scored together in small batches
+rul_batcher = BatchPredictor(model_registry, features_col)
+# Replayed rows are served from here instead of being re-predicted, until the model changes
+rul_cache = PredictionCache(features_col)
+model_registry.on_activate.append(lambda version: rul_cache.clear())
+
+# Hot-path instrumentation for /metrics; children are resolved once here
+rul_predict_seconds = Histogram("rul_predict_seconds", "RUL lookup latency per machine row", ("path",))
+rul_predict_cached = rul_predict_seconds.labels("cache")
+rul_predict_model = rul_predict_seconds.labels("model")
+zone_check_seconds = Histogram("zone_check_seconds", "Zone classification latency per RTLS batch").labels()
+zone_check_rows = metrics.Counter("zone_check_rows_total", "RTLS rows zone-classified").labels()
+machine_streams = Gauge("machine_streams", "Open /stream/machine connections").labels()
+Gauge("rul_cache_lookups_total", "RUL prediction cache lookups by result",
+      lambda: {("hit",): rul_cache.hits, ("miss",): rul_cache.misses}, ("result",), kind="counter")
+Gauge("rul_cache_hit_ratio", "RUL prediction cache hit ratio since start", lambda: rul_cache.stats()["hit_ratio"])
+Gauge("rul_cache_entries", "RUL prediction cache size", lambda: rul_cache.stats()["size"])
+Gauge("rul_model_loaded", "1 while a RUL model is active", lambda: int(model_registry.active is not None))
+
+RTLS_DATA_FILE = os.environ.get("RTLS_DATA_FILE", "../data/rtls_2.json")
+MACHINE_DATA_FILE = os.environ.get("MACHINE_DATA_FILE", "../data/filtered_sample_rul.json")
+
+# One pass over a data file is spread over this many seconds
+REPLAY_DURATION = 180
+# RTLS rows are parsed and zone-classified in batches of this size
+RTLS_BATCH_SIZE = 256
+
+# Per-client SSE queue bound and what to do when a client falls behind
+SSE_QUEUE_SIZE = int(os.environ.get("SSE_QUEUE_SIZE", 256))
+SSE_SLOW_CONSUMER_POLICY = os.environ.get("SSE_SLOW_CONSUMER_POLICY", DROP_OLDEST)
+# ?mode=compact: coalesced delta frames (frames.py) instead of one full update per row
+STREAM_MODES = ("full", "compact")
+
+
+def locate_zone(row):
+    """Company whose zone contains the row's position, None if outside every zone."""
+    if geofences:
+        return geofences.locate_company(row.get("level") or row.get("Level"), row.get("lat"), row.get("lng"))
+    return get_zone_company(row.get("lat"), row.get("lng"))
+
+
+# Static payload members, encoded once per registry record (see serialization.Fragments)
+employee_fragments = Fragments()
+machine_fragments = Fragments()
+
+
+def employee_members(employee):
+    return {
+        "mac_address": employee["mac_address"],
+        "name": employee["name"],
+        "company": employee["company"],
+        "role": employee["role"],
+        "floor": employee["floor"],
+    }
+
+
+def machine_members(machine):
+    return {
+        "machine_id": machine["machine_id"],
+        "mac_address": machine["mac_address"],
+        "name": machine["name"],
+        "company": machine["company"],
+        "floor": machine["floor"],
+        "location": [float(machine["lat"]), float(machine["lng"])],
+    }
+
+
+def rtls_events(row, zone_company=_UNCLASSIFIED, frames=None, notify=True):
+    """
+    Turn one RTLS record into a list of (key, sse_message) to publish.
+    zone_company can be passed in when it was classified in a batch. The
+    update payload is also offered to frames (the hub's FrameCoalescer).
+    With notify=False no SMS is queued, for rows whose alerts were already
+    raised elsewhere (see zone_alerts).
+    """
+    mac = row.get("ClientMacAddr")
+    location = [row.get("lat"), row.get("lng")]
+
+    employee = registry.employee(mac)
+    if not employee:
+        unknown_devices.warning(mac, "No employee info found for mac_address %s", mac)
+        return []
+
+    events = []
+    timestamp = utc_timestamp()
+
+    # Zone violation check
+    if zone_company is _UNCLASSIFIED:
+        zone_company = locate_zone(row)
+    violation = zone_company is not None and employee["company"] != zone_company
+    if violation:
+        violation_payload = {
+            **employee_members(employee),
+            "location": location,
+            "timestamp": timestamp,
+            "type": "zone_violation",
+            "zone_company": zone_company,
+            "message": f"{employee['name']} ({employee['company']}) entered restricted zone ({zone_company})"
+        }
+
+        # 1. FIRST publish the violation to frontend (never coalesced away; compact clients get it in frames)
+        events.append((None, sse_event("zone_violation", violation_payload)))
+
+        # 2. THEN queue the SMS (deduplicated per employee and zone, sent in the background)
+        if notify:
+            notify_zone_violation(employee, mac, zone_company, location)
+
+    # Always publish the update, keyed by MAC so slow clients can coalesce
+    event_log.debug("Streaming for MAC %s: location=%s", mac, location)
+    prefix = employee_fragments.get(mac, employee, employee_members)
+    events.append((mac, f'event: update\ndata: {prefix}"location":{dumps(location)},"timestamp":"{timestamp}"}}\n\n'))
+    if frames is not None:
+        frames.offer(mac, {**employee, "location": location, "zone_violation": zone_company if violation else None})
+    return events
+
+
+def notify_zone_violation(employee, mac, zone_company, location):
+    for recipient in filter(None, (employee.get("phone_number"), *SECURITY_ALERT_TO)):
+        notifier.notify(recipient, ("zone", mac, zone_company),
+                        f"SECURITY ALERT: {employee['name']} entered {zone_company} zone at {location}")
+
+
+def zone_alerts(row, zone_company):
+    """Only the SMS part of rtls_events, for a row whose events are published by another path."""
+    mac = row.get("ClientMacAddr")
+    employee = registry.employee(mac)
+    if employee and zone_company is not None and employee["company"] != zone_company:
+        notify_zone_violation(employee, mac, zone_company, [row.get("lat"), row.get("lng")])
+
+
+def open_rtls_data():
+    """Returns (reader, error_message). error_message is an SSE error event or None."""
+    try:
+        return open_records(RTLS_DATA_FILE), None
+    except FileNotFoundError:
+        logger.error("%s not found", RTLS_DATA_FILE)
+        return None, "event: error\ndata: {'message': 'rtls_2.json not found'}\n\n"
+
+
+def rtls_zones(data):
+    """Zone company of every RTLS row, classified in one vectorized pass."""
+    start = time.perf_counter()
+    lat = [row.get("lat") for row in data]
+    lng = [row.get("lng") for row in data]
+    zones = classify_zones([row.get("level") or row.get("Level") for row in data], lat, lng, geofences)
+    zone_check_seconds.observe(time.perf_counter() - start)
+    zone_check_rows.inc(len(data))
+    return zones
+
+
+def paced_time(reader, offset):
+    # Position in the file mapped onto REPLAY_DURATION, so the record count isn't needed up front
+    return REPLAY_DURATION * offset / max(reader.size, 1)
+
+
+def rtls_replay(reader, speed=None):
+    """
+    Yields (row, zone_company, delay) while the file is being parsed. Without
+    a speed the file is spread evenly over REPLAY_DURATION; with one, rows
+    follow their recorded times scaled by speed. Zones are classified per
+    batch of RTLS_BATCH_SIZE rows.
+    """
+    scheduler = ReplayScheduler(speed or 1.0, max_gap=REPLAY_MAX_GAP if speed else float("inf"))
+    for batch in reader.batches(RTLS_BATCH_SIZE):
+        zones = rtls_zones([row for row, _ in batch])
+        for (row, offset), zone_company in zip(batch, zones):
+            recorded = record_time(row) if speed else paced_time(reader, offset)
+            yield row, zone_company, scheduler.delay(recorded)
+
+
+def rtls_ingest(hub, speed=None):
+    # Single replay loop shared by every /stream/rtls client at this speed
+    while hub.active:
+        reader, error = open_rtls_data()
+        if error:
+            hub.publish(None, error, compact=True)
+            hub.finish()
+            return
+        try:
+            with reader:
+                for row, zone_company, sleep_time in rtls_replay(reader, speed):
+                    if not hub.active:
+                        return
+                    time.sleep(sleep_time)
+                    for key, message in rtls_events(row, zone_company, hub.frames):
+                        hub.publish(key, message)
+        except json.JSONDecodeError:
+            logger.error("Invalid JSON in %s", RTLS_DATA_FILE)
+            hub.publish(None, "event: error\ndata: {'message': 'Invalid JSON in rtls_2.json'}\n\n", compact=True)
+            hub.finish()
+            return
+
+
+# One hub per replay speed, clients asking for the same speed share a replay loop
+rtls_hubs = {}
+_rtls_hubs_lock = threading.Lock()
+
+
+def rtls_hub_for(speed):
+    with _rtls_hubs_lock:
+        hub = rtls_hubs.get(speed)
+        if hub is None:
+            hub = Hub(f"rtls@{speed or 'default'}", lambda hub: rtls_ingest(hub, speed),
+                      maxsize=SSE_QUEUE_SIZE, policy=SSE_SLOW_CONSUMER_POLICY, frames=FrameCoalescer())
+            rtls_hubs[speed] = hub
+        return hub
+
+
+# Live updates pushed to /ingest/rtls (or UDP) share the zone check and fan-out with the replay
+live_buffer = RingBuffer()
+live_hub = Hub("rtls-live", None, maxsize=SSE_QUEUE_SIZE, policy=SSE_SLOW_CONSUMER_POLICY,
+               frames=FrameCoalescer())
+live_consumer = None
+udp_listener = None
+_live_lock = threading.Lock()
+
+
+def live_events(rows, frames=None):
+    zones = rtls_zones(rows)
+    return [event for row, zone_company in zip(rows, zones) for event in rtls_events(row, zone_company, frames)]
+
+
+def ensure_live_ingest():
+    global live_consumer, udp_listener
+    with _live_lock:
+        if live_consumer is None:
+            live_consumer = LiveConsumer(live_buffer, lambda rows: live_events(rows, live_hub.frames), live_hub.publish)
+        if udp_listener is None and RTLS_UDP_PORT:
+            udp_listener = UdpListener(live_buffer, RTLS_UDP_PORT)
+
+
+@app.route("/ingest/rtls", methods=["POST"])
+def ingest_rtls():
+    # Body: NDJSON, one RTLS record per line (same fields as rtls.json)
+    ensure_live_ingest()
+    body = live_buffer.offer_ndjson(request.get_data())
+    if body["rejected"]:
+        # Buffer full: the client should resend the rejected tail later
+        return jsonify(body), 429, {"Retry-After": "1"}
+    return jsonify(body), 202
+
+
+@app.route("/ingest/telemetry", methods=["POST"])
+def ingest_telemetry():
+    # Body: NDJSON telemetry / error / state records (see feature_engine.FeatureEngine.add_rows)
+    rows, invalid = parse_ndjson(request.get_data())
+    body = telemetry.add_rows(rows)
+    body["invalid"] += invalid
+    return jsonify(body), 202
+
+
+def telemetry_features(machine_id=None):
+    """Current features and predicted RUL per machine (one machine with machine_id)."""
+    machine_ids = [int(machine_id)] if machine_id is not None else list(telemetry.machines)
+    machines = {}
+    for machine_id in machine_ids:
+        row = telemetry.row(machine_id)
+        if row is None:
+            continue
+        rul = predict_rul(row, model_registry, features_col) if model_registry.active is not None else None
+        # Windows without enough readings yet are NaN for the model, null in JSON
+        machines[machine_id] = {**{col: None if value != value else value for col, value in row.items()},
+                                "rul": float(rul) if rul is not None else None}
+    return {"machines": machines, "stats": telemetry.stats()}
+
+
+@app.route("/telemetry/features", methods=["GET"])
+def get_telemetry_features():
+    try:
+        return jsonify(telemetry_features(request.args.get("machineID")))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid machineID: {e}"}), 400
+
+
+@app.route("/ingest/stats", methods=["GET"])
+def get_ingest_stats():
+    return jsonify({**live_buffer.stats(), "published": live_hub.published, "subscribers": live_hub.subscriber_count(),
+                    "frames": live_hub.frames.stats()})
 
-def get_zone_company(lat, lng):
-    if lng < NVIDIA_LNG:
-        return "Nvidia"
-    if lat > APPLE_LAT:
-        return "Apple"
-    return "Samsung"
 
 @app.route("/stream/rtls")
 def stream():
+    # ?policy=drop_oldest|coalesce picks how this client's queue handles falling behind
+    # ?speed=10 replays at 10x the recorded times, ?speed=max as fast as possible
+    # ?mode=compact sends a snapshot, then delta frames at FRAME_RATE
+    policy = request.args.get("policy", SSE_SLOW_CONSUMER_POLICY)
+    if policy not in POLICIES:
+        return jsonify({"error": f"Unknown policy {policy}, expected one of {list(POLICIES)}"}), 400
+    mode = request.args.get("mode", "full")
+    if mode not in STREAM_MODES:
+        return jsonify({"error": f"Unknown mode {mode}, expected one of {list(STREAM_MODES)}"}), 400
+    compact = mode == "compact"
+    # Reconnecting clients resume after Last-Event-ID (?lastEventId= for clients that cannot set headers)
+    last_event_id = parse_event_id(request.headers.get("Last-Event-ID") or request.args.get("lastEventId"))
+    try:
+        speed = parse_speed(request.args.get("speed"))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid speed: {e}"}), 400
+
+    # ?source=live follows /ingest/rtls instead of replaying the file
+    if request.args.get("source") == "live":
+        ensure_live_ingest()
+        subscription = live_hub.subscribe(policy=policy, compact=compact, last_event_id=last_event_id)
+    else:
+        subscription = rtls_hub_for(speed).subscribe(policy=policy, compact=compact, last_event_id=last_event_id)
+
     def event_stream():
-        try: 
-            with open("../data/rtls_2.json", "r") as file:
-                data = json.load(file)
-                total_records = len(data)
-                duration = 180
-                sleep_time = duration / total_records
-                
-                for row in data:
-                    time.sleep(sleep_time)
-                    mac = row.get("ClientMacAddr")
-                    location = [row.get("lat"), row.get("lng")]
-
-                    employee = next((e for e in employee_table if e["mac_address"] == mac), None)
-                    if not employee:
-                        logger.warning("No employee info found for mac_address %s", mac)
-                        continue
-
-                    # Standard payload
-                    base_payload = {
-                        "mac_address": mac,
-                        "name": employee["name"],
-                        "company": employee["company"],
-                        "role": employee["role"],
-                        "floor": employee["floor"],
-                        "location": location,
-                        "timestamp": datetime.datetime.utcnow().isoformat()
-                    }
-
-                    # Zone violation check
-                    zone_company = get_zone_company(location[0], location[1])
-                    if employee["company"] != zone_company:
-                        violation_payload = {
-                            **base_payload,
-                            "type": "zone_violation",
-                            "zone_company": zone_company,
-                            "message": f"{employee['name']} ({employee['company']}) entered restricted zone ({zone_company})"
-                        }
-                        
-                        # 1. FIRST yield the violation to frontend
-                        yield f"event: zone_violation\ndata: {json.dumps(violation_payload)}\n\n"
-                        
-                        # 2. THEN try sending SMS (non-blocking)
-                        # try:
-                        #     if "phone_number" in employee and employee["phone_number"]:
-                        #         phone_message = twilio_client.messages.create(
-                        #             body=f"SECURITY ALERT: {employee['name']} entered {zone_company} zone at {location}",
-                        #             from_=TWILIO_PHONE_NUMBER,
-                        #             to=employee["phone_number"]
-                        #         )
-                        #         logger.info(f"SMS sent to {employee['phone_number']}: {phone_message.sid}")
-                        #     else:
-                        #         logger.warning("No phone number for employee: %s", employee["name"])
-                        # except Exception as sms_error:
-                        #     logger.error(f"SMS failed for {employee['name']}: {sms_error}")
-                        #     # Continue stream even if SMS fails
-
-                    # Always yield the update
-                    print(f"Streaming for MAC {mac}: location={location}")
-                    yield f"event: update\ndata: {json.dumps(base_payload)}\n\n"
-
-        except FileNotFoundError:
-            logger.error("sample_data.json not found")
-            yield f"event: error\ndata: {{'message': 'sample_data.json not found'}}\n\n"
-        except json.JSONDecodeError:
-            logger.error("Invalid JSON in sample_data.json")
-            yield f"event: error\ndata: {{'message': 'Invalid JSON in sample_data.json'}}\n\n"
+        try:
+            for message in subscription:
+                yield message
         except Exception as e:
             logger.error("RTLS stream error: %s", e)
             yield f"event: error\ndata: {{'message': 'RTLS stream error'}}\n\n"
+        finally:
+            subscription.close()
 
     return Response(stream_with_context(event_stream()), mimetype="text/event-stream")
 
 
+def predict_rul(data, model, features_col):
+    try:
+        input_array = np.array([[data[col] for col in features_col]])
+        predicted_rul = model.predict(input_array)[0]
+        return max(predicted_rul, 0)
+    except Exception as e:
+        logger.error("RUL prediction error: %s", e)
+        return None
+
+
+def score_row(row):
+    start = time.perf_counter()
+    cache_key = rul_cache.key(row)
+    generation = rul_cache.generation
+    rul = rul_cache.get(cache_key)
+    if rul is not None:
+        rul_predict_cached.observe(time.perf_counter() - start)
+        return rul
+    rul = rul_batcher.predict(row)
+    if rul is not None:
+        rul_cache.put(cache_key, rul, generation)
+    rul_predict_model.observe(time.perf_counter() - start)
+    return rul
+
+
+def determine_priority_level(machine_name, status):
+    if (machine_name == "Lithography Systems" or "Lithography System-2") or (status == "breakdown"):
+        return "High"
+    elif (machine_name == "Clean Room Equipment") or (status == "warning"):
+        return "Medium"
+    return "Low"  # Default for other machines
+
+
+def machine_events(row, rul=None):
+    """
+    Turn one RUL record into a list of sse_message strings. rul can be passed
+    in when the caller already scored the row, otherwise it is predicted here.
+    """
+    machine_id = row.get("machineID")
+
+    if not machine_id:
+        logger.warning("Missing machine_id in sample_rul.json row: %s", row)
+        return []
+
+    machine = registry.machine(machine_id)
+    if not machine:
+        unknown_devices.warning(("machine", machine_id), "No machine found for machine_id %s", machine_id)
+        return []
+
+    events = []
+    status = "Good"
+    maintenance_alert = False
+    if rul is None and model_registry.active is not None and all(col in row for col in features_col):
+        rul = score_row(row)
+    if rul is not None:
+        if rul <= BREAKDOWN_THRESHOLD:
+            status = "Breakdown"
+            maintenance_alert = True
+        elif rul < RUL_THRESHOLD:
+            status = "Warning"
+            maintenance_alert = True
+        else:
+            status = "Good"
+
+    # Machine status payload: static members pre-encoded, then rul/status/timestamp
+    rul_value = float(rul) if rul is not None else None
+    timestamp = utc_timestamp()
+    latest_machines[machine_id] = (machine, rul_value, status, timestamp)
+    event_log.debug("Machine log: %s rul=%s status=%s", machine_id, rul_value, status)
+    prefix = machine_fragments.get(machine_id, machine, machine_members)
+    events.append(f'event: machine\ndata: {prefix}"rul":{dumps(rul_value)},"status":"{status}","timestamp":"{timestamp}"}}\n\n')
+
+    # Maintenance alert
+    if maintenance_alert:
+        reason_to_failure = infer_failure_reason(row)
+        maintenance_payload = {
+            "type": "maintenance",
+            "name": machine["name"],
+            "company": machine["company"],
+            "rul": rul_value,
+            "status": status,
+            "floor": machine["floor"],
+            "location": [float(machine["lat"]), float(machine["lng"])],
+            "message": f"Maintenance required: {status} (RUL {rul:.2f} hours)",
+            "timestamp": timestamp,
+            "predicted_failure_time": (datetime.datetime.utcnow() + datetime.timedelta(hours=float(rul))).isoformat(),
+            "reason_to_failure": reason_to_failure,
+            "priority": determine_priority_level(machine["name"], status),
+            "mac_address": machine["mac_address"]
+        }
+        alert_log.info("Maintenance notification: %s", maintenance_payload)
+        for recipient in MAINTENANCE_ALERT_TO:
+            notifier.notify(recipient, ("maintenance", machine_id, status),
+                            f"MAINTENANCE {status.upper()}: {machine['name']} ({machine['company']}, {machine['floor']}), "
+                            f"RUL {rul:.1f} h, {reason_to_failure}")
+        events.append(sse_event("maintenance", maintenance_payload))
+    return events
+
+
+# Latest (machine, rul, status, timestamp) per machine id, for /snapshot
+latest_machines = {}
+
+
+def open_machine_data():
+    """Returns (reader, error_message). error_message is an SSE error event or None."""
+    try:
+        return open_records(MACHINE_DATA_FILE), None
+    except FileNotFoundError:
+        logger.error("sample_rul.json not found")
+        return None, "event: error\ndata: {'message': 'sample_rul.json not found'}\n\n"
+
+
+def machine_replay(reader, speed=None, after=None):
+    """
+    Yields (event_id, row, delay) while the file is being parsed. Machine rows
+    carry no recorded time, so speed scales the default REPLAY_DURATION
+    pacing. The event id is the row number; rows up to `after` (a client's
+    Last-Event-ID) are skipped without waiting.
+    """
+    scheduler = ReplayScheduler(speed or 1.0, max_gap=float("inf"))
+    for event_id, (row, offset) in enumerate(reader, 1):
+        if after is not None and event_id <= after:
+            continue
+        yield event_id, row, scheduler.delay(paced_time(reader, offset))
+
+
 @app.route("/stream/machine")
 def stream_machine():
-    def predict_rul(data, model, features_col):
-        try:
-            input_array = np.array([[data[col] for col in features_col]])
-            predicted_rul = model.predict(input_array)[0]
-            return max(predicted_rul, 0)
-        except Exception as e:
-            logger.error("RUL prediction error: %s", e)
-            return None
-    
-    def infer_failure_reason(row):
-        errors = ['error1', 'error2', 'error3', 'error4', 'error5']
-        active_errors = [err for err in errors if err in row and row[err] > 0]
-        if active_errors:
-            return f"Error codes: {', '.join(active_errors)}"
-
-        comps = ['comp1', 'comp2', 'comp3', 'comp4']
-        active_comps = [comp for comp in comps if comp in row and row[comp] > 0]
-        if active_comps:
-            return f"Maintenance on: {', '.join([c.replace('comp', 'component ') for c in active_comps])}"
-
-        if 'vibrationmean_24h' in row and row['vibrationmean_24h'] > 45:
-            return "High vibration"
-        if 'voltmean_24h' in row and row['voltmean_24h'] > 180:
-            return "High voltage"
-        if 'pressuremean_24h' in row and row['pressuremean_24h'] > 110:
-            return "High pressure"
-        if 'rotatemean_24h' in row and row['rotatemean_24h'] > 500:
-            return "High rotation speed"
-        return "Unknown or general wear"
-    
-    def determine_priority_level(machine_name, status):
-        if (machine_name == "Lithography Systems" or "Lithography System-2") or (status == "breakdown"):
-            return "High"
-        elif (machine_name == "Clean Room Equipment") or (status == "warning"):
-            return "Medium"
-        return "Low"  # Default for other machines
+    try:
+        speed = parse_speed(request.args.get("speed"))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid speed: {e}"}), 400
+    last_event_id = parse_event_id(request.headers.get("Last-Event-ID") or request.args.get("lastEventId"))
 
     def event_stream():
         try:
-            with open("../data/filtered_sample_rul.json", "r") as file:
-                data = json.load(file)
-                total_records = len(data)
-                duration = 180
-                sleep_time = duration / total_records
-
-                for row in data:
-                    time.sleep(sleep_time)
-                    machine_id = row.get("machineID")
-
-                    # Find matching machine in MACHINE_INFO
-                    if not machine_id:
-                        logger.warning("Missing machine_id in sample_rul.json row: %s", row)
-                        continue
-
-                    machine = next((m for m in MACHINE_INFO if m["machine_id"] == machine_id), None)
-                    if not machine:
-                        logger.warning("No machine found for machine_id %s", machine_id)
-                        continue
-
-                    rul = None
-                    status = "Good"
-                    maintenance_alert = False
-                    reason_to_failure = infer_failure_reason(row)
-                    if rul_model and all(col in row for col in features_col):
-                        rul = predict_rul(row, rul_model, features_col)
-                        if rul <= BREAKDOWN_THRESHOLD:
-                            status = "Breakdown"
-                            maintenance_alert = True
-                        elif rul < RUL_THRESHOLD:
-                            status = "Warning"
-                            maintenance_alert = True
-                        else:
-                            status = "Good"
-
-                    # Machine status payload
-                    payload = {
-                        "machine_id": machine_id,
-                        "mac_address": machine["mac_address"],
-                        "name": machine["name"],
-                        "company": machine["company"],
-                        "floor": machine["floor"],
-                        "location": [float(machine["lat"]), float(machine["lng"])],
-                        "rul": float(rul) if rul is not None else None,
-                        "status": status,
-                        "timestamp": datetime.datetime.utcnow().isoformat()
-                    }
-
-                    print(f"Machine log: {payload}")
-                    yield f"event: machine\ndata: {json.dumps(payload)}\n\n"
-
-                    # Maintenance alert
-                    if maintenance_alert:
-                        maintenance_payload = {
-                            "type": "maintenance",
-                            "name": machine["name"],
-                            "company": machine["company"],
-                            "rul": float(rul) if rul is not None else None,
-                            "status": status,
-                            "floor": machine["floor"],
-                            "location": [float(machine["lat"]), float(machine["lng"])],
-                            "message": f"Maintenance required: {status} (RUL {rul:.2f} hours)",
-                            "timestamp": datetime.datetime.utcnow().isoformat(),
-                            "predicted_failure_time": (datetime.datetime.utcnow() + datetime.timedelta(hours=float(rul))).isoformat(),
-                            "reason_to_failure": reason_to_failure,
-                            "priority": determine_priority_level(machine["name"], status),
-                            "mac_address": machine["mac_address"] 
-                        }
-                        print(f"Maintenance notification: {maintenance_payload}")
-                        yield f"event: maintenance\ndata: {json.dumps(maintenance_payload)}\n\n"
-        except FileNotFoundError:
-            logger.error("sample_rul.json not found")
-            yield f"event: error\ndata: {{'message': 'sample_rul.json not found'}}\n\n"
+            reader, error = open_machine_data()
+            if error:
+                yield error
+                return
+
+            machine_streams.inc()
+            try:
+                with reader:
+                    for event_id, row, sleep_time in machine_replay(reader, speed, last_event_id):
+                        time.sleep(sleep_time)
+                        for message in machine_events(row):
+                            count_event("machine", message)
+                            yield with_id(event_id, message)
+            finally:
+                machine_streams.dec()
         except json.JSONDecodeError:
             logger.error("Invalid JSON in sample_rul.json")
-            yield f"event: error\ndata: {{'message': 'Invalid JSON in sample_rul.json'}}\n\n"
+            yield "event: error\ndata: {'message': 'Invalid JSON in sample_rul.json'}\n\n"
         except Exception as e:
             logger.error("Machine stream error: %s", e)
             yield f"event: error\ndata: {{'message': 'Machine stream error'}}\n\n"
 
     return Response(stream_with_context(event_stream()), mimetype="text/event-stream")
 
+def state_snapshot(hub):
+    """
+    Current state of every tag (as in compact frames) and machine in one
+    response. rtls_last_event_id is where a client that loaded the snapshot
+    can resume /stream/rtls with ?lastEventId=.
+    """
+    tags, last_event_id = hub.snapshot() if hub else ({}, None)
+    return {
+        "timestamp": datetime.datetime.utcnow().isoformat(),
+        "tags": tags,
+        "rtls_last_event_id": last_event_id,
+        "machines": {machine_id: {**machine_members(machine), "rul": rul, "status": status, "timestamp": timestamp}
+                     for machine_id, (machine, rul, status, timestamp) in list(latest_machines.items())},
+    }
+
+
+@app.route("/snapshot", methods=["GET"])
+def get_snapshot():
+    # ?source=live for live ingestion, ?speed= for that replay; default replay otherwise
+    if request.args.get("source") == "live":
+        return jsonify(state_snapshot(live_hub))
+    try:
+        speed = parse_speed(request.args.get("speed"))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid speed: {e}"}), 400
+    return jsonify(state_snapshot(rtls_hubs.get(speed)))
+
+
 @app.route("/machines", methods=["GET"])
 def get_machines():
-    return jsonify(MACHINE_INFO)
+    return jsonify(registry.machines())
+
+
+@app.route("/cache/stats", methods=["GET"])
+def get_cache_stats():
+    return jsonify(rul_cache.stats())
+
+
+@app.route("/notifications/stats", methods=["GET"])
+def get_notification_stats():
+    return jsonify(notifier.stats())
 
 
 @app.route("/devices", methods=["GET"])
 def get_devices():
-    with open("../data/employee_table.json", "r") as file:
-        employee = json.load(file)
-    return jsonify(employee)
+    # Optional ?company=&floor=&role= filters use the registry's secondary indexes
+    return jsonify(registry.employees(company=request.args.get("company"),
+                                      floor=request.args.get("floor"),
+                                      role=request.args.get("role")))
+
+
+@app.route("/log/level", methods=["GET", "POST"])
+def log_level():
+    # POST {"level": "DEBUG", "logger": "stream.events"}; logger defaults to the root
+    if request.method == "POST":
+        body = request.get_json(silent=True)
+        body = body if isinstance(body, dict) else {}
+        try:
+            log_pipeline.set_level(body.get("level"), body.get("logger"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    return jsonify(log_pipeline.stats())
+
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route("/models", methods=["GET"])
+def get_models():
+    return jsonify(model_registry.stats())
+
+
+@app.route("/models/activate", methods=["POST"])
+def activate_model():
+    # Body: {"version": "rul_model.pkl"}; without a version the shadow candidate is promoted
+    body = request.get_json(silent=True)
+    body = body if isinstance(body, dict) else {}
+    try:
+        return jsonify(model_registry.activate(body.get("version")))
+    except Exception as e:
+        return jsonify({"error": f"Model not activated: {e}"}), 400
+
+
+def health(ready=False):
+    """Liveness (the process answers) or readiness (a RUL model is loaded); (body, status)."""
+    body = {"status": "ok", "uptime_seconds": time.monotonic() - STARTED, "pid": os.getpid()}
+    if ready:
+        version = model_registry.active
+        body["model"] = version.name if version else ("missing" if model_registry.ready.is_set() else "loading")
+        if version is None:
+            return {**body, "status": "unavailable"}, 503
+    return body, 200
+
+
+@app.route("/health/live", methods=["GET"])
+def get_liveness():
+    body, status = health()
+    return jsonify(body), status
+
+
+@app.route("/health/ready", methods=["GET"])
+def get_readiness():
+    body, status = health(ready=True)
+    return jsonify(body), status
+
+
+@app.route("/registry/reload", methods=["POST"])
+def reload_registry():
+    if not registry.reload():
+        return jsonify({"error": "Registry reload failed, still serving the previous data"}), 500
+    return jsonify({"employees": len(registry.employees()), "machines": len(registry.machines())})
 
 if __name__ == "__main__":
+    # With the reloader only the child process serves requests, so the UDP port is bound there
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        ensure_live_ingest()
     app.run(debug=True, threaded=True, port=5000)
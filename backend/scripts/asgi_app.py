@@ -0,0 +1,418 @@
+"""
+Asyncio serving mode for the backend.
+
+Exposes the same routes and the same `event:`/`data:` SSE wire format as the
+Flask app in app.py, but every open stream is an async generator on a single
+event loop instead of an OS thread parked in time.sleep(). RUL prediction
+goes through the shared batcher and the remaining blocking work runs on a
+small fixed thread pool.
+
+Run with any ASGI server, e.g.
+
+    uvicorn asgi_app:application --port 5000 --no-access-log
+
+or simply `python asgi_app.py` when uvicorn is installed.
+"""
+import asyncio
+import json
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import app as backend
+from broadcaster import AsyncHub, POLICIES, with_id, parse_event_id, count_event
+from frames import FrameCoalescer
+from ingest import RingBuffer, UdpListener, RTLS_UDP_PORT, parse_ndjson, process_rows
+from replay import parse_speed
+from serialization import dumps
+import log_pipeline
+import metrics
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_ORIGINS = {"http://localhost:3000", "http://localhost:5173"}
+
+# Threads used for blocking work; independent of connection count
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", 2))
+executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+# How long the live consumer sleeps when the ring buffer is empty
+LIVE_POLL_INTERVAL = 0.005
+
+
+async def rtls_ingest(hub, speed=None):
+    # Async twin of app.rtls_ingest: one replay loop shared by every client at this speed
+    while hub.active:
+        reader, error = backend.open_rtls_data()
+        if error:
+            hub.publish(None, error, compact=True)
+            hub.finish()
+            return
+        try:
+            with reader:
+                for row, zone_company, sleep_time in backend.rtls_replay(reader, speed):
+                    if not hub.active:
+                        return
+                    await asyncio.sleep(sleep_time)
+                    for key, message in backend.rtls_events(row, zone_company, hub.frames):
+                        hub.publish(key, message)
+        except json.JSONDecodeError:
+            logger.error("Invalid JSON in %s", backend.RTLS_DATA_FILE)
+            hub.publish(None, "event: error\ndata: {'message': 'Invalid JSON in rtls_2.json'}\n\n", compact=True)
+            hub.finish()
+            return
+
+
+rtls_hubs = {}
+
+
+def rtls_hub_for(speed):
+    hub = rtls_hubs.get(speed)
+    if hub is None:
+        hub = AsyncHub(f"rtls@{speed or 'default'}", lambda hub: rtls_ingest(hub, speed),
+                       maxsize=backend.SSE_QUEUE_SIZE, policy=backend.SSE_SLOW_CONSUMER_POLICY, frames=FrameCoalescer())
+        rtls_hubs[speed] = hub
+    return hub
+
+
+# Own buffer and hub: app.live_buffer belongs to the Flask server's consumer thread
+live_buffer = RingBuffer(name="asgi")
+live_hub = AsyncHub("rtls-live", None, maxsize=backend.SSE_QUEUE_SIZE, policy=backend.SSE_SLOW_CONSUMER_POLICY,
+                    frames=FrameCoalescer())
+live_task = None
+follow_task = None
+udp_listener = None
+# Set by workers.py: live tag state shared by all worker processes (None when running as one process)
+tag_table = None
+
+
+async def live_consume():
+    # Async twin of ingest.LiveConsumer; zone checks run off the loop
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = live_buffer.drain()
+        if not batch:
+            await asyncio.sleep(LIVE_POLL_INTERVAL)
+            continue
+        process = write_tag_table if tag_table is not None else live_events
+        events = await loop.run_in_executor(executor, process_rows, process, batch, live_buffer)
+        for key, message in events:
+            live_hub.publish(key, message)
+
+
+def live_events(rows):
+    return backend.live_events(rows, live_hub.frames)
+
+
+def write_tag_table(rows):
+    # Every worker's live_follow() streams these; MACs the table has no row for are published here only.
+    # SMS alerts are raised here, by the worker that ingested the row, not by every follower.
+    zones = backend.rtls_zones(rows)
+    unknown = set(tag_table.write([row.get("ClientMacAddr") for row in rows], [row.get("lat") for row in rows],
+                                  [row.get("lng") for row in rows], zones).tolist())
+    events = []
+    for i, row in enumerate(rows):
+        if i in unknown:
+            events += backend.rtls_events(row, zones[i], live_hub.frames)
+        else:
+            backend.zone_alerts(row, zones[i])
+    return events
+
+
+def tag_table_events(after):
+    seq, changes = tag_table.changes(after)
+    events = [event for mac, lat, lng, zone_company in changes
+              for event in backend.rtls_events({"ClientMacAddr": mac, "lat": lat, "lng": lng}, zone_company,
+                                               live_hub.frames, notify=False)]
+    return seq, events
+
+
+async def live_follow():
+    # Publishes what any worker wrote to the shared table since the last poll
+    loop = asyncio.get_running_loop()
+    seen = 0   # a (re)started worker first catches up on every tag's current state
+    while True:
+        await asyncio.sleep(LIVE_POLL_INTERVAL)
+        if tag_table.seq == seen:
+            continue
+        try:
+            seen, events = await loop.run_in_executor(executor, tag_table_events, seen)
+        except Exception as e:
+            logger.error("Shared tag table poll failed: %s", e)
+            continue
+        for key, message in events:
+            live_hub.publish(key, message)
+
+
+def ensure_live_ingest():
+    global live_task, follow_task, udp_listener
+    if live_task is None:
+        live_task = asyncio.get_running_loop().create_task(live_consume())
+    if follow_task is None and tag_table is not None:
+        follow_task = asyncio.get_running_loop().create_task(live_follow())
+    if udp_listener is None and RTLS_UDP_PORT:
+        udp_listener = UdpListener(live_buffer, RTLS_UDP_PORT)
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def ingest_rtls(scope, receive, send):
+    ensure_live_ingest()
+    body = live_buffer.offer_ndjson(await read_body(receive))
+    if body["rejected"]:
+        # Buffer full: the client should resend the rejected tail later
+        await send_json(scope, send, body, status=429, headers=[(b"retry-after", b"1")])
+    else:
+        await send_json(scope, send, body, status=202)
+
+
+async def ingest_telemetry(scope, receive, send):
+    rows, invalid = parse_ndjson(await read_body(receive))
+    body = backend.telemetry.add_rows(rows)
+    body["invalid"] += invalid
+    await send_json(scope, send, body, status=202)
+
+
+async def rtls_stream(query):
+    policy = query.get("policy", backend.SSE_SLOW_CONSUMER_POLICY)
+    compact = query.get("mode") == "compact"
+    last_event_id = parse_event_id(query.get("lastEventId"))
+    if query.get("source") == "live":
+        ensure_live_ingest()
+        subscription = live_hub.subscribe(policy=policy, compact=compact, last_event_id=last_event_id)
+    else:
+        subscription = rtls_hub_for(parse_speed(query.get("speed"))).subscribe(policy=policy, compact=compact,
+                                                                              last_event_id=last_event_id)
+    try:
+        async for message in subscription:
+            yield message
+    except Exception as e:
+        logger.error("RTLS stream error: %s", e)
+        yield f"event: error\ndata: {{'message': 'RTLS stream error'}}\n\n"
+    finally:
+        subscription.close()
+
+
+async def score_row(row):
+    # Async twin of app.score_row: cache first, then the shared batcher
+    start = time.perf_counter()
+    cache_key = backend.rul_cache.key(row)
+    generation = backend.rul_cache.generation
+    rul = backend.rul_cache.get(cache_key)
+    if rul is not None:
+        backend.rul_predict_cached.observe(time.perf_counter() - start)
+        return rul
+    # Scored together with rows from other clients, without blocking the loop
+    rul = await asyncio.wrap_future(backend.rul_batcher.submit(row))
+    if rul is not None:
+        backend.rul_cache.put(cache_key, rul, generation)
+    backend.rul_predict_model.observe(time.perf_counter() - start)
+    return rul
+
+
+async def machine_stream(query):
+    try:
+        reader, error = backend.open_machine_data()
+        if error:
+            yield error
+            return
+
+        loop = asyncio.get_running_loop()
+        backend.machine_streams.inc()
+        try:
+            with reader:
+                replay = backend.machine_replay(reader, parse_speed(query.get("speed")), parse_event_id(query.get("lastEventId")))
+                for event_id, row, sleep_time in replay:
+                    await asyncio.sleep(sleep_time)
+                    rul = None
+                    if backend.model_registry.active is not None and all(col in row for col in backend.features_col):
+                        rul = await score_row(row)
+                    for message in await loop.run_in_executor(executor, backend.machine_events, row, rul):
+                        count_event("machine", message)
+                        yield with_id(event_id, message)
+        finally:
+            backend.machine_streams.dec()
+    except json.JSONDecodeError:
+        logger.error("Invalid JSON in sample_rul.json")
+        yield "event: error\ndata: {'message': 'Invalid JSON in sample_rul.json'}\n\n"
+    except Exception as e:
+        logger.error("Machine stream error: %s", e)
+        yield f"event: error\ndata: {{'message': 'Machine stream error'}}\n\n"
+
+
+def get_snapshot(query):
+    if query.get("source") == "live":
+        return backend.state_snapshot(live_hub)
+    return backend.state_snapshot(rtls_hubs.get(parse_speed(query.get("speed"))))
+
+
+def get_devices(query):
+    return backend.registry.employees(company=query.get("company"), floor=query.get("floor"), role=query.get("role"))
+
+
+STREAM_ROUTES = {
+    "/stream/rtls": rtls_stream,
+    "/stream/machine": machine_stream,
+}
+
+JSON_ROUTES = {
+    "/machines": lambda query: backend.registry.machines(),
+    "/devices": get_devices,
+    "/cache/stats": lambda query: backend.rul_cache.stats(),
+    "/notifications/stats": lambda query: backend.notifier.stats(),
+    "/snapshot": get_snapshot,
+    "/telemetry/features": lambda query: backend.telemetry_features(query.get("machineID")),
+    "/log/level": lambda query: log_pipeline.stats(),
+    "/models": lambda query: backend.model_registry.stats(),
+    "/ingest/stats": lambda query: {**live_buffer.stats(), "published": live_hub.published,
+                                    "subscribers": live_hub.subscriber_count(), "frames": live_hub.frames.stats()},
+}
+# JSON routes that score with the model or read files; they run in the executor so the streams keep going
+BLOCKING_ROUTES = {"/telemetry/features"}
+
+
+def response_headers(scope, content_type):
+    headers = [(b"content-type", content_type)]
+    origin = dict(scope["headers"]).get(b"origin", b"").decode()
+    if origin in ALLOWED_ORIGINS:
+        headers += [(b"access-control-allow-origin", origin.encode()), (b"vary", b"Origin")]
+    return headers
+
+
+async def send_json(scope, send, body, status=200, headers=()):
+    payload = dumps(body).encode()
+    await send({"type": "http.response.start", "status": status,
+                "headers": response_headers(scope, b"application/json") + list(headers)})
+    await send({"type": "http.response.body", "body": payload})
+
+
+async def send_event_stream(scope, receive, send, events):
+    headers = response_headers(scope, b"text/event-stream")
+    headers.append((b"cache-control", b"no-cache"))
+    await send({"type": "http.response.start", "status": 200, "headers": headers})
+
+    async def pump():
+        async for message in events:
+            await send({"type": "http.response.body", "body": message.encode(), "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def wait_disconnect():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    # Whichever finishes first (stream ends or client leaves) cancels the other
+    tasks = [asyncio.ensure_future(pump()), asyncio.ensure_future(wait_disconnect())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await events.aclose()
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            if RTLS_UDP_PORT or tag_table is not None:
+                ensure_live_ingest()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            executor.shutdown(wait=False)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    path = scope["path"]
+    query = {k: v[-1] for k, v in parse_qs(scope["query_string"].decode()).items()}
+    # The Last-Event-ID header wins over ?lastEventId=
+    last_event_id = dict(scope["headers"]).get(b"last-event-id")
+    if last_event_id:
+        query["lastEventId"] = last_event_id.decode()
+
+    if path == "/registry/reload" and scope["method"] == "POST":
+        if not await asyncio.get_running_loop().run_in_executor(executor, backend.registry.reload):
+            await send_json(scope, send, {"error": "Registry reload failed, still serving the previous data"}, status=500)
+            return
+        await send_json(scope, send, {"employees": len(backend.registry.employees()), "machines": len(backend.registry.machines())})
+    elif path == "/ingest/rtls" and scope["method"] == "POST":
+        await ingest_rtls(scope, receive, send)
+    elif path == "/ingest/telemetry" and scope["method"] == "POST":
+        await ingest_telemetry(scope, receive, send)
+    elif path == "/models/activate" and scope["method"] == "POST":
+        try:
+            body = json.loads(await read_body(receive) or b"{}")
+            body = body if isinstance(body, dict) else {}
+            # Loading a version that is not the candidate reads the pickle; keep it off the event loop
+            stats = await asyncio.get_running_loop().run_in_executor(executor, backend.model_registry.activate, body.get("version"))
+        except Exception as e:
+            await send_json(scope, send, {"error": f"Model not activated: {e}"}, status=400)
+            return
+        await send_json(scope, send, stats)
+    elif path == "/log/level" and scope["method"] == "POST":
+        try:
+            body = json.loads(await read_body(receive) or b"{}")
+            body = body if isinstance(body, dict) else {}
+            log_pipeline.set_level(body.get("level"), body.get("logger"))
+        except ValueError as e:   # includes invalid JSON
+            await send_json(scope, send, {"error": str(e)}, status=400)
+            return
+        await send_json(scope, send, log_pipeline.stats())
+    elif path == "/metrics" and scope["method"] == "GET":
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": response_headers(scope, metrics.CONTENT_TYPE.encode())})
+        await send({"type": "http.response.body", "body": metrics.render().encode()})
+    elif scope["method"] != "GET":
+        await send_json(scope, send, {"error": "Method not allowed"}, status=405)
+    elif path in STREAM_ROUTES:
+        if path == "/stream/rtls" and query.get("policy", backend.SSE_SLOW_CONSUMER_POLICY) not in POLICIES:
+            await send_json(scope, send, {"error": f"Unknown policy {query['policy']}, expected one of {list(POLICIES)}"}, status=400)
+            return
+        if path == "/stream/rtls" and query.get("mode", "full") not in backend.STREAM_MODES:
+            await send_json(scope, send, {"error": f"Unknown mode {query['mode']}, expected one of {list(backend.STREAM_MODES)}"}, status=400)
+            return
+        try:
+            parse_speed(query.get("speed"))
+        except ValueError as e:
+            await send_json(scope, send, {"error": f"Invalid speed: {e}"}, status=400)
+            return
+        await send_event_stream(scope, receive, send, STREAM_ROUTES[path](query))
+    elif path in ("/health/live", "/health/ready"):
+        body, status = backend.health(ready=path == "/health/ready")
+        await send_json(scope, send, body, status=status)
+    elif path in JSON_ROUTES:
+        try:
+            if path in BLOCKING_ROUTES:
+                body = await asyncio.get_running_loop().run_in_executor(executor, JSON_ROUTES[path], query)
+            else:
+                body = JSON_ROUTES[path](query)
+        except ValueError as e:
+            await send_json(scope, send, {"error": str(e)}, status=400)
+            return
+        await send_json(scope, send, body)
+    else:
+        await send_json(scope, send, {"error": "Not found"}, status=404)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # One loop, no reloader; keep access logs off so they don't dominate under load
+    uvicorn.run("asgi_app:application", host="127.0.0.1", port=5000, access_log=False,
+                backlog=int(os.environ.get("SSE_BACKLOG", 8192)))
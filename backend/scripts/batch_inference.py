@@ -0,0 +1,146 @@
+import os
+import queue
+import threading
+import time
+import logging
+from concurrent.futures import Future
+
+import numpy as np
+
+from metrics import Histogram, SIZE_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+# Flush a batch when it reaches this many rows or the oldest row waited this long
+RUL_BATCH_SIZE = int(os.environ.get("RUL_BATCH_SIZE", 256))
+RUL_BATCH_WAIT_MS = float(os.environ.get("RUL_BATCH_WAIT_MS", 5))
+
+batch_seconds = Histogram("rul_batch_predict_seconds", "model.predict latency per RUL batch")
+batch_rows = Histogram("rul_batch_rows", "Rows per RUL batch", buckets=SIZE_BUCKETS)
+
+
+class BatchPredictor:
+    """
+    Collects rows from every stream into small batches and scores each batch
+    with a single vectorized model.predict() call on a float32 matrix.
+
+    submit(row) returns a concurrent.futures.Future (usable from asyncio via
+    asyncio.wrap_future), predict(row) blocks until the batch is scored.
+    Results match predict_rul in app.py: clipped at 0, None on failure. When
+    a batch fails its rows are scored one at a time, so a bad row only costs
+    its own caller the prediction.
+    """
+
+    def __init__(self, model, features_col, max_batch=RUL_BATCH_SIZE, max_wait_ms=RUL_BATCH_WAIT_MS):
+        self.model = model
+        self.features_col = list(features_col)
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.rows = 0
+        self._start()
+        # Threads do not survive fork(): a worker process (workers.py) gets its own queue and batcher
+        os.register_at_fork(after_in_child=self._start)
+
+    def _start(self):
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="rul-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, row):
+        future = Future()
+        self._queue.put((row, future))
+        return future
+
+    def predict(self, row):
+        return self.submit(row).result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Skip rows whose caller went away (e.g. an async client disconnected mid-await)
+            batch = [(row, future) for row, future in self._collect() if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            rows = [row for row, _ in batch]
+            batch_rows.observe(len(rows))
+            start = time.perf_counter()
+            try:
+                predictions = predict_batch(self.model, rows, self.features_col)
+            except Exception as e:
+                # Find the failing row(s) so the other callers in this batch still get their RUL
+                predictions = [self._predict_one(row) for row in rows]
+                logger.error("Batched RUL prediction error, %d of %d rows failed on their own: %s",
+                             predictions.count(None), len(rows), e)
+            batch_seconds.observe(time.perf_counter() - start)
+            self.batches += 1
+            self.rows += len(batch)
+            for (_, future), rul in zip(batch, predictions):
+                future.set_result(rul)
+
+    def _predict_one(self, row):
+        try:
+            return predict_batch(self.model, [row], self.features_col)[0]
+        except Exception:
+            return None
+
+
+def feature_matrix(rows, features_col):
+    """Rows (dicts) to a C-contiguous float32 matrix in features_col order."""
+    matrix = np.empty((len(rows), len(features_col)), dtype=np.float32)
+    for i, row in enumerate(rows):
+        matrix[i] = [row[col] for col in features_col]
+    return matrix
+
+
+def predict_batch(model, rows, features_col):
+    predictions = model.predict(feature_matrix(rows, features_col))
+    return [max(float(p), 0.0) for p in predictions]
+
+
+def benchmark(model, rows, features_col, repeat=5):
+    """Compare rows/s of the per-row path against batched predict."""
+    from app import predict_rul
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for row in rows:
+            predict_rul(row, model, features_col)
+    per_row = repeat * len(rows) / (time.perf_counter() - start)
+
+    predictor = BatchPredictor(model, features_col)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        futures = [predictor.submit(row) for row in rows]
+        for future in futures:
+            future.result()
+    batched = repeat * len(rows) / (time.perf_counter() - start)
+    return per_row, batched, predictor.rows / max(predictor.batches, 1)
+
+
+if __name__ == "__main__":
+    import json
+    import joblib
+    from app import features_col
+
+    with open("../data/filtered_sample_rul.json", "r") as file:
+        data = [row for row in json.load(file) if all(col in row for col in features_col)]
+    model = joblib.load("../model/xgboost_model.pkl")
+
+    per_row, batched, avg_batch = benchmark(model, data, features_col)
+    print(f"rows: {len(data)}, batch size {RUL_BATCH_SIZE}, wait {RUL_BATCH_WAIT_MS} ms")
+    print(f"per-row predict:  {per_row:10.0f} rows/s")
+    print(f"batched predict:  {batched:10.0f} rows/s (avg batch {avg_batch:.1f} rows)")
+    print(f"speedup:          {batched / per_row:10.1f}x")
@@ -0,0 +1,382 @@
+"""
+Benchmark suite. Results are written as JSON (to ../benchmarks/ by default)
+so runs can be compared for regressions.
+
+    python benchmarks.py soak --clients 200 --duration 60
+                                                    start app.py on synthetic data, open SSE clients,
+                                                    record events/s, latency percentiles, CPU and RSS
+    python benchmarks.py startup                    `python -X importtime` of app.py and the time until a fresh
+                                                    server answers /machines and /health/ready; exit code 1
+                                                    over budget or if a deferred module was imported
+    python benchmarks.py compare old.json new.json  differences; exit code 1 if anything regressed
+                                                    by more than --threshold percent
+
+The soak run generates an RTLS file shaped like rtls.json (registry MACs,
+`localtime` spaced for --rtls-rate rows per second) and a RUL file shaped
+like filtered_sample_rul.json (each column sampled within its observed
+range), and points the server at them with RTLS_DATA_FILE /
+MACHINE_DATA_FILE. --server asgi runs asgi_app instead of Flask.
+
+Microbenchmarks of the hot-path functions are pytest-benchmark tests in
+../tests/bench_*.py.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import datetime
+import platform
+import tempfile
+import subprocess
+import http.client
+
+from sse_load_test import Results, sse_client, percentile, read_proc_status
+
+RESULTS_DIR = "../benchmarks"
+EMPLOYEE_DATA_FILE = "../data/employee_table.json"
+RTLS_SAMPLE_FILE = "../data/rtls.json"
+RUL_SAMPLE_FILE = "../data/filtered_sample_rul.json"
+MACHINE_IDS = (49, 45, 41, 37, 64)
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+# Startup budgets: importing app.py, and a new server answering /machines
+IMPORT_BUDGET_MS = float(os.environ.get("IMPORT_BUDGET_MS", 800))
+SERVE_BUDGET_S = float(os.environ.get("SERVE_BUDGET_S", 1.0))
+# Only needed once a model is loaded or an SMS is sent; importing them with the app is a regression
+DEFERRED_MODULES = ("pandas", "joblib", "xgboost", "sklearn", "scipy", "twilio")
+
+
+# --- results -----------------------------------------------------------------
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(kind, config, results, output=None):
+    report = {
+        "kind": kind,
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "config": config,
+        "results": results,
+    }
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{kind}-{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"results written to {output}")
+    return report
+
+
+def higher_is_better(name):
+    return name.endswith("_per_s") or name in ("connections_held", "peak_connections")
+
+
+def compare(old_path, new_path, threshold=10.0):
+    """Print old vs new per result; returns the names that got worse by more than threshold percent."""
+    with open(old_path) as file:
+        old = json.load(file)["results"]
+    with open(new_path) as file:
+        new = json.load(file)["results"]
+    regressions = []
+    print(f"{'result':40} {'old':>14} {'new':>14} {'change':>9}")
+    for name in sorted(set(old) & set(new)):
+        before, after = old[name], new[name]
+        if not isinstance(before, (int, float)) or not isinstance(after, (int, float)) or not before:
+            continue
+        change = (after - before) / abs(before) * 100
+        worse = -change if higher_is_better(name) else change
+        flag = "  REGRESSION" if worse > threshold else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:40} {before:14,.2f} {after:14,.2f} {change:+8.1f}%{flag}")
+    return regressions
+
+
+# --- soak / load -------------------------------------------------------------
+
+def synthetic_rtls(path, rows, rate, seed=0):
+    """RTLS rows shaped like rtls.json for registry MACs, `rate` rows per second of recorded time."""
+    rng = random.Random(seed)
+    with open(EMPLOYEE_DATA_FILE) as file:
+        macs = [e["mac_address"] for e in json.load(file) if e.get("mac_address")]
+    with open(RTLS_SAMPLE_FILE) as file:
+        sample = json.load(file)
+    lat = [r["lat"] for r in sample]
+    lng = [r["lng"] for r in sample]
+    floors = sorted({r["Level"] for r in sample})
+    start = datetime.datetime(2019, 9, 17, 16, 0, 0)
+    with open(path, "w") as file:
+        json.dump([{
+            "Site": "UK Office",
+            "Level": rng.choice(floors),
+            "ClientMacAddr": rng.choice(macs),
+            "lat": rng.uniform(min(lat), max(lat)),
+            "lng": rng.uniform(min(lng), max(lng)),
+            "localtime": (start + datetime.timedelta(seconds=i / rate)).isoformat(sep=" ", timespec="milliseconds"),
+        } for i in range(rows)], file)
+
+
+def synthetic_rul(path, rows, seed=0):
+    """RUL rows shaped like filtered_sample_rul.json, each column drawn from its observed range."""
+    rng = random.Random(seed)
+    with open(RUL_SAMPLE_FILE) as file:
+        sample = json.load(file)
+    columns = [col for col in sample[0] if col != "machineID"]
+    ranges = {col: (min(r[col] for r in sample), max(r[col] for r in sample)) for col in columns}
+
+    def value(col):
+        low, high = ranges[col]
+        return rng.randint(low, high) if isinstance(low, int) and isinstance(high, int) else rng.uniform(low, high)
+
+    with open(path, "w") as file:
+        json.dump([{"machineID": rng.choice(MACHINE_IDS), **{col: value(col) for col in columns}} for _ in range(rows)], file)
+
+
+def cpu_seconds(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as file:
+            fields = file.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    except (FileNotFoundError, IndexError):
+        return None
+
+
+def start_server(args, env, poll=0.2):
+    if args.server == "asgi":
+        code = ("import uvicorn, asgi_app; "
+                f"uvicorn.run(asgi_app.application, host='{args.host}', port={args.port}, access_log=False, log_level='warning')")
+    else:
+        code = f"import app; app.app.run(host='{args.host}', port={args.port}, threaded=True)"
+    server = subprocess.Popen([sys.executable, "-c", code], env=env,
+                              stdout=subprocess.DEVNULL, stderr=open(args.server_log, "w"))
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"server exited with {server.returncode}, see {args.server_log}")
+        try:
+            conn = http.client.HTTPConnection(args.host, args.port, timeout=1)
+            conn.request("GET", "/machines")
+            if conn.getresponse().status == 200:
+                return server
+        except OSError:
+            time.sleep(poll)
+    server.terminate()
+    raise RuntimeError(f"server did not answer within {args.startup_timeout}s, see {args.server_log}")
+
+
+async def soak_clients(args, pid):
+    rtls, machine = Results(), Results()
+    stop = asyncio.Event()
+    rtls_path = f"/stream/rtls?speed={args.speed}" + ("&mode=compact" if args.compact else "")
+    machine_path = f"/stream/machine?speed={args.speed}"
+    tasks = [asyncio.create_task(sse_client(args.host, args.port, rtls_path, rtls, stop)) for _ in range(args.clients)]
+    tasks += [asyncio.create_task(sse_client(args.host, args.port, machine_path, machine, stop))
+              for _ in range(args.machine_clients)]
+
+    await asyncio.sleep(args.warmup)
+    # Measure from here on
+    for results in (rtls, machine):
+        results.events = 0
+        results.latencies_ms = []
+    samples = []
+    cpu_start, started = cpu_seconds(pid), time.monotonic()
+    last_cpu, last_time = cpu_start, started
+    while time.monotonic() - started < args.duration:
+        await asyncio.sleep(1)
+        now, cpu = time.monotonic(), cpu_seconds(pid)
+        status = read_proc_status(pid)
+        samples.append({"t": now - started, "cpu_percent": (cpu - last_cpu) / (now - last_time) * 100 if cpu is not None else None,
+                        "rss_mb": status.get("rss_mb"), "threads": status.get("threads"),
+                        "rtls_events": rtls.events, "held": rtls.connected + machine.connected})
+        last_cpu, last_time = cpu, now
+        print(f"[{now - started:5.0f}s] held={samples[-1]['held']} events={rtls.events + machine.events} "
+              f"cpu={samples[-1]['cpu_percent'] or 0:.0f}% rss={status.get('rss_mb', 0):.0f}MB", flush=True)
+    elapsed = time.monotonic() - started
+    held = rtls.connected + machine.connected
+    stop.set()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    rss = [s["rss_mb"] for s in samples if s["rss_mb"] is not None]
+    cpu_total = cpu_seconds(pid)
+    results = {
+        "connections_held": held,
+        "failed_connections": rtls.failed + machine.failed,
+        "rtls_events_per_s": rtls.events / elapsed,
+        "machine_events_per_s": machine.events / elapsed,
+        "rtls_latency_p50_ms": percentile(rtls.latencies_ms, 50),
+        "rtls_latency_p95_ms": percentile(rtls.latencies_ms, 95),
+        "rtls_latency_p99_ms": percentile(rtls.latencies_ms, 99),
+        "machine_latency_p50_ms": percentile(machine.latencies_ms, 50),
+        "machine_latency_p99_ms": percentile(machine.latencies_ms, 99),
+        "server_cpu_percent": (cpu_total - cpu_start) / elapsed * 100 if cpu_total is not None else None,
+        "server_rss_start_mb": rss[0] if rss else None,
+        "server_rss_max_mb": max(rss) if rss else None,
+        "server_rss_end_mb": rss[-1] if rss else None,
+        # Soak: steady growth here over a long run points at a leak
+        "server_rss_growth_mb_per_min": (rss[-1] - rss[0]) / elapsed * 60 if len(rss) > 1 else None,
+        "server_threads_max": max((s["threads"] or 0) for s in samples) if samples else None,
+    }
+    return {name: value for name, value in results.items() if value is not None}, samples
+
+
+def soak(args):
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    rtls_file, rul_file = os.path.join(workdir, "rtls.json"), os.path.join(workdir, "rul.json")
+    synthetic_rtls(rtls_file, args.rtls_rows, args.rtls_rate)
+    synthetic_rul(rul_file, args.rul_rows)
+    args.server_log = args.server_log or os.path.join(workdir, "server.log")
+    env = {**os.environ, "RTLS_DATA_FILE": rtls_file, "MACHINE_DATA_FILE": rul_file, "LOG_LEVEL": "WARNING"}
+
+    server = start_server(args, env)
+    try:
+        results, samples = asyncio.run(soak_clients(args, server.pid))
+    finally:
+        server.terminate()
+        try:
+            server.wait(10)
+        except subprocess.TimeoutExpired:
+            # uvicorn waits for open streams on shutdown
+            server.kill()
+    for name, value in results.items():
+        print(f"{name:34} {value:12,.2f}")
+    config = {key: value for key, value in vars(args).items() if key not in ("func", "output")}
+    report = write_results("soak", config, results, args.output)
+    if args.samples:
+        with open(args.samples, "w") as file:
+            json.dump(samples, file)
+    return report
+
+
+# --- startup -----------------------------------------------------------------
+
+def import_times(module, env):
+    """{imported module: cumulative microseconds} of `python -X importtime -c "import module"`."""
+    run = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], env=env,
+                         capture_output=True, text=True, check=True)
+    times = {}
+    for line in run.stderr.splitlines():
+        fields = line.split("|")
+        if line.startswith("import time:") and len(fields) == 3 and fields[1].strip().isdigit():
+            times[fields[2].strip()] = int(fields[1])
+    return times
+
+
+def wait_for(args, path, status=200, poll=0.02):
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(args.host, args.port, timeout=1)
+            conn.request("GET", path)
+            if conn.getresponse().status == status:
+                return True
+        except OSError:
+            pass
+        time.sleep(poll)
+    return False
+
+
+def startup(args):
+    env = {**os.environ, "LOG_LEVEL": "WARNING"}
+    args.server_log = args.server_log or os.path.join(tempfile.mkdtemp(prefix="bench-"), "server.log")
+    module = "asgi_app" if args.server == "asgi" else "app"
+    import_ms, serve, ready, deferred = [], [], [], set()
+    # No models to find, so the registry's loader thread cannot import joblib/xgboost while this is measured
+    import_env = {**env, "MODEL_DIR": tempfile.mkdtemp(prefix="bench-models-")}
+    for _ in range(args.runs):
+        times = import_times(module, import_env)
+        import_ms.append(times[module] / 1000)
+        deferred |= {name for name in times if name.split(".")[0] in DEFERRED_MODULES}
+
+        started = time.monotonic()
+        server = start_server(args, env, poll=0.02)
+        try:
+            serve.append(time.monotonic() - started)
+            if wait_for(args, "/health/ready"):
+                ready.append(time.monotonic() - started)
+        finally:
+            server.terminate()
+            server.wait(10)
+
+    results = {
+        "import_ms": min(import_ms),
+        "serve_seconds": min(serve),
+        "deferred_modules_imported": len({name.split(".")[0] for name in deferred}),
+    }
+    if ready:
+        results["ready_seconds"] = min(ready)
+    for name, value in results.items():
+        print(f"{name:34} {value:12,.3f}")
+    failures = []
+    if results["import_ms"] > args.import_budget_ms:
+        failures.append(f"import {module} took {results['import_ms']:.0f} ms, budget {args.import_budget_ms:.0f} ms")
+    if results["serve_seconds"] > args.serve_budget:
+        failures.append(f"/machines answered after {results['serve_seconds']:.2f} s, budget {args.serve_budget:.2f} s")
+    if deferred:
+        failures.append(f"imported at startup: {', '.join(sorted({name.split('.')[0] for name in deferred}))}")
+    for failure in failures:
+        print(f"OVER BUDGET: {failure}")
+    config = {key: value for key, value in vars(args).items() if key not in ("func", "output")}
+    write_results("startup", config, results, args.output)
+    return not failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    soak_parser = commands.add_parser("soak", help="start the server and hold SSE clients against it")
+    soak_parser.add_argument("--server", choices=("flask", "asgi"), default="flask")
+    soak_parser.add_argument("--host", default="127.0.0.1")
+    soak_parser.add_argument("--port", type=int, default=5055)
+    soak_parser.add_argument("--clients", type=int, default=50, help="/stream/rtls clients")
+    soak_parser.add_argument("--machine-clients", type=int, default=5, help="/stream/machine clients")
+    soak_parser.add_argument("--compact", action="store_true", help="RTLS clients use ?mode=compact")
+    soak_parser.add_argument("--speed", default="1", help="replay speed for both streams (a factor or 'max')")
+    soak_parser.add_argument("--rtls-rows", type=int, default=200_000)
+    soak_parser.add_argument("--rtls-rate", type=float, default=1000, help="recorded RTLS rows per second")
+    soak_parser.add_argument("--rul-rows", type=int, default=5000)
+    soak_parser.add_argument("--warmup", type=float, default=5)
+    soak_parser.add_argument("--duration", type=float, default=30)
+    soak_parser.add_argument("--startup-timeout", type=float, default=60)
+    soak_parser.add_argument("--server-log")
+    soak_parser.add_argument("--samples", help="also write the per-second samples here")
+    soak_parser.add_argument("--output")
+
+    startup_parser = commands.add_parser("startup", help="import time and time to first response against a budget")
+    startup_parser.add_argument("--server", choices=("flask", "asgi"), default="flask")
+    startup_parser.add_argument("--host", default="127.0.0.1")
+    startup_parser.add_argument("--port", type=int, default=5056)
+    startup_parser.add_argument("--runs", type=int, default=3, help="best of this many cold starts")
+    startup_parser.add_argument("--import-budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    startup_parser.add_argument("--serve-budget", type=float, default=SERVE_BUDGET_S, help="seconds")
+    startup_parser.add_argument("--startup-timeout", type=float, default=60)
+    startup_parser.add_argument("--server-log")
+    startup_parser.add_argument("--output")
+
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=10.0, help="percent")
+
+    args = parser.parse_args()
+    if args.command == "soak":
+        soak(args)
+    elif args.command == "startup":
+        sys.exit(0 if startup(args) else 1)
+    else:
+        sys.exit(1 if compare(args.old, args.new, args.threshold) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,459 @@
+import os
+import time
+import asyncio
+import threading
+import logging
+import weakref
+import itertools
+from collections import OrderedDict, deque
+
+from frames import FRAME_RATE
+from metrics import Gauge
+
+logger = logging.getLogger(__name__)
+
+# Slow consumer policies
+DROP_OLDEST = "drop_oldest"   # bounded FIFO, oldest pending event is discarded
+COALESCE = "coalesce"         # keep only the latest pending event per key (e.g. per MAC)
+
+POLICIES = (DROP_OLDEST, COALESCE)
+
+# Recent events kept per hub for Last-Event-ID resume
+EVENT_LOG_SIZE = int(os.environ.get("EVENT_LOG_SIZE", 10000))
+# Seconds a replay keeps running after its last client left, so a quick reconnect resumes instead of restarting
+HUB_LINGER = float(os.environ.get("HUB_LINGER", 30))
+
+
+# Hubs and per-client streams (e.g. /stream/machine) are counted where the
+# counts already are and only summed up when /metrics is scraped
+_hubs = weakref.WeakSet()
+_stream_events = {}
+
+
+def event_type(message):
+    """'event: update\\ndata: ...' -> 'update'."""
+    return message[7:message.find("\n")] if message.startswith("event: ") else "message"
+
+
+def count_event(stream, message):
+    """Count an event sent by a stream that has no hub."""
+    key = (stream, event_type(message))
+    _stream_events[key] = _stream_events.get(key, 0) + 1
+
+
+def _events_published():
+    counts = dict(_stream_events)
+    for hub in list(_hubs):
+        typed = dict(hub.event_counts)
+        if hub.keyed_event is not None:
+            counts[(hub.name, hub.keyed_event)] = hub.published - sum(typed.values())
+        counts.update(((hub.name, event), count) for event, count in typed.items())
+    return counts
+
+
+Gauge("sse_events_published_total", "Events published per stream and event type", _events_published,
+      ("stream", "event"), kind="counter")
+Gauge("sse_events_dropped_total", "Events dropped or coalesced away for slow clients",
+      lambda: {(hub.name,): hub.dropped_total() for hub in list(_hubs)}, ("stream",), kind="counter")
+Gauge("sse_subscribers", "Connected SSE clients per hub",
+      lambda: {(hub.name,): hub.subscriber_count() for hub in list(_hubs)}, ("stream",))
+
+
+def with_id(event_id, message):
+    return f"id: {event_id}\n{message}"
+
+
+def parse_event_id(value):
+    """Last-Event-ID header / ?lastEventId= to an int, None if absent or not ours."""
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+class Subscription:
+    """
+    One SSE client. Holds a bounded queue of pre-encoded messages. With
+    resync set, an overflowing queue is replaced by resync() (a fresh
+    snapshot) instead of silently losing deltas.
+    """
+
+    def __init__(self, hub, maxsize, policy, resync=None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown slow consumer policy: {policy}")
+        self.hub = hub
+        self.maxsize = maxsize
+        self.policy = policy
+        self.resync = resync
+        self.dropped = 0
+        self.closed = False
+        self.finished = False
+        self.backlog = deque()   # missed events replayed on resume, ahead of (and outside) the bound
+        self._pending = OrderedDict()
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def put(self, key, message):
+        with self._cond:
+            if self.closed:
+                return
+            if self.policy == COALESCE and key is not None:
+                slot = ("k", key)
+                if slot in self._pending:
+                    # Replace the stale position, the client only needs the latest one
+                    del self._pending[slot]
+                    self.dropped += 1
+            else:
+                slot = ("n", next(self._seq))
+            self._pending[slot] = message
+            if len(self._pending) > self.maxsize and self.resync is not None:
+                self.dropped += len(self._pending)
+                self._pending.clear()
+                self._pending[slot] = self.resync()
+            while len(self._pending) > self.maxsize:
+                self._pending.popitem(last=False)
+                self.dropped += 1
+            self._cond.notify()
+        self._wakeup()
+
+    def _wakeup(self):
+        pass
+
+    def get(self, timeout=None):
+        """Return the next message, or None on timeout / close."""
+        with self._cond:
+            if self.backlog and not self.closed:
+                return self.backlog.popleft()
+            if not self._pending and not (self.closed or self.finished):
+                self._cond.wait(timeout)
+            if self._pending:
+                return self._pending.popitem(last=False)[1]
+            return None
+
+    def finish(self):
+        # Source ended: let the client drain what is pending, then stop
+        with self._cond:
+            self.finished = True
+            self._cond.notify_all()
+        self._wakeup()
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._pending.clear()
+            self._cond.notify_all()
+        self._wakeup()
+        self.hub.unsubscribe(self)
+
+    def __iter__(self):
+        while not self.closed:
+            message = self.get(timeout=1.0)
+            if message is not None:
+                yield message
+            elif self.finished:
+                return
+
+
+class Hub:
+    """
+    Fan-out for a single source. The producer runs in one background thread
+    while at least one client is subscribed and calls hub.publish() for every
+    event, so the source file is read and encoded once no matter how many
+    clients are connected. With producer=None the hub is fed from outside
+    (e.g. live ingestion) and no thread is started.
+
+    Hubs with a FrameCoalescer (frames.py) also serve compact subscribers:
+    they get a snapshot, then one delta frame every 1 / frame_rate seconds,
+    plus only the events published with compact=True (e.g. errors).
+
+    Every published event gets an increasing `id:` and is kept in a log of
+    the last EVENT_LOG_SIZE events, so a client reconnecting with
+    Last-Event-ID is sent what it missed instead of starting over. IDs start
+    from the wall clock in microseconds, so they keep increasing across
+    server restarts. An ID older than the log, or one this hub never issued,
+    gets a `snapshot` event with the current tag state instead.
+    """
+
+    def __init__(self, name, producer, maxsize=256, policy=DROP_OLDEST, frames=None, frame_rate=FRAME_RATE,
+                 log_size=EVENT_LOG_SIZE, linger=HUB_LINGER):
+        self.name = name
+        self.producer = producer
+        self.maxsize = maxsize
+        self.policy = policy
+        self.frames = frames
+        self.frame_interval = 1.0 / frame_rate
+        self.linger = linger
+        self.published = 0
+        # Unkeyed (rare: violations, errors) events per type; keyed ones are all keyed_event
+        self.event_counts = {}
+        self.keyed_event = None
+        self.dropped = 0   # by subscriptions that already left
+        self.last_event_id = time.time_ns() // 1000
+        self._log = deque(maxlen=log_size)
+        self._idle_since = None
+        self._subscribers = set()
+        self._compact = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._flusher = None
+        _hubs.add(self)
+
+    @property
+    def active(self):
+        if self._subscribers or self._compact:
+            return True
+        # Keep going for a while after the last client left, so it can resume
+        return self._idle_since is not None and time.monotonic() - self._idle_since < self.linger
+
+    def subscriber_count(self):
+        return len(self._subscribers) + len(self._compact)
+
+    def dropped_total(self):
+        return self.dropped + sum(sub.dropped for sub in list(self._subscribers) + list(self._compact))
+
+    def subscribe(self, maxsize=None, policy=None, compact=False, last_event_id=None):
+        with self._lock:
+            if compact:
+                # A snapshot is the resume point for compact clients
+                sub = self._subscribe_compact(Subscription, maxsize)
+            else:
+                sub = Subscription(self, maxsize or self.maxsize, policy or self.policy)
+                self._resume(sub, last_event_id)
+                self._subscribers.add(sub)
+            self._idle_since = None
+            self._ensure_running()
+        logger.info("%s: client subscribed (%d connected)", self.name, self.subscriber_count())
+        return sub
+
+    def _resume(self, sub, last_event_id):
+        # Caller holds self._lock, so nothing is published between the backlog and the live queue
+        if last_event_id is None or last_event_id == self.last_event_id:
+            return
+        if self._log and self._log[0][0] - 1 <= last_event_id < self.last_event_id:
+            sub.backlog.extend(message for event_id, message in self._log if event_id > last_event_id)
+            return
+        logger.info("%s: event %d is expired or unknown, resyncing", self.name, last_event_id)
+        self._resync(sub)
+
+    def _resync(self, sub):
+        # Caller holds self._lock
+        if self.frames is None:
+            # No tag state to start over from: the log is the best there is
+            sub.backlog.extend(message for _, message in self._log)
+            return
+        self._flush_frames()
+        sub.backlog.append(with_id(self.last_event_id, self.frames.snapshot()))
+
+    def snapshot(self):
+        """(tag state, last event id) with every event up to that id folded into the state."""
+        with self._lock:
+            last_event_id = self.last_event_id
+            if self.frames is None:
+                return {}, last_event_id
+            self._flush_frames()
+            return self.frames.state(), last_event_id
+
+    def _subscribe_compact(self, cls, maxsize):
+        # Caller holds self._lock, so no frame is flushed between the snapshot and the first delta
+        if self.frames is None:
+            raise ValueError(f"{self.name} has no frame coalescer for compact subscribers")
+        sub = cls(self, maxsize or self.maxsize, DROP_OLDEST, resync=self.frames.snapshot)
+        self._flush_frames()
+        sub.put(None, self.frames.snapshot())
+        self._compact.add(sub)
+        self._ensure_flushing()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+            self._compact.discard(sub)
+            self.dropped += sub.dropped
+            if not self.active:
+                self._idle_since = time.monotonic()
+        logger.info("%s: client left (%d connected, %d dropped)", self.name, self.subscriber_count(), sub.dropped)
+
+    def publish(self, key, message, compact=False):
+        # Numbering, logging and the subscriber list change together, so a resuming client sees each event once
+        with self._lock:
+            self.published += 1
+            # Keyed events are the per-tag updates; parsing only the rare others keeps this off the hot path
+            if key is None:
+                event = event_type(message)
+                self.event_counts[event] = self.event_counts.get(event, 0) + 1
+            elif self.keyed_event is None:
+                self.keyed_event = event_type(message)
+            self.last_event_id += 1
+            message = with_id(self.last_event_id, message)
+            self._log.append((self.last_event_id, message))
+            subscribers = list(self._subscribers)
+            if compact:
+                subscribers += self._compact
+        for sub in subscribers:
+            sub.put(key, message)
+
+    def finish(self):
+        """End every current subscription, e.g. after the source failed."""
+        with self._lock:
+            subscribers = list(self._subscribers) + list(self._compact)
+            self._subscribers.clear()
+            self._compact.clear()
+        for sub in subscribers:
+            sub.finish()
+
+    def _flush_frames(self):
+        # Caller holds self._lock
+        message = self.frames.flush()
+        if message is not None:
+            for sub in self._compact:
+                sub.put(None, message)
+
+    def _reset_frames(self):
+        # Caller holds self._lock. The producer stopped, so its tag state is
+        # stale; a restarted replay rebuilds it from the first row
+        if self.frames is None:
+            return
+        self.frames.reset()
+        for sub in self._compact:
+            sub.put(None, self.frames.snapshot())
+
+    def _ensure_flushing(self):
+        # Caller holds self._lock
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_loop, name=f"frames-{self.name}", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        try:
+            while True:
+                time.sleep(self.frame_interval)
+                with self._lock:
+                    if not self._compact:
+                        self._flusher = None
+                        return
+                    try:
+                        self._flush_frames()
+                    except Exception as e:
+                        logger.error("%s: frame flush failed: %s", self.name, e)
+        finally:
+            with self._lock:
+                # Still registered means the loop died: let the next flush start a new one
+                if self._flusher is threading.current_thread():
+                    self._flusher = None
+                    if self._compact:
+                        self._ensure_flushing()
+
+    def _ensure_running(self):
+        # Caller holds self._lock
+        if self._thread is None and self.producer is not None:
+            self._thread = threading.Thread(target=self._run, name=f"hub-{self.name}", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        try:
+            self.producer(self)
+        except Exception as e:
+            logger.error("%s: ingest loop failed: %s", self.name, e)
+            self.finish()
+        finally:
+            with self._lock:
+                self._thread = None
+                self._reset_frames()
+                # A client may have subscribed while the producer was exiting
+                if self._subscribers or self._compact:
+                    self._ensure_running()
+
+
+class AsyncSubscription(Subscription):
+    """Subscription consumed from an asyncio event loop instead of a thread."""
+
+    def __init__(self, hub, maxsize, policy, resync=None):
+        super().__init__(hub, maxsize, policy, resync)
+        self._ready = asyncio.Event()
+
+    def _wakeup(self):
+        self._ready.set()
+
+    async def aget(self, timeout=None):
+        """Return the next message, or None on timeout / close."""
+        if self.backlog and not self.closed:
+            return self.backlog.popleft()
+        if not self._pending and not (self.closed or self.finished):
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        with self._cond:
+            if self._pending:
+                return self._pending.popitem(last=False)[1]
+            return None
+
+    async def __aiter__(self):
+        while not self.closed:
+            message = await self.aget(timeout=1.0)
+            if message is not None:
+                yield message
+            elif self.finished:
+                return
+
+
+class AsyncHub(Hub):
+    """
+    Same fan-out as Hub, but the producer is a coroutine running as a task on
+    the event loop. Publishing and consuming both happen on the loop thread.
+    """
+
+    def __init__(self, name, producer, maxsize=256, policy=DROP_OLDEST, frames=None, frame_rate=FRAME_RATE):
+        super().__init__(name, producer, maxsize, policy, frames, frame_rate)
+        self._task = None
+
+    def subscribe(self, maxsize=None, policy=None, compact=False, last_event_id=None):
+        if compact:
+            sub = self._subscribe_compact(AsyncSubscription, maxsize)
+        else:
+            sub = AsyncSubscription(self, maxsize or self.maxsize, policy or self.policy)
+            self._resume(sub, last_event_id)
+            self._subscribers.add(sub)
+        self._idle_since = None
+        self._ensure_running()
+        logger.info("%s: client subscribed (%d connected)", self.name, self.subscriber_count())
+        return sub
+
+    def _ensure_flushing(self):
+        if self._flusher is None:
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        try:
+            while True:
+                await asyncio.sleep(self.frame_interval)
+                if not self._compact:
+                    self._flusher = None
+                    return
+                try:
+                    self._flush_frames()
+                except Exception as e:
+                    logger.error("%s: frame flush failed: %s", self.name, e)
+        finally:
+            if self._flusher is asyncio.current_task():
+                self._flusher = None
+
+    def _ensure_running(self):
+        if self._task is None and self.producer is not None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        try:
+            await self.producer(self)
+        except asyncio.CancelledError:
+            self._task = None
+            raise
+        except Exception as e:
+            logger.error("%s: ingest loop failed: %s", self.name, e)
+            self.finish()
+        self._task = None
+        self._reset_frames()
+        # A client may have subscribed while the producer was exiting
+        if self._subscribers or self._compact:
+            self._ensure_running()
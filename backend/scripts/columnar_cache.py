@@ -0,0 +1,251 @@
+"""
+Columnar binary cache for the JSON datasets in backend/data.
+
+Each JSON array file is converted once into a directory of .npy columns
+(numbers as int64/float64/bool, strings such as MAC addresses as int32 codes
+into a dictionary, nullable int/bool columns with a .mask.npy of nulls) plus
+a manifest recording the source file's path, size and mtime. The cache
+directory is named after the source file and a hash of its full path, so
+files with the same name in different directories do not collide. Loaders memory-map the columns, so opening a cached dataset costs no
+parsing and no copies. If the source JSON changed after the cache was built
+the cache is ignored and callers fall back to reading the JSON.
+
+    python columnar_cache.py build                  # every JSON array in ../data
+    python columnar_cache.py build ../data/rtls.json
+"""
+import os
+import json
+import hashlib
+import logging
+
+import numpy as np
+
+from record_reader import RecordReader
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.environ.get("COLUMNAR_CACHE_DIR", "../data/.cache")
+MANIFEST = "manifest.json"
+BATCH_SIZE = 1024
+
+
+def cache_path(source, cache_dir=CACHE_DIR):
+    source = os.path.abspath(source)
+    digest = hashlib.sha1(source.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(cache_dir, f"{os.path.basename(source)}-{digest}")
+
+
+def _source_stamp(source):
+    stat = os.stat(source)
+    return {"source_size": stat.st_size, "source_mtime_ns": stat.st_mtime_ns}
+
+
+def _column_kind(values):
+    kinds = {type(v) for v in values if v is not None}
+    if not kinds:
+        return "float", True
+    if kinds <= {bool}:
+        return "bool", None in values
+    if kinds <= {int}:
+        return "int", None in values
+    if kinds <= {int, float}:
+        return "float", None in values
+    if kinds <= {str}:
+        return "str", None in values
+    raise ValueError(f"Unsupported mixed column types: {sorted(k.__name__ for k in kinds)}")
+
+
+def build_cache(source, cache_dir=CACHE_DIR):
+    """Convert one JSON array / NDJSON file. Returns the number of rows written."""
+    with RecordReader(source) as reader:
+        rows = list(reader.records())
+    stamp = _source_stamp(source)
+    if not all(isinstance(row, dict) for row in rows):
+        raise ValueError("Only arrays of JSON objects can be cached")
+
+    names = []
+    for row in rows:
+        for name in row:
+            if name not in names:
+                names.append(name)
+
+    target = cache_path(source, cache_dir)
+    os.makedirs(target, exist_ok=True)
+    columns = {}
+    for i, name in enumerate(names):
+        values = [row.get(name) for row in rows]
+        kind, nullable = _column_kind(values)
+        file_name = f"c{i}.npy"
+        meta = {"file": file_name, "kind": kind, "nullable": nullable}
+        if nullable and kind in ("int", "bool"):
+            # Keep the dtype: nulls are stored as 0 / False and flagged in a mask
+            meta["mask"] = f"c{i}.mask.npy"
+            np.save(os.path.join(target, meta["mask"]), np.array([v is None for v in values], dtype=np.bool_))
+            values = [0 if v is None else v for v in values]
+        if kind == "str":
+            dictionary = sorted({v for v in values if v is not None})
+            lookup = {v: code for code, v in enumerate(dictionary)}
+            array = np.array([lookup[v] if v is not None else -1 for v in values], dtype=np.int32)
+            meta["dictionary"] = dictionary
+        elif kind == "float":
+            array = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        elif kind == "int":
+            array = np.array(values, dtype=np.int64)
+        else:
+            array = np.array(values, dtype=np.bool_)
+        np.save(os.path.join(target, file_name), array)
+        columns[name] = meta
+
+    # Manifest last: a half-written cache has no manifest and is never used
+    with open(os.path.join(target, MANIFEST), "w") as file:
+        json.dump({"source": os.path.abspath(source), "rows": len(rows), "columns": columns, **stamp}, file)
+    return len(rows)
+
+
+class ColumnarTable:
+    """
+    Memory-mapped columns of one dataset. Iterating yields (record, offset)
+    like RecordReader, with offset = row number, so the stream replay code
+    can use either.
+    """
+
+    def __init__(self, path, manifest):
+        self.path = path
+        self.rows = manifest["rows"]
+        self.size = self.rows
+        self._meta = manifest["columns"]
+        self._columns = {name: np.load(os.path.join(path, meta["file"]), mmap_mode="r")
+                         for name, meta in self._meta.items()}
+        self._masks = {name: np.load(os.path.join(path, meta["mask"]), mmap_mode="r")
+                       for name, meta in self._meta.items() if "mask" in meta}
+        self._dictionaries = {name: np.array(meta["dictionary"], dtype=object)
+                              for name, meta in self._meta.items() if meta["kind"] == "str"}
+        # Dictionary plus a trailing None, so code -1 decodes to None
+        self._decode = {name: np.append(values, None) for name, values in self._dictionaries.items()}
+
+    def __len__(self):
+        return self.rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def close(self):
+        pass
+
+    @property
+    def names(self):
+        return list(self._meta)
+
+    def column(self, name):
+        """Zero-copy view; string columns are returned as dictionary codes (-1 = null)."""
+        return self._columns[name]
+
+    def mask(self, name):
+        """True where a nullable int/bool column is null, None for other columns."""
+        return self._masks.get(name)
+
+    def dictionary(self, name):
+        return self._dictionaries[name]
+
+    def strings(self, name):
+        """String column decoded to an object array (None for nulls)."""
+        return self._decode[name][self._columns[name]]
+
+    def _python_slice(self, name, start, stop):
+        meta = self._meta[name]
+        if meta["kind"] == "str":
+            return self._decode[name][self._columns[name][start:stop]].tolist()
+        values = self._columns[name][start:stop].tolist()
+        if name in self._masks:
+            values = [None if null else v for v, null in zip(values, self._masks[name][start:stop].tolist())]
+        elif meta["nullable"]:
+            values = [None if v != v else v for v in values]   # NaN -> None
+        return values
+
+    def batches(self, size=BATCH_SIZE):
+        for start in range(0, self.rows, size):
+            stop = min(start + size, self.rows)
+            slices = {name: self._python_slice(name, start, stop) for name in self._meta}
+            batch = []
+            for i in range(stop - start):
+                # Null / missing values are left out of the record
+                record = {name: values[i] for name, values in slices.items() if values[i] is not None}
+                batch.append((record, start + i + 1))
+            yield batch
+
+    def __iter__(self):
+        for batch in self.batches():
+            yield from batch
+
+    def records(self):
+        for record, _ in self:
+            yield record
+
+    def _frame_column(self, name, pd):
+        meta = self._meta[name]
+        if meta["kind"] == "str":
+            return self.strings(name)
+        if name in self._masks:
+            # Nullable Int64 / boolean instead of falling back to float
+            array = pd.arrays.IntegerArray if meta["kind"] == "int" else pd.arrays.BooleanArray
+            return array(np.array(self._columns[name]), np.array(self._masks[name]))
+        return self._columns[name]
+
+    def to_frame(self):
+        import pandas as pd
+
+        return pd.DataFrame({name: self._frame_column(name, pd) for name in self._meta})
+
+
+def open_table(source, cache_dir=CACHE_DIR):
+    """ColumnarTable for source if a fresh cache exists, else None."""
+    path = cache_path(source, cache_dir)
+    try:
+        with open(os.path.join(path, MANIFEST), "r") as file:
+            manifest = json.load(file)
+        stamp = _source_stamp(source)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if manifest.get("source") != os.path.abspath(source):
+        logger.info("Columnar cache at %s was built from %s, not %s", path, manifest.get("source"), source)
+        return None
+    if any(manifest.get(key) != value for key, value in stamp.items()):
+        logger.info("Columnar cache for %s is stale, reading JSON", source)
+        return None
+    return ColumnarTable(path, manifest)
+
+
+def open_records(source, cache_dir=CACHE_DIR):
+    """The cached table when fresh, otherwise an incremental RecordReader over the JSON."""
+    table = open_table(source, cache_dir)
+    return table if table is not None else RecordReader(source)
+
+
+def read_frame(source, cache_dir=CACHE_DIR):
+    """DataFrame for offline scripts, from the cache when fresh."""
+    table = open_table(source, cache_dir)
+    if table is not None:
+        return table.to_frame()
+    import pandas as pd
+
+    return pd.read_json(source)
+
+
+if __name__ == "__main__":
+    import sys
+    import glob
+
+    if len(sys.argv) < 2 or sys.argv[1] != "build":
+        print(__doc__)
+        sys.exit(1)
+    sources = sys.argv[2:] or sorted(glob.glob("../data/*.json"))
+    for source in sources:
+        try:
+            rows = build_cache(source)
+        except (ValueError, json.JSONDecodeError) as e:
+            print(f"skipped {source}: {e}")
+            continue
+        print(f"{source}: {rows} rows -> {cache_path(source)}")
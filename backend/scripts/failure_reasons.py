@@ -0,0 +1,149 @@
+"""
+Failure-reason rules for machine rows, shared by app.py and the training script.
+
+The first rule that matches wins:
+
+    error1..error5 > 0            "Error codes: error1, error3"
+    comp1..comp4 > 0              "Maintenance on: component 1, component 4"
+    vibrationmean_24h > 45        "High vibration"
+    voltmean_24h > 180            "High voltage"
+    pressuremean_24h > 110        "High pressure"
+    rotatemean_24h > 500          "High rotation speed"
+    otherwise                     "Unknown or general wear"
+
+A reason is a small integer code: the error and component rules carry a bit
+per active column, so every combination has its own code. reason_codes()
+evaluates the rules over whole columns with NumPy masks; reason_code() does
+the same for one row. The text is only looked up (reason_text / reason_texts)
+when a reason is serialized, and missing columns never match.
+
+    python failure_reasons.py --bench    row-wise DataFrame.apply vs reason_codes
+
+tests/test_failure_reasons.py checks the rules against a copy of the
+row-wise function app.py and the training script used before.
+"""
+import numpy as np
+
+ERROR_COLUMNS = ("error1", "error2", "error3", "error4", "error5")
+COMP_COLUMNS = ("comp1", "comp2", "comp3", "comp4")
+THRESHOLDS = (
+    ("vibrationmean_24h", 45, "High vibration"),
+    ("voltmean_24h", 180, "High voltage"),
+    ("pressuremean_24h", 110, "High pressure"),
+    ("rotatemean_24h", 500, "High rotation speed"),
+)
+
+GENERAL_WEAR = 0
+# ERROR_CODE + bitmask of the active error columns, COMP_CODE + bitmask of the components
+ERROR_CODE = 0
+COMP_CODE = 2 ** len(ERROR_COLUMNS)
+THRESHOLD_CODE = COMP_CODE + 2 ** len(COMP_COLUMNS)
+
+
+def _reason_table():
+    reasons = ["Unknown or general wear"]
+    for mask in range(1, 2 ** len(ERROR_COLUMNS)):
+        active = [col for i, col in enumerate(ERROR_COLUMNS) if mask >> i & 1]
+        reasons.append(f"Error codes: {', '.join(active)}")
+    reasons.append(reasons[GENERAL_WEAR])   # COMP_CODE + 0 is never produced
+    for mask in range(1, 2 ** len(COMP_COLUMNS)):
+        active = [col.replace("comp", "component ") for i, col in enumerate(COMP_COLUMNS) if mask >> i & 1]
+        reasons.append(f"Maintenance on: {', '.join(active)}")
+    reasons += [text for _, _, text in THRESHOLDS]
+    return reasons
+
+
+REASONS = _reason_table()
+_REASON_ARRAY = np.array(REASONS, dtype=object)
+
+
+def reason_code(row):
+    """Code of one row (a dict or anything with `in` and [])."""
+    mask = 0
+    for i, col in enumerate(ERROR_COLUMNS):
+        if col in row and row[col] > 0:
+            mask |= 1 << i
+    if mask:
+        return ERROR_CODE + mask
+    for i, col in enumerate(COMP_COLUMNS):
+        if col in row and row[col] > 0:
+            mask |= 1 << i
+    if mask:
+        return COMP_CODE + mask
+    for i, (col, limit, _) in enumerate(THRESHOLDS):
+        if col in row and row[col] > limit:
+            return THRESHOLD_CODE + i
+    return GENERAL_WEAR
+
+
+def _bitmask(columns, names, n):
+    mask = np.zeros(n, dtype=np.int16)
+    for i, col in enumerate(names):
+        if col in columns:
+            mask |= (np.asarray(columns[col], dtype=np.float64) > 0).astype(np.int16) << i
+    return mask
+
+
+def reason_codes(columns, n=None):
+    """
+    int16 code per row for column arrays: a DataFrame or a dict of equal-length
+    arrays (pass n when none of the rule columns is present).
+    """
+    if n is None:
+        present = [col for col in ERROR_COLUMNS + COMP_COLUMNS + tuple(t[0] for t in THRESHOLDS) if col in columns]
+        n = len(columns[present[0]]) if present else len(columns)
+    errors = _bitmask(columns, ERROR_COLUMNS, n)
+    comps = _bitmask(columns, COMP_COLUMNS, n)
+    conditions = [errors > 0, comps > 0]
+    choices = [ERROR_CODE + errors, COMP_CODE + comps]
+    for i, (col, limit, _) in enumerate(THRESHOLDS):
+        if col in columns:
+            conditions.append(np.asarray(columns[col], dtype=np.float64) > limit)
+            choices.append(np.full(n, THRESHOLD_CODE + i, dtype=np.int16))
+    return np.select(conditions, choices, default=GENERAL_WEAR).astype(np.int16)
+
+
+def reason_text(code):
+    return REASONS[code]
+
+
+def reason_texts(codes):
+    """Object array of texts for an array of codes."""
+    return _REASON_ARRAY[np.asarray(codes, dtype=np.intp)]
+
+
+def infer_failure_reason(row):
+    return REASONS[reason_code(row)]
+
+
+def benchmark(rows=200_000, seed=0):
+    import time
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({col: (rng.random(rows) < 0.02).astype(np.int64) for col in ERROR_COLUMNS + COMP_COLUMNS})
+    for col, limit, _ in THRESHOLDS:
+        frame[col] = rng.normal(limit * 0.9, limit * 0.06, rows)
+
+    start = time.perf_counter()
+    expected = frame.apply(infer_failure_reason, axis=1)
+    row_wise = time.perf_counter() - start
+    start = time.perf_counter()
+    codes = reason_codes(frame)
+    vectorized = time.perf_counter() - start
+    texts = reason_texts(codes)
+    mismatched = int((texts != expected.to_numpy()).sum())
+    # reason_code against reason_codes; parity with the original function is in the tests
+    print(f"rows: {rows}, distinct reasons {len(np.unique(codes))}, row-wise vs vectorized mismatched {mismatched}")
+    print(f"DataFrame.apply:  {rows / row_wise:12.0f} rows/s")
+    print(f"reason_codes:     {rows / vectorized:12.0f} rows/s ({row_wise / vectorized:.0f}x)")
+    return mismatched == 0
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "--bench" in sys.argv:
+        sys.exit(0 if benchmark() else 1)
+    else:
+        print(__doc__)
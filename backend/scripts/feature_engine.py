@@ -0,0 +1,357 @@
+"""
+RUL model features from raw machine telemetry, updated one reading at a time.
+
+Each machine keeps a ring of FEATURE_SLOT_SECONDS time slots covering 24 h.
+A slot holds the reading count, the sums and sums of squares of volt /
+rotate / pressure / vibration (shifted by the machine's first reading, so
+the variance does not lose precision) and the error counts. Running totals
+are updated as readings arrive and slots fall out of the window, so an
+update is O(1) and memory per machine is fixed whatever the reading rate.
+
+The features follow sample_rul.csv, one row per machine and cycle (day):
+
+    *mean_24h / *sd_24h   mean and sample sd of the readings in the last 24 h
+    *mean_5d / *sd_5d     mean and sample sd of the last 5 daily 24h means
+                          (the 4 completed cycles before this one plus the current 24 h)
+    time_in_cycles        cycles since the machine's first reading, from 1
+    error1..error5        errors reported in the last 24 h
+
+comp1..comp4, age, model_encoded and DI do not come from telemetry and are
+set with set_state().
+
+    python feature_engine.py --bench    readings per second
+
+tests/test_feature_engine.py compares the features with pandas rolling
+windows on synthetic telemetry.
+"""
+import os
+import math
+import datetime
+import threading
+import logging
+
+import numpy as np
+
+from ingest import is_number
+
+logger = logging.getLogger(__name__)
+
+FEATURE_SLOT_SECONDS = int(os.environ.get("FEATURE_SLOT_SECONDS", 300))
+WINDOW_SECONDS = 24 * 3600
+CYCLE_SECONDS = 24 * 3600
+DAILY_MEANS = 5
+
+SENSORS = ("volt", "rotate", "pressure", "vibration")
+ERRORS = ("error1", "error2", "error3", "error4", "error5")
+STATE_FEATURES = ("comp1", "comp2", "comp3", "comp4", "age", "model_encoded", "DI")
+
+# Slot columns: count, sum per sensor, sum of squares per sensor, count per error
+_SUM = slice(1, 1 + len(SENSORS))
+_SQUARES = slice(_SUM.stop, _SUM.stop + len(SENSORS))
+_ERRORS = slice(_SQUARES.stop, _SQUARES.stop + len(ERRORS))
+_COLUMNS = _ERRORS.stop
+
+
+def reading_time(row):
+    """Seconds since the epoch: `timestamp` (epoch ms) or ISO `datetime` (UTC when naive)."""
+    timestamp = row.get("timestamp")
+    if isinstance(timestamp, (int, float)):
+        return timestamp / 1000
+    value = row.get("datetime")
+    if not value:
+        return None
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.timestamp()
+
+
+def error_index(error):
+    """0..4 for "error1".."error5" (or errorID 1..5)."""
+    index = ERRORS.index(error) if isinstance(error, str) else int(error) - 1
+    if not 0 <= index < len(ERRORS):
+        raise ValueError(f"Unknown error {error!r}")
+    return index
+
+
+class MachineWindow:
+    """Window state of one machine; FeatureEngine does the locking."""
+
+    def __init__(self, slot_seconds, first_values):
+        self.slot_seconds = slot_seconds
+        self.n_slots = -(-WINDOW_SECONDS // slot_seconds)
+        self.ring = np.zeros((self.n_slots, _COLUMNS))
+        self.totals = np.zeros(_COLUMNS)
+        self.shift = np.array(first_values, dtype=np.float64)
+        self.slot = None          # newest slot number (time // slot_seconds)
+        self.cycle = None         # cycle of the newest reading
+        self.first_cycle = None
+        # Completed cycles' 24h means, oldest first
+        self.daily = np.full((DAILY_MEANS - 1, len(SENSORS)), np.nan)
+        self.late = 0
+        self.state = {}
+
+    def _advance(self, slot):
+        """Make `slot` the newest one, clearing the slots that leave the window."""
+        if self.slot is None:
+            self.slot = slot
+            return
+        gap = slot - self.slot
+        if gap <= 0:
+            return
+        if gap >= self.n_slots:
+            self.ring[:] = 0
+            self.totals[:] = 0
+        else:
+            expired = np.arange(self.slot + 1, slot + 1) % self.n_slots
+            self.totals -= self.ring[expired].sum(axis=0)
+            self.ring[expired] = 0
+        self.slot = slot
+
+    def _close_cycles(self, cycle):
+        """Store the 24h means at every cycle boundary up to `cycle` (days without readings are skipped)."""
+        if self.cycle is None:
+            self.cycle = self.first_cycle = cycle
+            return
+        # Only the last DAILY_MEANS boundaries can still matter
+        for boundary in range(max(self.cycle + 1, cycle - DAILY_MEANS + 1), cycle + 1):
+            self._advance(boundary * CYCLE_SECONDS // self.slot_seconds - 1)
+            if self.totals[0] > 0:
+                self.daily = np.roll(self.daily, -1, axis=0)
+                self.daily[-1] = self.shift + self.totals[_SUM] / self.totals[0]
+        if cycle > self.cycle:
+            # Subtracting expired slots leaves rounding residue; start each cycle from exact totals
+            self.totals = self.ring.sum(axis=0)
+            self.cycle = cycle
+
+    def _slot_for(self, t):
+        slot = int(t // self.slot_seconds)
+        cycle = int(t // CYCLE_SECONDS)
+        if self.slot is not None and slot <= self.slot - self.n_slots:
+            # Older than the window
+            self.late += 1
+            return None
+        if self.cycle is None or cycle > self.cycle:
+            self._close_cycles(cycle)
+        self._advance(slot)
+        return slot % self.n_slots
+
+    def add(self, t, values):
+        index = self._slot_for(t)
+        if index is None:
+            return False
+        shifted = np.asarray(values, dtype=np.float64) - self.shift
+        row = np.zeros(_COLUMNS)
+        row[0] = 1
+        row[_SUM] = shifted
+        row[_SQUARES] = shifted * shifted
+        self.ring[index] += row
+        self.totals += row
+        return True
+
+    def add_error(self, t, error):
+        index = self._slot_for(t)
+        if index is None:
+            return False
+        self.ring[index, _ERRORS.start + error] += 1
+        self.totals[_ERRORS.start + error] += 1
+        return True
+
+    def features(self):
+        n = self.totals[0]
+        sums = self.totals[_SUM]
+        mean_24h = self.shift + sums / n if n else np.full(len(SENSORS), np.nan)
+        if n > 1:
+            sd_24h = np.sqrt(np.maximum(self.totals[_SQUARES] - sums * sums / n, 0) / (n - 1))
+        else:
+            sd_24h = np.full(len(SENSORS), np.nan)
+        daily = np.vstack([self.daily, mean_24h])
+        daily = daily[~np.isnan(daily[:, 0])]
+        mean_5d = daily.mean(axis=0) if len(daily) else np.full(len(SENSORS), np.nan)
+        sd_5d = daily.std(axis=0, ddof=1) if len(daily) > 1 else np.full(len(SENSORS), np.nan)
+
+        features = {"time_in_cycles": self.cycle - self.first_cycle + 1 if self.cycle is not None else 0}
+        for i, sensor in enumerate(SENSORS):
+            features[f"{sensor}mean_24h"] = float(mean_24h[i])
+            features[f"{sensor}sd_24h"] = float(sd_24h[i])
+            features[f"{sensor}mean_5d"] = float(mean_5d[i])
+            features[f"{sensor}sd_5d"] = float(sd_5d[i])
+        for i, error in enumerate(ERRORS):
+            features[error] = int(self.totals[_ERRORS.start + i])
+        features.update(self.state)
+        return features
+
+
+class FeatureEngine:
+    """
+    Rolling features for every machine. add() / add_error() take readings in
+    roughly increasing time order; readings older than the window are
+    counted as late and ignored. row() and vector() are ready for
+    predict_rul / the BatchPredictor.
+    """
+
+    def __init__(self, features_col, slot_seconds=FEATURE_SLOT_SECONDS):
+        self.features_col = list(features_col)
+        self.slot_seconds = slot_seconds
+        self.machines = {}
+        self.readings = 0
+        self.errors = 0
+        self.invalid = 0
+        self._lock = threading.Lock()
+
+    def _window(self, machine_id, values):
+        window = self.machines.get(machine_id)
+        if window is None:
+            window = self.machines[machine_id] = MachineWindow(self.slot_seconds, values)
+        return window
+
+    def add(self, machine_id, t, volt, rotate, pressure, vibration):
+        values = (volt, rotate, pressure, vibration)
+        with self._lock:
+            if self._window(machine_id, values).add(t, values):
+                self.readings += 1
+
+    def add_error(self, machine_id, t, error):
+        """error: "error1".."error5" (or errorID 1..5)."""
+        index = error_index(error)
+        with self._lock:
+            window = self.machines.get(machine_id)
+            if window is None:
+                raise KeyError(f"No telemetry for machine {machine_id} yet")
+            if window.add_error(t, index):
+                self.errors += 1
+
+    def set_state(self, machine_id, **values):
+        unknown = set(values) - set(STATE_FEATURES) - {"time_in_cycles"}
+        if unknown:
+            raise ValueError(f"Not a state feature: {', '.join(sorted(unknown))}")
+        with self._lock:
+            window = self.machines.get(machine_id)
+            if window is None:
+                raise KeyError(f"No telemetry for machine {machine_id} yet")
+            window.state.update(values)
+
+    def add_rows(self, rows):
+        """
+        Telemetry (machineID, datetime or timestamp, volt, rotate, pressure,
+        vibration), error (errorID) and state (comp1.., age, model_encoded,
+        DI) records; one row may carry several. Values must be finite
+        numbers; a row with any invalid part is counted as invalid and none
+        of it is stored. Returns the counts.
+        """
+        accepted = invalid = 0
+        for row in rows:
+            try:
+                machine_id, t, values, error, state = self._parse_row(row)
+            except (KeyError, TypeError, ValueError) as e:
+                logger.debug("Invalid telemetry row %s: %s", row, e)
+                invalid += 1
+                continue
+            if values is not None:
+                self.add(machine_id, t, *values)
+            if error is not None:
+                self.add_error(machine_id, t, error)
+            if state:
+                self.set_state(machine_id, **state)
+            accepted += 1
+        with self._lock:
+            self.invalid += invalid
+        return {"accepted": accepted, "invalid": invalid}
+
+    def _parse_row(self, row):
+        """Checks the whole row before add_rows stores any of it."""
+        machine_id = int(row["machineID"])
+        t = reading_time(row)
+        values = error = None
+        if all(sensor in row for sensor in SENSORS):
+            values = tuple(row[sensor] for sensor in SENSORS)
+            if not all(is_number(value) for value in values):
+                raise ValueError("sensor values must be finite numbers")
+        if row.get("errorID"):
+            error = row["errorID"]
+            error_index(error)
+        state = {key: row[key] for key in STATE_FEATURES if key in row}
+        if not all(is_number(value) for value in state.values()):
+            raise ValueError("state values must be finite numbers")
+        if (values is not None or error is not None) and (t is None or not math.isfinite(t)):
+            raise ValueError("missing time")
+        if values is None and (error is not None or state) and machine_id not in self.machines:
+            raise KeyError(f"No telemetry for machine {machine_id} yet")
+        return machine_id, t, values, error, state
+
+    def row(self, machine_id):
+        """{"machineID", <features>} for machine_id, or None without telemetry."""
+        with self._lock:
+            window = self.machines.get(machine_id)
+            if window is None:
+                return None
+            features = window.features()
+        row = {"machineID": machine_id}
+        for col in self.features_col:
+            row[col] = features.get(col, 0)
+        return row
+
+    def vector(self, machine_id):
+        """Features of machine_id as float32 in features_col order, or None."""
+        row = self.row(machine_id)
+        if row is None:
+            return None
+        return np.array([row[col] for col in self.features_col], dtype=np.float32)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "machines": len(self.machines),
+                "readings": self.readings,
+                "errors": self.errors,
+                "invalid": self.invalid,
+                "late": sum(window.late for window in self.machines.values()),
+                "slot_seconds": self.slot_seconds,
+            }
+
+
+def synthetic_telemetry(machines=3, days=12, interval=60, seed=0):
+    """Per-minute readings around the sample_rul.csv means, with a few gaps."""
+    rng = np.random.default_rng(seed)
+    start = datetime.datetime(2015, 1, 1, tzinfo=datetime.timezone.utc).timestamp()
+    times = start + np.arange(0, days * CYCLE_SECONDS, interval)
+    rows = []
+    for machine_id in range(1, machines + 1):
+        # Drop a few hours so some slots and one whole day stay empty
+        keep = rng.random(len(times)) > 0.02
+        keep[(times >= start + 3 * CYCLE_SECONDS) & (times < start + 4 * CYCLE_SECONDS) & (machine_id == 2)] = False
+        for t in times[keep]:
+            rows.append((machine_id, float(t), *rng.normal((170, 446, 100, 40), (15, 50, 10, 5))))
+    rows.sort(key=lambda row: row[1])
+    return rows
+
+
+def benchmark(readings=200_000):
+    import time
+
+    rows = synthetic_telemetry(machines=100, days=1)[:readings]
+    engine = FeatureEngine(["time_in_cycles"])
+    start = time.perf_counter()
+    for row in rows:
+        engine.add(*row)
+    elapsed = time.perf_counter() - start
+    print(f"add:     {len(rows) / elapsed:10.0f} readings/s ({elapsed / len(rows) * 1e6:.1f} us each)")
+    start = time.perf_counter()
+    for machine_id in range(1, 101):
+        engine.vector(machine_id)
+    elapsed = time.perf_counter() - start
+    print(f"vector:  {100 / elapsed:10.0f} machines/s ({elapsed / 100 * 1e6:.1f} us each)")
+    window = engine.machines[1]
+    print(f"memory:  {window.ring.nbytes + window.daily.nbytes + window.totals.nbytes} bytes per machine")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "--bench" in sys.argv:
+        benchmark()
+    else:
+        print(__doc__)
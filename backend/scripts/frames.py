@@ -0,0 +1,118 @@
+"""
+Coalesced, delta-encoded RTLS frames for `?mode=compact` streams.
+
+Position updates are folded into the latest payload per MAC and flushed at
+FRAME_RATE frames per second. A frame only carries the fields that changed
+since the previous frame, so after the initial snapshot a tag that moved
+costs a MAC and a location. Moves shorter than MIN_MOVE_METERS (RTLS jitter)
+are not sent at all. Zone violations are part of the tag state
+(zone_violation = the restricted zone's company, or null), so compact
+clients see when a violation starts and ends rather than one event per row.
+
+    event: snapshot
+    data: {"t": "<iso time>", "tags": {"<mac>": {"name": ..., "company": ..., "role": ..., "floor": ..., "zone_violation": null, "location": [lat, lng]}}}
+
+    event: frame
+    data: {"t": "<iso time>", "tags": {"<mac>": {"location": [lat, lng]}}}
+"""
+import os
+import math
+import threading
+
+from serialization import dumps, utc_timestamp
+
+FRAME_RATE = float(os.environ.get("FRAME_RATE", 5))
+MIN_MOVE_METERS = float(os.environ.get("MIN_MOVE_METERS", 0.5))
+# 6 decimals of a degree is about 10 cm, well below RTLS accuracy
+LOCATION_DECIMALS = 6
+# Per-tag fields carried in frames; mac_address is the key and timestamp is per frame
+TAG_FIELDS = ("name", "company", "role", "floor", "zone_violation")
+
+METERS_PER_DEGREE = 111_320
+
+
+def distance_meters(a, b):
+    """Equirectangular approximation, plenty for distances inside one site."""
+    lat1, lng1 = a
+    lat2, lng2 = b
+    dx = (lng2 - lng1) * math.cos(math.radians((lat1 + lat2) / 2))
+    return math.hypot(lat2 - lat1, dx) * METERS_PER_DEGREE
+
+
+def compact_location(location):
+    """[lat, lng] rounded to LOCATION_DECIMALS; None if either is missing or not a finite number."""
+    try:
+        lat, lng = float(location[0]), float(location[1])
+    except (TypeError, ValueError, IndexError):
+        return None
+    if not (math.isfinite(lat) and math.isfinite(lng)):
+        return None
+    return [round(lat, LOCATION_DECIMALS), round(lng, LOCATION_DECIMALS)]
+
+
+class FrameCoalescer:
+    """
+    offer() may be called from any thread at any rate; flush() turns what
+    arrived since the last flush into one frame message (or None if nothing
+    changed). snapshot() is the full state as of the last flush, which is
+    what a client needs before it can apply later frames.
+    """
+
+    def __init__(self, min_move=MIN_MOVE_METERS):
+        self.min_move = min_move
+        self.offered = 0
+        self.sent = 0   # per-tag entries written into frames
+        self.suppressed = 0
+        self._pending = {}
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def offer(self, key, payload):
+        with self._lock:
+            self._pending[key] = payload
+            self.offered += 1
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        changes = {}
+        for key, payload in pending.items():
+            tag = {name: payload.get(name) for name in TAG_FIELDS}
+            tag["location"] = compact_location(payload.get("location") or (None, None))
+            previous = self._state.get(key)
+            if previous is None:
+                delta = tag
+            else:
+                delta = {name: value for name, value in tag.items() if value != previous.get(name)}
+                old, new = previous.get("location"), tag["location"]
+                if "location" in delta and old and new and distance_meters(old, new) < self.min_move:
+                    # Jitter: keep the last sent position so slow drift still adds up
+                    del delta["location"]
+                    tag["location"] = old
+            if not delta:
+                self.suppressed += 1
+                continue
+            self._state[key] = tag
+            changes[key] = delta
+        if not changes:
+            return None
+        self.sent += len(changes)
+        return self._message("frame", changes)
+
+    def snapshot(self):
+        return self._message("snapshot", self._state)
+
+    def reset(self):
+        """Forget every tag, e.g. when the replay feeding it starts over."""
+        with self._lock:
+            self._pending = {}
+            self._state = {}
+
+    def state(self):
+        return dict(self._state)
+
+    def stats(self):
+        return {"tags": len(self._state), "offered": self.offered, "sent": self.sent, "suppressed": self.suppressed}
+
+    def _message(self, event, tags):
+        return f"event: {event}\ndata: {dumps({'t': utc_timestamp(), 'tags': tags})}\n\n"
@@ -0,0 +1,290 @@
+"""
+Polygon geofences per floor and company.
+
+Zones are loaded from a JSON file:
+
+    {"zones": [{"name": "Nvidia bay", "company": "Nvidia", "floor": "Ground Floor",
+                "polygon": [[lng, lat], [lng, lat], ...]}, ...]}
+
+"floor": "*" applies a zone to every floor. When zones overlap, the one
+listed first wins. Each floor gets a uniform grid over the zone bounding
+boxes; a point is only tested against the zones whose box touches its cell.
+
+    python geofence.py --bench      compare with a naive point-in-polygon loop
+"""
+import os
+import json
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ANY_FLOOR = "*"
+NO_ZONE = -1
+GRID_SIZE = 32
+GEOFENCE_FILE = os.environ.get("GEOFENCE_FILE", "../data/geofences.json")
+
+
+def normalize_floor(floor):
+    return str(floor).strip().lower() if floor is not None else ANY_FLOOR
+
+
+class Zone:
+    def __init__(self, name, company, floor, polygon):
+        self.name = name
+        self.company = company
+        self.floor = normalize_floor(floor)
+        vertices = np.asarray(polygon, dtype=np.float64)
+        if vertices.ndim != 2 or vertices.shape[0] < 3 or vertices.shape[1] != 2:
+            raise ValueError(f"Zone {name}: polygon needs at least 3 [lng, lat] points")
+        self.xs = vertices[:, 0]
+        self.ys = vertices[:, 1]
+        self.bounds = (self.xs.min(), self.ys.min(), self.xs.max(), self.ys.max())
+        # Edge arrays for the vectorized ray cast, and plain lists for the scalar one
+        self._x1, self._y1 = self.xs, self.ys
+        self._x2, self._y2 = np.roll(self.xs, -1), np.roll(self.ys, -1)
+        self._edges = list(zip(self._x1.tolist(), self._y1.tolist(), self._x2.tolist(), self._y2.tolist()))
+
+    def contains(self, x, y):
+        """Scalar even-odd ray cast."""
+        minx, miny, maxx, maxy = self.bounds
+        if x < minx or x > maxx or y < miny or y > maxy:
+            return False
+        inside = False
+        for x1, y1, x2, y2 in self._edges:
+            if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+                inside = not inside
+        return inside
+
+    def contains_many(self, xs, ys):
+        """Vectorized even-odd ray cast over arrays of points."""
+        y1, y2 = self._y1[:, None], self._y2[:, None]
+        x1, x2 = self._x1[:, None], self._x2[:, None]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            crossing = ((y1 > ys) != (y2 > ys)) & (xs < (x2 - x1) * (ys - y1) / (y2 - y1) + x1)
+        return np.count_nonzero(crossing, axis=0) % 2 == 1
+
+
+class FloorIndex:
+    """Uniform grid over the zones of one floor."""
+
+    def __init__(self, zones, zone_ids, grid_size=GRID_SIZE):
+        self.zones = zones
+        self.zone_ids = zone_ids
+        self.grid_size = grid_size
+        if not zone_ids:
+            self.bounds = None
+            return
+        boxes = np.array([zones[i].bounds for i in zone_ids])
+        self.bounds = (boxes[:, 0].min(), boxes[:, 1].min(), boxes[:, 2].max(), boxes[:, 3].max())
+        minx, miny, maxx, maxy = self.bounds
+        self.cell_w = (maxx - minx) / grid_size or 1.0
+        self.cell_h = (maxy - miny) / grid_size or 1.0
+
+        # Candidate zones per cell, kept in config order so the first match wins
+        self.cells = [[] for _ in range(grid_size * grid_size)]
+        for zone_id in zone_ids:
+            zx0, zy0, zx1, zy1 = zones[zone_id].bounds
+            cx0, cy0 = self._cell(zx0, zy0)
+            cx1, cy1 = self._cell(zx1, zy1)
+            for cy in range(cy0, cy1 + 1):
+                for cx in range(cx0, cx1 + 1):
+                    self.cells[cy * grid_size + cx].append(zone_id)
+        # Same candidates as a cell x zone matrix, for the zone-major path in locate_many
+        self.candidates = np.zeros((grid_size * grid_size, len(zone_ids)), dtype=bool)
+        for cell, cell_zones in enumerate(self.cells):
+            self.candidates[cell, [zone_ids.index(z) for z in cell_zones]] = True
+
+    def _cell(self, x, y):
+        minx, miny, _, _ = self.bounds
+        cx = min(max(int((x - minx) / self.cell_w), 0), self.grid_size - 1)
+        cy = min(max(int((y - miny) / self.cell_h), 0), self.grid_size - 1)
+        return cx, cy
+
+    def locate(self, x, y):
+        if self.bounds is None:
+            return NO_ZONE
+        minx, miny, maxx, maxy = self.bounds
+        if x < minx or x > maxx or y < miny or y > maxy:
+            return NO_ZONE
+        cx, cy = self._cell(x, y)
+        for zone_id in self.cells[cy * self.grid_size + cx]:
+            if self.zones[zone_id].contains(x, y):
+                return zone_id
+        return NO_ZONE
+
+    def locate_many(self, xs, ys):
+        result = np.full(len(xs), NO_ZONE, dtype=np.int32)
+        if self.bounds is None or not len(xs):
+            return result
+        minx, miny, maxx, maxy = self.bounds
+        in_bounds = np.flatnonzero((xs >= minx) & (xs <= maxx) & (ys >= miny) & (ys <= maxy))
+        if not len(in_bounds):
+            return result
+
+        cx = np.clip(((xs[in_bounds] - minx) / self.cell_w).astype(np.int64), 0, self.grid_size - 1)
+        cy = np.clip(((ys[in_bounds] - miny) / self.cell_h).astype(np.int64), 0, self.grid_size - 1)
+        cell = cy * self.grid_size + cx
+
+        # Per-call overhead dominates small groups: go zone-major when there are
+        # few zones relative to occupied cells (roughly 10us per call vs 2ns per point test)
+        occupied = np.count_nonzero(np.bincount(cell, minlength=self.grid_size * self.grid_size))
+        if len(self.zone_ids) * len(in_bounds) < occupied * 5000:
+            return self._locate_by_zone(xs, ys, in_bounds, cell, result)
+
+        # Group the points by cell, then test each group against that cell's candidates
+        order = np.argsort(cell, kind="stable")
+        points = in_bounds[order]
+        cell = cell[order]
+        starts = np.flatnonzero(np.r_[True, cell[1:] != cell[:-1]])
+        ends = np.r_[starts[1:], len(cell)]
+        for start, end in zip(starts, ends):
+            pending = points[start:end]
+            for zone_id in self.cells[cell[start]]:
+                hit = self.zones[zone_id].contains_many(xs[pending], ys[pending])
+                result[pending[hit]] = zone_id
+                pending = pending[~hit]
+                if not len(pending):
+                    break
+        return result
+
+    def _locate_by_zone(self, xs, ys, points, cell, result):
+        # Few zones, many points: one vectorized test per zone instead of one per occupied cell
+        for column, zone_id in enumerate(self.zone_ids):
+            candidate = np.flatnonzero(self.candidates[cell, column])
+            if not len(candidate):
+                continue
+            hit = candidate[self.zones[zone_id].contains_many(xs[points[candidate]], ys[points[candidate]])]
+            result[points[hit]] = zone_id
+            # Zones are in config order, so a point matched here is settled
+            keep = np.ones(len(points), dtype=bool)
+            keep[hit] = False
+            points, cell = points[keep], cell[keep]
+            if not len(points):
+                break
+        return result
+
+
+class GeofenceIndex:
+    def __init__(self, zones, grid_size=GRID_SIZE):
+        self.zones = list(zones)
+        self.companies = np.array([z.company for z in self.zones] + [None], dtype=object)
+        floors = {z.floor for z in self.zones} - {ANY_FLOOR}
+        self._floors = {
+            floor: FloorIndex(self.zones, [i for i, z in enumerate(self.zones) if z.floor in (floor, ANY_FLOOR)], grid_size)
+            for floor in floors
+        }
+        # Floors with no zones of their own only see the wildcard zones
+        self._any_floor = FloorIndex(self.zones, [i for i, z in enumerate(self.zones) if z.floor == ANY_FLOOR], grid_size)
+
+    def _floor(self, floor):
+        return self._floors.get(normalize_floor(floor), self._any_floor)
+
+    def locate(self, floor, lat, lng):
+        """Zone id for one point, NO_ZONE if it is outside every zone."""
+        return self._floor(floor).locate(lng, lat)
+
+    def locate_company(self, floor, lat, lng):
+        zone_id = self.locate(floor, lat, lng)
+        return self.zones[zone_id].company if zone_id != NO_ZONE else None
+
+    def classify(self, floors, lat, lng):
+        """Zone ids for arrays of points (NO_ZONE where outside every zone)."""
+        lat = np.asarray(lat, dtype=np.float64)
+        lng = np.asarray(lng, dtype=np.float64)
+        result = np.full(len(lat), NO_ZONE, dtype=np.int32)
+        if isinstance(floors, str):
+            result[:] = self._floor(floors).locate_many(lng, lat)
+            return result
+        # Factorize the floor labels (cheaper than sorting an object array)
+        codes = {}
+        inverse = np.fromiter((codes.setdefault(f, len(codes)) for f in floors), dtype=np.int32, count=len(lat))
+        for floor, code in codes.items():
+            rows = np.flatnonzero(inverse == code)
+            result[rows] = self._floor(floor).locate_many(lng[rows], lat[rows])
+        return result
+
+    def classify_companies(self, floors, lat, lng):
+        """Company per point, None where outside every zone."""
+        # NO_ZONE (-1) indexes the trailing None
+        return self.companies[self.classify(floors, lat, lng)]
+
+
+def load_geofences(path, grid_size=GRID_SIZE):
+    """GeofenceIndex from a zones JSON file, or None if the file does not exist."""
+    try:
+        with open(path, "r") as file:
+            config = json.load(file)
+    except FileNotFoundError:
+        logger.info("No geofence file at %s, using threshold zones", path)
+        return None
+    zones = [Zone(z.get("name", z["company"]), z["company"], z.get("floor", ANY_FLOOR), z["polygon"])
+             for z in config["zones"]]
+    logger.info("Loaded %d geofence zones from %s", len(zones), path)
+    return GeofenceIndex(zones, grid_size)
+
+
+def _random_zones(count, floors, rng):
+    # Non-overlapping-ish convex octagons scattered over a 0.01 x 0.01 degree site
+    zones = []
+    for i in range(count):
+        cx, cy = rng.uniform(-0.94, -0.93), rng.uniform(51.455, 51.465)
+        r = rng.uniform(0.0002, 0.0008)
+        angles = np.sort(rng.uniform(0, 2 * np.pi, 8))
+        polygon = np.c_[cx + r * np.cos(angles), cy + r * np.sin(angles)]
+        zones.append(Zone(f"zone-{i}", f"company-{i % 7}", floors[i % len(floors)], polygon))
+    return zones
+
+
+def benchmark(zone_count=300, point_count=1_000_000, naive_sample=20_000, seed=0):
+    import time
+
+    rng = np.random.default_rng(seed)
+    floor_names = ["Ground Floor", "1st Floor", "2nd Floor", "3rd Floor"]
+    index = GeofenceIndex(_random_zones(zone_count, floor_names, rng))
+    lat = rng.uniform(51.455, 51.465, point_count)
+    lng = rng.uniform(-0.94, -0.93, point_count)
+    floors = rng.choice(np.array(floor_names, dtype=object), point_count)
+
+    start = time.perf_counter()
+    ids = index.classify(floors, lat, lng)
+    batch = (time.perf_counter() - start) / point_count
+
+    start = time.perf_counter()
+    for i in range(naive_sample):
+        index.locate(floors[i], lat[i], lng[i])
+    indexed_scalar = (time.perf_counter() - start) / naive_sample
+
+    # Naive: test every zone on the point's floor, no index
+    start = time.perf_counter()
+    naive_ids = []
+    for i in range(naive_sample):
+        floor = normalize_floor(floors[i])
+        found = NO_ZONE
+        for zone_id, zone in enumerate(index.zones):
+            if zone.floor in (floor, ANY_FLOOR) and zone.contains(lng[i], lat[i]):
+                found = zone_id
+                break
+        naive_ids.append(found)
+    naive = (time.perf_counter() - start) / naive_sample
+
+    assert (ids[:naive_sample] == np.array(naive_ids)).all(), "indexed result differs from naive loop"
+    print(f"{zone_count} zones, {point_count} points, {np.count_nonzero(ids != NO_ZONE)} inside a zone")
+    print(f"naive loop:       {naive * 1e6:10.2f} us/point")
+    print(f"indexed scalar:   {indexed_scalar * 1e6:10.2f} us/point")
+    print(f"indexed batch:    {batch * 1e6:10.3f} us/point ({1 / batch / 1e6:.1f}M points/s)")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bench", action="store_true")
+    parser.add_argument("--zones", type=int, default=300)
+    parser.add_argument("--points", type=int, default=1_000_000)
+    args = parser.parse_args()
+    if args.bench:
+        benchmark(args.zones, args.points)
+    else:
+        parser.print_help()
@@ -0,0 +1,208 @@
+"""
+Live RTLS ingestion: position updates pushed by the location engine go
+through a bounded ring buffer into the same zone check and SSE fan-out as
+the file replay.
+
+Backpressure is explicit. HTTP producers get told how many rows were
+accepted and retry the rest (429); UDP datagrams that do not fit are
+dropped and counted. Rows without a numeric lat/lng are rejected as
+invalid up front, and a row that still fails in the zone check is dropped
+and counted on its own (`failed`) without taking its batch with it.
+"""
+import os
+import json
+import socket
+import threading
+import logging
+import math
+import weakref
+from collections import deque
+
+from metrics import Gauge
+
+logger = logging.getLogger(__name__)
+
+LIVE_BUFFER_SIZE = int(os.environ.get("LIVE_BUFFER_SIZE", 100000))
+LIVE_BATCH_SIZE = int(os.environ.get("LIVE_BATCH_SIZE", 1024))
+RTLS_UDP_PORT = int(os.environ.get("RTLS_UDP_PORT", 0))   # 0 = no UDP listener
+# Fields a live RTLS row needs as finite numbers
+RTLS_NUMERIC_FIELDS = ("lat", "lng")
+
+
+_buffers = weakref.WeakSet()
+Gauge("ingest_buffer_depth", "Rows waiting in the live ingestion ring buffer",
+      lambda: {(b.name,): len(b) for b in list(_buffers)}, ("buffer",))
+Gauge("ingest_rows_total", "Live ingestion rows by outcome",
+      lambda: {(b.name, outcome): getattr(b, outcome) for b in list(_buffers)
+               for outcome in ("accepted", "rejected", "invalid", "consumed")},
+      ("buffer", "outcome"), kind="counter")
+Gauge("ingest_rows_failed_total", "Accepted live rows dropped because processing them failed",
+      lambda: {(b.name,): b.failed for b in list(_buffers)}, ("buffer",), kind="counter")
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def parse_ndjson(body, numeric=()):
+    """
+    Returns (rows, invalid_line_count). Accepts bytes or str. A row whose
+    `numeric` fields are missing or not finite numbers counts as invalid.
+    """
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", errors="replace")
+    rows = []
+    invalid = 0
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            invalid += 1
+            continue
+        if isinstance(row, dict) and all(is_number(row.get(field)) for field in numeric):
+            rows.append(row)
+        else:
+            invalid += 1
+    return rows, invalid
+
+
+class RingBuffer:
+    """Bounded FIFO between producers (HTTP/UDP) and the live consumer."""
+
+    def __init__(self, capacity=LIVE_BUFFER_SIZE, name="live", numeric=RTLS_NUMERIC_FIELDS):
+        self.name = name
+        self.capacity = capacity
+        self.numeric = numeric
+        self.accepted = 0
+        self.rejected = 0
+        self.invalid = 0
+        self.consumed = 0
+        self.failed = 0
+        self.high_watermark = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+        _buffers.add(self)
+
+    def __len__(self):
+        return len(self._items)
+
+    def offer_many(self, rows):
+        """Append as many rows as fit, oldest first. Returns how many were accepted."""
+        with self._cond:
+            space = self.capacity - len(self._items)
+            accepted = rows if len(rows) <= space else rows[:max(space, 0)]
+            self._items.extend(accepted)
+            self.accepted += len(accepted)
+            self.rejected += len(rows) - len(accepted)
+            self.high_watermark = max(self.high_watermark, len(self._items))
+            if accepted:
+                self._cond.notify()
+            return len(accepted)
+
+    def offer_ndjson(self, body):
+        """Parse an NDJSON body and offer its rows. Returns the per-request counts."""
+        rows, invalid = parse_ndjson(body, self.numeric)
+        accepted = self.offer_many(rows)
+        with self._cond:
+            self.invalid += invalid
+        return {"accepted": accepted, "rejected": len(rows) - accepted, "invalid": invalid}
+
+    def drain(self, max_items=LIVE_BATCH_SIZE):
+        """Up to max_items rows without waiting (empty list when idle)."""
+        with self._cond:
+            count = min(max_items, len(self._items))
+            batch = [self._items.popleft() for _ in range(count)]
+            self.consumed += count
+            return batch
+
+    def record_failed(self, count):
+        with self._cond:
+            self.failed += count
+
+    def take(self, max_items=LIVE_BATCH_SIZE, timeout=None):
+        """Like drain(), but waits up to timeout for the first row."""
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+        return self.drain(max_items)
+
+    def stats(self):
+        return {
+            "capacity": self.capacity,
+            "depth": len(self._items),
+            "high_watermark": self.high_watermark,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "invalid": self.invalid,
+            "consumed": self.consumed,
+            "failed": self.failed,
+        }
+
+
+def process_rows(process, rows, buffer):
+    """
+    process(rows) as a list; if the batch raises, each row is retried alone
+    and the ones that still fail are counted on buffer.
+    """
+    try:
+        return list(process(rows))
+    except Exception as e:
+        events = []
+        failed = 0
+        for row in rows:
+            try:
+                events += process([row])
+            except Exception:
+                failed += 1
+        buffer.record_failed(failed)
+        logger.error("Live RTLS batch failed, %d of %d rows dropped: %s", failed, len(rows), e)
+        return events
+
+
+class LiveConsumer:
+    """
+    Thread that drains the ring buffer in batches, turns each batch into SSE
+    messages with process(rows) -> [(key, message)] and publishes them.
+    """
+
+    def __init__(self, buffer, process, publish, batch_size=LIVE_BATCH_SIZE):
+        self.buffer = buffer
+        self.process = process
+        self.publish = publish
+        self.batch_size = batch_size
+        self._thread = threading.Thread(target=self._run, name="rtls-live", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = self.buffer.take(self.batch_size, timeout=1.0)
+            if not batch:
+                continue
+            for key, message in process_rows(self.process, batch, self.buffer):
+                try:
+                    self.publish(key, message)
+                except Exception as e:
+                    logger.error("Live RTLS publish failed: %s", e)
+
+
+class UdpListener:
+    """One or more NDJSON rows per datagram. No backpressure on UDP: overflow is dropped."""
+
+    def __init__(self, buffer, port=RTLS_UDP_PORT, host="0.0.0.0"):
+        self.buffer = buffer
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        if hasattr(socket, "SO_REUSEPORT"):
+            # Each worker process (workers.py) binds the port; the kernel spreads datagrams across them
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self.sock.bind((host, port))
+        self._thread = threading.Thread(target=self._run, name="rtls-udp", daemon=True)
+        self._thread.start()
+        logger.info("Listening for RTLS updates on udp://%s:%d", host, port)
+
+    def _run(self):
+        while True:
+            data, _ = self.sock.recvfrom(65535)
+            self.buffer.offer_ndjson(data)
@@ -0,0 +1,284 @@
+"""
+Logging for the streaming hot paths.
+
+Records go through a bounded queue to a QueueListener thread that does the
+formatting and the stream I/O, so a slow stdout never blocks a producer;
+if the queue is full the record is dropped and counted. Per-event trace
+lines are DEBUG on their own logger, so at the default INFO level they
+cost one level check. When debug is switched on at runtime they are
+sampled and rate limited. Repeated warnings about the same key (e.g. an
+unknown MAC) are logged once and then summarized per interval, by a
+background thread and once more at shutdown.
+"""
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
+import weakref
+from collections import OrderedDict
+from logging.handlers import QueueHandler, QueueListener
+
+from metrics import Gauge
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 10000))
+# Fraction of per-event debug lines kept, and an upper bound in lines per second
+EVENT_LOG_SAMPLE = float(os.environ.get("EVENT_LOG_SAMPLE", 0.01))
+EVENT_LOG_RATE = float(os.environ.get("EVENT_LOG_RATE", 50))
+# Repeated per-key warnings are summarized this often (seconds)
+WARNING_SUMMARY_INTERVAL = float(os.environ.get("WARNING_SUMMARY_INTERVAL", 60))
+# Keys a WarningAggregator remembers; they come from clients (e.g. MACs posted to /ingest/rtls)
+WARNING_MAX_KEYS = int(os.environ.get("WARNING_MAX_KEYS", 10000))
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+
+_listener = None
+_queue_handler = None
+_filters = {}
+_aggregators = weakref.WeakSet()
+_summary_thread = None
+_summary_lock = threading.Lock()
+
+Gauge("log_records_dropped_total", "Log records dropped because the log queue was full",
+      lambda: _queue_handler.dropped if _queue_handler else 0, kind="counter")
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks: a full queue drops the record."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class SampleFilter(logging.Filter):
+    """Keeps one record in every 1 / rate."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.every = max(int(round(1 / rate)), 1) if rate > 0 else 0
+        self.seen = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        with self._lock:
+            self.seen += 1
+            if self.every and self.seen % self.every == 0:
+                return True
+            self.skipped += 1
+            return False
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket of `rate` records per second; notes how many were suppressed in between."""
+
+    def __init__(self, rate, burst=None):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst or max(rate, 1)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.suppressed = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                self.suppressed += 1
+                self._pending += 1
+                return False
+            self.tokens -= 1
+            if self._pending:
+                record.msg = f"{record.msg} ({self._pending} similar messages suppressed)"
+                self._pending = 0
+        return True
+
+
+class WarningAggregator:
+    """
+    warning(key, msg, *args) logs the first occurrence per key right away and
+    only counts the rest; once per interval one summary line lists the keys
+    that repeated and how often. At most max_keys keys are remembered (least
+    recently seen are forgotten and would be logged again) and counted per
+    interval (the rest are counted together as "other keys"). Summaries are
+    written by the warning-summary thread even when no new warning arrives,
+    and by flush_warnings() at shutdown.
+    """
+
+    def __init__(self, logger, interval=WARNING_SUMMARY_INTERVAL, top=10, max_keys=WARNING_MAX_KEYS):
+        self.logger = logger
+        self.interval = interval
+        self.top = top
+        self.max_keys = max_keys
+        self._seen = OrderedDict()
+        self._counts = {}
+        self._other = 0
+        self._window_start = time.monotonic()
+        self._lock = threading.Lock()
+        _aggregators.add(self)
+        _ensure_summary_thread()
+
+    def warning(self, key, msg, *args):
+        with self._lock:
+            if key in self._seen:
+                self._seen.move_to_end(key)
+                if key in self._counts or len(self._counts) < self.max_keys:
+                    self._counts[key] = self._counts.get(key, 0) + 1
+                else:
+                    self._other += 1
+                first = False
+            else:
+                self._seen[key] = None
+                if len(self._seen) > self.max_keys:
+                    self._seen.popitem(last=False)
+                first = True
+            due = time.monotonic() - self._window_start >= self.interval
+        if first:
+            self.logger.warning(msg + " (repeats are summarized every %gs)", *args, self.interval)
+        if due:
+            self.flush()
+
+    def flush_if_due(self):
+        with self._lock:
+            due = time.monotonic() - self._window_start >= self.interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            counts, self._counts = self._counts, {}
+            other, self._other = self._other, 0
+            elapsed = time.monotonic() - self._window_start
+            self._window_start = time.monotonic()
+        if counts:
+            worst = sorted(counts.items(), key=lambda item: -item[1])[:self.top]
+            self.logger.warning("%d repeated warnings for %d keys in the last %.0fs, top: %s%s",
+                                sum(counts.values()) + other, len(counts), elapsed,
+                                ", ".join(f"{key} x{count}" for key, count in worst),
+                                f" (+{other} for other keys)" if other else "")
+
+
+def _summary_loop():
+    while True:
+        aggregators = list(_aggregators)
+        time.sleep(min([1.0] + [aggregator.interval for aggregator in aggregators]))
+        for aggregator in aggregators:
+            try:
+                aggregator.flush_if_due()
+            except Exception:
+                logging.getLogger(__name__).exception("Warning summary failed")
+
+
+def _ensure_summary_thread():
+    global _summary_thread
+    with _summary_lock:
+        if _summary_thread is None:
+            _summary_thread = threading.Thread(target=_summary_loop, name="warning-summary", daemon=True)
+            _summary_thread.start()
+
+
+def flush_warnings():
+    """Write out the pending summary of every WarningAggregator."""
+    for aggregator in list(_aggregators):
+        aggregator.flush()
+
+
+def setup_logging(level=LOG_LEVEL, log_format=LOG_FORMAT):
+    """Route the root logger through the queue (idempotent)."""
+    global _listener, _queue_handler
+    root = logging.getLogger()
+    root.setLevel(level)
+    if _listener is not None:
+        return
+    output = logging.StreamHandler()
+    output.setFormatter(logging.Formatter(log_format))
+    _queue_handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    _listener = QueueListener(_queue_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def stop():
+    """Write out the warning summaries and whatever is still queued."""
+    flush_warnings()
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+atexit.register(stop)
+
+
+def _after_fork():
+    # The writer and summary threads stay in the parent: a forked worker gets its own
+    global _listener, _summary_thread, _summary_lock
+    if _listener is not None:
+        _queue_handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+        _listener = QueueListener(_queue_handler.queue, *_listener.handlers, respect_handler_level=True)
+        _listener.start()
+    _summary_lock = threading.Lock()
+    _summary_thread = None
+    if _aggregators:
+        _ensure_summary_thread()
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def event_logger(name, sample=EVENT_LOG_SAMPLE, rate=EVENT_LOG_RATE):
+    """Logger for per-event DEBUG lines: sampled, then rate limited."""
+    logger = logging.getLogger(name)
+    if name not in _filters:
+        _filters[name] = (SampleFilter(sample), RateLimitFilter(rate))
+        for log_filter in _filters[name]:
+            logger.addFilter(log_filter)
+    return logger
+
+
+def rate_limited_logger(name, rate=EVENT_LOG_RATE):
+    """Logger whose records (e.g. per-alert INFO lines) are rate limited but not sampled."""
+    logger = logging.getLogger(name)
+    if name not in _filters:
+        _filters[name] = (RateLimitFilter(rate),)
+        logger.addFilter(_filters[name][0])
+    return logger
+
+
+def set_level(level, name=None):
+    """Change a logger's level at runtime (root when name is None). Raises ValueError for unknown levels."""
+    level = str(level).upper()
+    if level not in LEVELS:
+        raise ValueError(f"Unknown log level {level}, expected one of {list(LEVELS)}")
+    logging.getLogger(name).setLevel(level)
+    return levels()
+
+
+def levels():
+    names = [None] + sorted(_filters)
+    return {name or "root": logging.getLevelName(logging.getLogger(name).getEffectiveLevel()) for name in names}
+
+
+def stats():
+    result = {"levels": levels(), "dropped": _queue_handler.dropped if _queue_handler else 0}
+    for name, filters in _filters.items():
+        for log_filter in filters:
+            if isinstance(log_filter, SampleFilter):
+                result[f"{name}.sampled_out"] = log_filter.skipped
+            else:
+                result[f"{name}.rate_limited"] = log_filter.suppressed
+    return result
@@ -6,6 +6,7 @@ import time
 from sklearn.preprocessing import LabelEncoder
 from sklearn.utils import shuffle
 import  json
+from columnar_cache import open_records
 
 features_col = ['time_in_cycles', 'voltmean_24h', 'rotatemean_24h', 'pressuremean_24h',
  'vibrationmean_24h', 'voltsd_24h', 'rotatesd_24h', 'pressuresd_24h',
@@ -35,8 +36,8 @@ def predict_rui(data, model, features_col):
     return prediction
 
 def stream():
-    with open("../data/sample_rul.json", 'r') as f:
-        data = json.load(f)
+    with open_records("../data/sample_rul.json") as records:
+        data = list(records.records())
         # rul_model = joblib.load("../model/xgboost_model.pkl")
         total_records = len(data)
         duration = 180
@@ -0,0 +1,385 @@
+"""
+RUL model versions in MODEL_DIR, swapped in without a restart.
+
+Every *.pkl in MODEL_DIR is a version (xgboost_model.pkl, or train_rul.py
+output next to its .manifest.json). A watcher thread polls the directory
+every MODEL_RELOAD_INTERVAL seconds. A new or changed file is loaded in that
+thread and checked before anyone uses it: its feature names (from the
+manifest or the booster) must equal features_col, and a warm-up prediction
+must return one finite value per row. Then, depending on MODEL_ROLLOUT:
+
+    swap     it becomes the active model (default)
+    shadow   it becomes the candidate: every batch the active model scores
+             is scored again by the candidate in a background thread and the
+             differences are kept in stats(), until activate() promotes it
+
+Nothing is loaded when the registry is created: watch() loads the initial
+version (MODEL_DIR/ACTIVE, else the newest file) in its thread, and `ready`
+is set once that attempt is over. Until then predict() raises and callers
+treat the RUL as unknown.
+
+The swap is a single reference assignment, so a batch that is being scored
+finishes on the old model and the next one uses the new model. The active
+version's file name is written to MODEL_DIR/ACTIVE, which other worker
+processes (and the next start) follow. A version that fails to load or
+validate is logged and skipped, and the active model keeps serving; an
+ACTIVE that names such a version is not followed again until the pointer
+or the file changes.
+"""
+import os
+import json
+import time
+import queue
+import logging
+import threading
+
+import numpy as np
+
+from metrics import Histogram, file_load_seconds
+from tree_predictor import make_predictor, RUL_PREDICTOR
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = os.environ.get("MODEL_DIR", "../model")
+MODEL_RELOAD_INTERVAL = float(os.environ.get("MODEL_RELOAD_INTERVAL", 5))
+MODEL_ROLLOUT = os.environ.get("MODEL_ROLLOUT", "swap")
+SHADOW_QUEUE_SIZE = int(os.environ.get("SHADOW_QUEUE_SIZE", 64))
+ACTIVE_FILE = "ACTIVE"
+HISTORY_SIZE = 10
+
+ROLLOUTS = ("swap", "shadow")
+
+model_seconds = Histogram("rul_model_predict_seconds", "Model latency per scored batch", ("version", "role"))
+
+
+class ModelVersion:
+    """One loaded model file with its latency and shadow-comparison counters."""
+
+    def __init__(self, name, mtime, model, predictor, manifest, warmup_seconds):
+        self.name = name
+        self.mtime = mtime
+        self.model = model
+        self.predictor = predictor
+        self.manifest = manifest
+        self.warmup_seconds = warmup_seconds
+        self.loaded_at = time.time()
+        self.activated_at = None
+        self.batches = 0
+        self.rows = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        # Shadow scoring against the active model
+        self.shadow_rows = 0
+        self.shadow_abs_diff = 0.0
+        self.shadow_max_abs_diff = 0.0
+        self._timers = {}
+
+    def predict(self, matrix, role="active"):
+        start = time.perf_counter()
+        predictions = self.predictor.predict(matrix)
+        elapsed = time.perf_counter() - start
+        timer = self._timers.get(role)
+        if timer is None:
+            timer = self._timers[role] = model_seconds.labels(self.name, role)
+        timer.observe(elapsed)
+        if role == "active":
+            self.batches += 1
+            self.rows += len(matrix)
+            self.seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+        return predictions
+
+    def set_threads(self, nthread):
+        try:
+            self.model.get_booster().set_param({"nthread": nthread})
+        except Exception as e:
+            logger.warning("Could not set model threads for %s: %s", self.name, e)
+
+    def stats(self):
+        return {
+            "version": self.name,
+            "file_mtime": self.mtime,
+            "loaded_at": self.loaded_at,
+            "activated_at": self.activated_at,
+            "predictor": type(self.predictor).__name__,
+            "warmup_ms": self.warmup_seconds * 1000,
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_ms": self.seconds / self.batches * 1000 if self.batches else None,
+            "max_batch_ms": self.max_seconds * 1000,
+            "shadow_rows": self.shadow_rows,
+            "shadow_mean_abs_diff": self.shadow_abs_diff / self.shadow_rows if self.shadow_rows else None,
+            "shadow_max_abs_diff": self.shadow_max_abs_diff,
+            "test_rmse_hours": (self.manifest or {}).get("test_rmse_hours"),
+        }
+
+
+class ModelRegistry:
+    """
+    Drop-in for the model object in BatchPredictor / predict_rul: predict()
+    scores with whatever version is active at the time of the call.
+    """
+
+    def __init__(self, model_dir, features_col, predictor=RUL_PREDICTOR, rollout=MODEL_ROLLOUT, warmup=None):
+        if rollout not in ROLLOUTS:
+            raise ValueError(f"Unknown MODEL_ROLLOUT {rollout!r}, expected one of {', '.join(ROLLOUTS)}")
+        self.model_dir = model_dir
+        self.features_col = list(features_col)
+        self.predictor_kind = predictor
+        self.rollout = rollout
+        self.warmup = warmup if warmup is not None else np.zeros((1, len(self.features_col)), dtype=np.float32)
+        self.active = None
+        self.candidate = None
+        self.history = []
+        self.failed = 0
+        self.shadow_dropped = 0
+        self._nthread = None
+        self._seen = {}
+        # (name, mtime) of an ACTIVE target that did not load; not retried until either changes
+        self._failed_pointer = None
+        self._interval = None
+        self.ready = threading.Event()
+        # Called with the new ModelVersion after every swap, e.g. to drop cached predictions
+        self.on_activate = []
+        self._start()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _start(self):
+        self._lock = threading.RLock()
+        self._shadow_queue = queue.Queue(maxsize=SHADOW_QUEUE_SIZE)
+        self._shadow_thread = threading.Thread(target=self._run_shadow, name="model-shadow", daemon=True)
+        self._shadow_thread.start()
+
+    def _after_fork(self):
+        # Forked worker: the threads (and maybe a load holding the lock) stayed in the parent
+        self._start()
+        interval, self._interval = self._interval, None
+        if interval is not None:
+            self.watch(interval)
+
+    # Scoring
+
+    def predict(self, matrix):
+        version = self.active
+        if version is None:
+            raise RuntimeError(f"No RUL model loaded from {self.model_dir}")
+        predictions = version.predict(matrix)
+        candidate = self.candidate
+        if candidate is not None:
+            try:
+                self._shadow_queue.put_nowait((candidate, matrix, predictions))
+            except queue.Full:
+                self.shadow_dropped += 1
+        return predictions
+
+    def _run_shadow(self):
+        while True:
+            candidate, matrix, expected = self._shadow_queue.get()
+            try:
+                diff = np.abs(np.asarray(candidate.predict(matrix, role="shadow"), dtype=np.float64) - expected)
+            except Exception as e:
+                logger.error("Shadow scoring with %s failed: %s", candidate.name, e)
+                continue
+            candidate.shadow_rows += len(diff)
+            candidate.shadow_abs_diff += float(diff.sum())
+            candidate.shadow_max_abs_diff = max(candidate.shadow_max_abs_diff, float(diff.max(initial=0)))
+
+    # Loading
+
+    def _files(self):
+        try:
+            names = [name for name in os.listdir(self.model_dir) if name.endswith(".pkl")]
+        except OSError as e:
+            logger.error("Cannot list model directory %s: %s", self.model_dir, e)
+            return {}
+        files = {}
+        for name in names:
+            try:
+                files[name] = os.path.getmtime(os.path.join(self.model_dir, name))
+            except OSError:
+                pass
+        return files
+
+    def _pointer(self):
+        try:
+            with open(os.path.join(self.model_dir, ACTIVE_FILE)) as file:
+                return file.read().strip() or None
+        except OSError:
+            return None
+
+    def _write_pointer(self, name):
+        path = os.path.join(self.model_dir, ACTIVE_FILE)
+        try:
+            with open(path + ".tmp", "w") as file:
+                file.write(name + "\n")
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            logger.warning("Could not record the active model in %s: %s", path, e)
+
+    def load(self, name):
+        """Load and validate one file; raises on any problem."""
+        # joblib/xgboost (and sklearn through the pickle) are the slowest imports, so not at startup
+        import joblib
+
+        path = os.path.join(self.model_dir, name)
+        mtime = os.path.getmtime(path)
+        with file_load_seconds.labels(name).time():
+            model = joblib.load(path)
+        manifest = None
+        manifest_path = os.path.join(self.model_dir, name[:-len(".pkl")] + ".manifest.json")
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as file:
+                manifest = json.load(file)
+        booster = model.get_booster()
+        names = manifest.get("features") if manifest else booster.feature_names
+        if names is not None and list(names) != self.features_col:
+            raise ValueError(f"{name}: features {list(names)} do not match features_col")
+        if booster.num_features() != len(self.features_col):
+            raise ValueError(f"{name}: model has {booster.num_features()} features, expected {len(self.features_col)}")
+        try:
+            predictor = make_predictor(model, self.predictor_kind)
+        except Exception as e:
+            logger.error("Could not build the %s predictor for %s, using the model directly: %s",
+                         self.predictor_kind, name, e)
+            predictor = model
+        start = time.perf_counter()
+        predictions = np.asarray(predictor.predict(self.warmup))
+        warmup_seconds = time.perf_counter() - start
+        if predictions.shape != (len(self.warmup),) or not np.all(np.isfinite(predictions)):
+            raise ValueError(f"{name}: warm-up prediction returned {predictions!r}")
+        version = ModelVersion(name, mtime, model, predictor, manifest, warmup_seconds)
+        if self._nthread is not None:
+            version.set_threads(self._nthread)
+        return version
+
+    def _try_load(self, name):
+        try:
+            return self.load(name)
+        except Exception as e:
+            self.failed += 1
+            logger.error("Model %s not loaded: %s", name, e)
+            return None
+
+    def load_initial(self):
+        """Activate the recorded version, else the newest file that loads; sets `ready`."""
+        with self._lock:
+            files = self._files()
+            self._seen = dict(files)
+            pointer = self._pointer()
+            order = sorted(files, key=files.get, reverse=True)
+            if pointer in files:
+                order.remove(pointer)
+                order.insert(0, pointer)
+            for name in order:
+                version = self._try_load(name)
+                if version is not None:
+                    self._activate(version, record=False)
+                    break
+                if name == pointer:
+                    self._failed_pointer = (name, files[name])
+            else:
+                logger.error("No usable RUL model in %s; machine streams send rul: null until one is added",
+                             self.model_dir)
+            self.ready.set()
+
+    def wait(self, timeout=None):
+        """Block until the initial load is over; True if a model is active."""
+        self.ready.wait(timeout)
+        return self.active is not None
+
+    def _activate(self, version, record=True):
+        previous = self.active
+        version.activated_at = time.time()
+        self.active = version
+        if self.candidate is not None and self.candidate.name == version.name:
+            self.candidate = None
+        if previous is not None and previous is not version:
+            self.history = ([previous.stats()] + self.history)[:HISTORY_SIZE]
+        if record:
+            self._write_pointer(version.name)
+        for callback in self.on_activate:
+            callback(version)
+        logger.info("RUL model %s active (warm-up %.1f ms)", version.name, version.warmup_seconds * 1000)
+
+    def activate(self, name=None):
+        """Make `name` (default: the candidate) active; returns its stats, raises if it cannot be used."""
+        with self._lock:
+            candidate = self.candidate
+            if name is None:
+                if candidate is None:
+                    raise ValueError("No candidate model to promote")
+                name = candidate.name
+            if candidate is not None and candidate.name == name:
+                version = candidate
+            else:
+                if os.path.basename(name) != name or not name.endswith(".pkl"):
+                    raise ValueError(f"Invalid model name {name!r}")
+                version = self.load(name)
+            self._activate(version)
+            return version.stats()
+
+    def scan(self):
+        """One watcher pass: follow ACTIVE, then pick up new or changed files."""
+        with self._lock:
+            files = self._files()
+            pointer = self._pointer()
+            if (pointer in files and (self.active is None or pointer != self.active.name)
+                    and self._failed_pointer != (pointer, files[pointer])):
+                version = self._try_load(pointer)
+                if version is not None:
+                    self._activate(version, record=False)
+                    self._failed_pointer = None
+                else:
+                    self._failed_pointer = (pointer, files[pointer])
+                    logger.warning("Not following %s to %s until one of them changes", ACTIVE_FILE, pointer)
+                self._seen[pointer] = files[pointer]
+            for name, mtime in files.items():
+                if self._seen.get(name) == mtime:
+                    continue
+                # A file still being copied fails here and is retried when its mtime changes again
+                self._seen[name] = mtime
+                version = self._try_load(name)
+                if version is None:
+                    continue
+                if self.rollout == "swap" or self.active is None:
+                    self._activate(version)
+                else:
+                    self.candidate = version
+                    logger.info("RUL model %s is the shadow candidate", name)
+
+    def watch(self, interval=MODEL_RELOAD_INTERVAL):
+        """Load the initial version, then poll MODEL_DIR every `interval` seconds (0: never), in a daemon thread."""
+        if self._interval is not None:
+            return
+        self._interval = interval
+
+        def run():
+            if not self.ready.is_set():
+                self.load_initial()
+            while interval > 0:
+                time.sleep(interval)
+                try:
+                    self.scan()
+                except Exception as e:
+                    logger.error("Model directory scan failed: %s", e)
+
+        threading.Thread(target=run, name="model-watch", daemon=True).start()
+
+    def set_threads(self, nthread):
+        """Threads per model.predict, for the loaded and all later versions."""
+        self._nthread = nthread
+        for version in (self.active, self.candidate):
+            if version is not None:
+                version.set_threads(nthread)
+
+    def stats(self):
+        return {
+            "model_dir": os.path.abspath(self.model_dir),
+            "rollout": self.rollout,
+            "ready": self.ready.is_set(),
+            "active": self.active.stats() if self.active else None,
+            "candidate": self.candidate.stats() if self.candidate else None,
+            "previous": self.history,
+            "failed_loads": self.failed,
+            "shadow_dropped": self.shadow_dropped,
+        }
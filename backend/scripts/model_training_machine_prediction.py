@@ -8,6 +8,7 @@ from sklearn.preprocessing import LabelEncoder
 from google.colab import drive
 import os
 from datetime import timedelta
+from failure_reasons import reason_codes, reason_texts
 
 # Set style for visualizations
 plt.style.use('ggplot')
@@ -89,28 +90,6 @@ def load_and_preprocess_data(file_path):
 
     return df, le
 
-# Function to infer failure reason
-def infer_failure_reason(row):
-    errors = ['error1', 'error2', 'error3', 'error4', 'error5']
-    active_errors = [err for err in errors if err in row and row[err] > 0]
-    if active_errors:
-        return f"Error codes: {', '.join(active_errors)}"
-
-    comps = ['comp1', 'comp2', 'comp3', 'comp4']
-    active_comps = [comp for comp in comps if comp in row and row[comp] > 0]
-    if active_comps:
-        return f"Maintenance on: {', '.join([c.replace('comp', 'component ') for c in active_comps])}"
-
-    if 'vibrationmean_24h' in row and row['vibrationmean_24h'] > 45:
-        return "High vibration"
-    if 'voltmean_24h' in row and row['voltmean_24h'] > 180:
-        return "High voltage"
-    if 'pressuremean_24h' in row and row['pressuremean_24h'] > 110:
-        return "High pressure"
-    if 'rotatemean_24h' in row and row['rotatemean_24h'] > 500:
-        return "High rotation speed"
-    return "Unknown or general wear"
-
 # Train XGBoost model and make predictions
 def train_and_predict(df):
     features = [
@@ -217,7 +196,7 @@ def generate_output_csv(df):
     latest_records = df.sort_values('datetime').groupby('machineID').last().reset_index()
     latest_records['hours_to_failure'] = latest_records['predicted_RUL_hours'].clip(lower=0)
     latest_records['predicted_failure_time'] = latest_records['datetime'] + pd.to_timedelta(latest_records['hours_to_failure'], unit='h')
-    latest_records['reason_for_failure'] = latest_records.apply(infer_failure_reason, axis=1)
+    latest_records['reason_for_failure'] = reason_texts(reason_codes(latest_records))
     output_df = latest_records[['machineID', 'predicted_failure_time', 'hours_to_failure', 'reason_for_failure']]
     output_df.to_csv('machine_failure_predictions.csv', index=False)
     return output_df
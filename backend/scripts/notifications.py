@@ -0,0 +1,432 @@
+"""
+Out-of-band delivery of zone violation and maintenance alerts (SMS).
+
+The streams only call Dispatcher.notify(), which checks the per-recipient
+cooldown and puts the alert on an in-memory queue; it never waits for the
+provider. A dispatcher thread moves alerts into a SQLite queue (so pending
+alerts survive a restart), groups the ones for the same recipient that
+arrive within NOTIFY_BATCH_WINDOW into one message and hands the batches to
+a small worker pool. Failed sends are retried with exponential backoff
+until NOTIFY_MAX_ATTEMPTS, then kept as "failed".
+
+Several processes (workers.py) can share one queue file. The cooldown is
+checked again against the file when alerts are added, due alerts are claimed
+in one transaction by the store that sends them, and alerts left "sending"
+are only put back when the store that claimed them is gone: closed, its
+process dead, or no heartbeat for NOTIFY_LEASE seconds.
+
+Transports are objects with send(recipient, text) that raise on failure:
+"log" (default), "stub" (local stand-in for tests) and whatever is added
+with register_transport(), e.g. "twilio" in app.py.
+"""
+import os
+import time
+import uuid
+import contextlib
+import queue
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import Gauge
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_QUEUE_FILE = os.environ.get("NOTIFY_QUEUE_FILE", "../data/.cache/notifications.db")
+NOTIFY_WORKERS = int(os.environ.get("NOTIFY_WORKERS", 2))
+# Same alert key to the same recipient at most once per cooldown (seconds)
+NOTIFY_COOLDOWN = float(os.environ.get("NOTIFY_COOLDOWN", 300))
+# Alerts for one recipient arriving within this many seconds go out as one message
+NOTIFY_BATCH_WINDOW = float(os.environ.get("NOTIFY_BATCH_WINDOW", 2))
+NOTIFY_BATCH_SIZE = int(os.environ.get("NOTIFY_BATCH_SIZE", 10))
+NOTIFY_MAX_ATTEMPTS = int(os.environ.get("NOTIFY_MAX_ATTEMPTS", 5))
+# Retry after NOTIFY_BACKOFF, 2x, 4x ... seconds, at most NOTIFY_BACKOFF_MAX
+NOTIFY_BACKOFF = float(os.environ.get("NOTIFY_BACKOFF", 2))
+NOTIFY_BACKOFF_MAX = float(os.environ.get("NOTIFY_BACKOFF_MAX", 300))
+NOTIFY_QUEUE_SIZE = int(os.environ.get("NOTIFY_QUEUE_SIZE", 10000))
+# How often (seconds) a store renews its lease, puts back alerts of stores that are gone and drops old cooldowns
+NOTIFY_RECOVER_INTERVAL = float(os.environ.get("NOTIFY_RECOVER_INTERVAL", 30))
+NOTIFY_LEASE = float(os.environ.get("NOTIFY_LEASE", 3 * NOTIFY_RECOVER_INTERVAL))
+# Twilio's limit for one (concatenated) SMS body
+NOTIFY_MAX_LENGTH = 1600
+
+PENDING, SENDING, FAILED = "pending", "sending", "failed"
+OUTCOMES = ("queued", "suppressed", "dropped", "sent", "retried", "failed")
+
+_dispatchers = []
+Gauge("notifications_total", "Alert notifications by outcome",
+      lambda: {(outcome,): sum(getattr(d, outcome) for d in _dispatchers) for outcome in OUTCOMES},
+      ("outcome",), kind="counter")
+
+
+class LogTransport:
+    """Logs the message instead of sending it."""
+
+    def send(self, recipient, text):
+        logger.info("Notification to %s: %s", recipient, text)
+
+
+class StubTransport:
+    """
+    Local stand-in for an SMS provider: records what was sent, sleeps
+    `latency` seconds per send and fails the first `failures` sends.
+    """
+
+    def __init__(self, latency=0.0, failures=0):
+        self.latency = latency
+        self.failures = failures
+        self.sent = []
+        self.attempts = 0
+        self._lock = threading.Lock()
+
+    def send(self, recipient, text):
+        time.sleep(self.latency)
+        with self._lock:
+            self.attempts += 1
+            if self.failures > 0:
+                self.failures -= 1
+                raise ConnectionError("stub transport failure")
+            self.sent.append((recipient, text))
+            return f"stub-{len(self.sent)}"
+
+
+class TwilioTransport:
+    def __init__(self, client, from_number):
+        self.client = client
+        self.from_number = from_number
+
+    def send(self, recipient, text):
+        return self.client.messages.create(body=text, from_=self.from_number, to=recipient).sid
+
+
+TRANSPORTS = {"log": LogTransport, "stub": StubTransport}
+
+
+def register_transport(name, factory):
+    TRANSPORTS[name] = factory
+
+
+def make_transport(name):
+    if name not in TRANSPORTS:
+        raise ValueError(f"Unknown notification transport {name}, expected one of {sorted(TRANSPORTS)}")
+    return TRANSPORTS[name]()
+
+
+def batch_text(texts, limit=NOTIFY_MAX_LENGTH):
+    """One message body for several alerts; repeated texts are sent once."""
+    texts = list(dict.fromkeys(texts))
+    text = texts[0] if len(texts) == 1 else f"{len(texts)} alerts:\n" + "\n".join(texts)
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def backoff_delay(attempts, base=NOTIFY_BACKOFF, cap=NOTIFY_BACKOFF_MAX):
+    return min(base * 2 ** (attempts - 1), cap)
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class AlertStore:
+    """SQLite-backed queue of alerts; ":memory:" keeps it in memory."""
+
+    def __init__(self, path=NOTIFY_QUEUE_FILE):
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            if path != ":memory:":
+                self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""CREATE TABLE IF NOT EXISTS alerts (
+                id INTEGER PRIMARY KEY, recipient TEXT, text TEXT, created REAL,
+                attempts INTEGER DEFAULT 0, next_attempt REAL, status TEXT, error TEXT, owner INTEGER)""")
+            if "owner" not in [row[1] for row in self._db.execute("PRAGMA table_info(alerts)")]:
+                self._db.execute("ALTER TABLE alerts ADD COLUMN owner INTEGER")
+            self._db.execute("CREATE INDEX IF NOT EXISTS alerts_due ON alerts (status, next_attempt)")
+            # Last time an alert key was queued for a recipient, by any process using the file
+            self._db.execute("""CREATE TABLE IF NOT EXISTS cooldowns (
+                recipient TEXT, key TEXT, queued REAL, PRIMARY KEY (recipient, key))""")
+            # Stores that may have alerts in flight, with their last heartbeat
+            self._db.execute("CREATE TABLE IF NOT EXISTS owners (owner TEXT PRIMARY KEY, pid INTEGER, heartbeat REAL)")
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.recover()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        # The connection is in autocommit mode; IMMEDIATE takes the write lock up front, across processes
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def add(self, alerts, not_before, cooldown=0):
+        """
+        alerts: (recipient, key, text, created) tuples, first sent at not_before.
+        An alert whose key was queued for the same recipient less than
+        cooldown seconds earlier (by any process) is skipped. Returns how many
+        were added.
+        """
+        added = 0
+        with self._transaction() as db:
+            for recipient, key, text, created in alerts:
+                key = repr(key)
+                if cooldown > 0:
+                    last = db.execute("SELECT queued FROM cooldowns WHERE recipient = ? AND key = ?",
+                                      (recipient, key)).fetchone()
+                    if last is not None and created - last[0] < cooldown:
+                        continue
+                    db.execute("INSERT OR REPLACE INTO cooldowns (recipient, key, queued) VALUES (?, ?, ?)",
+                               (recipient, key, created))
+                db.execute("INSERT INTO alerts (recipient, text, created, next_attempt, status) VALUES (?, ?, ?, ?, ?)",
+                           (recipient, text, created, not_before, PENDING))
+                added += 1
+        return added
+
+    def take_due(self, now):
+        """Pending alerts due by now as (id, recipient, text, attempts), claimed by this store."""
+        with self._transaction() as db:
+            rows = db.execute("SELECT id, recipient, text, attempts FROM alerts WHERE status = ? AND next_attempt <= ? "
+                              "ORDER BY next_attempt, id", (PENDING, now)).fetchall()
+            db.executemany("UPDATE alerts SET status = ?, owner = ? WHERE id = ?",
+                           [(SENDING, self.owner, row[0]) for row in rows])
+        return rows
+
+    def recover(self, cooldown=None, lease=NOTIFY_LEASE):
+        """
+        Renew this store's lease and put alerts claimed by stores that are gone
+        back to pending; drop cooldowns older than cooldown seconds. Returns
+        how many alerts were put back.
+        """
+        now = time.time()
+        with self._transaction() as db:
+            db.execute("INSERT OR REPLACE INTO owners (owner, pid, heartbeat) VALUES (?, ?, ?)",
+                       (self.owner, os.getpid(), now))
+            live = {owner for owner, pid, heartbeat in db.execute("SELECT owner, pid, heartbeat FROM owners")
+                    if heartbeat >= now - lease and (pid == os.getpid() or pid_alive(pid))}
+            db.executemany("DELETE FROM owners WHERE owner = ?",
+                           [(owner,) for (owner,) in db.execute("SELECT owner FROM owners").fetchall() if owner not in live])
+            claimed = [row[0] for row in db.execute("SELECT DISTINCT owner FROM alerts WHERE status = ?", (SENDING,))]
+            recovered = 0
+            for owner in claimed:
+                if owner not in live:
+                    recovered += db.execute("UPDATE alerts SET status = ?, owner = NULL WHERE status = ? AND owner IS ?",
+                                            (PENDING, SENDING, owner)).rowcount
+            if cooldown is not None:
+                db.execute("DELETE FROM cooldowns WHERE queued < ?", (now - cooldown,))
+        if recovered:
+            logger.warning("%d alerts claimed by stopped processes will be sent again", recovered)
+        return recovered
+
+    def next_due(self):
+        with self._lock:
+            return self._db.execute("SELECT MIN(next_attempt) FROM alerts WHERE status = ?", (PENDING,)).fetchone()[0]
+
+    def sent(self, ids):
+        with self._transaction() as db:
+            db.executemany("DELETE FROM alerts WHERE id = ?", [(i,) for i in ids])
+
+    def retry(self, ids, next_attempt, error, max_attempts):
+        """Count a failed attempt; alerts out of attempts become failed. Returns how many were given up."""
+        with self._transaction() as db:
+            db.executemany("UPDATE alerts SET attempts = attempts + 1, error = ?, next_attempt = ?, owner = NULL, "
+                           "status = CASE WHEN attempts + 1 >= ? THEN ? ELSE ? END WHERE id = ?",
+                           [(error, next_attempt, max_attempts, FAILED, PENDING, i) for i in ids])
+            marks = ",".join("?" * len(ids))
+            return db.execute(f"SELECT COUNT(*) FROM alerts WHERE status = ? AND id IN ({marks})",
+                              (FAILED, *ids)).fetchone()[0]
+
+    def counts(self):
+        with self._lock:
+            return dict(self._db.execute("SELECT status, COUNT(*) FROM alerts GROUP BY status").fetchall())
+
+    def close(self):
+        # Nothing of ours is in flight any more: drop the lease so nobody waits for it
+        with self._transaction() as db:
+            db.execute("DELETE FROM owners WHERE owner = ?", (self.owner,))
+        with self._lock:
+            self._db.close()
+
+
+class Dispatcher:
+    """
+    notify(recipient, key, text) from any thread or the event loop; returns
+    False when the alert was suppressed by the cooldown or the in-memory
+    queue is full. The dispatcher thread and SQLite file are created on the
+    first alert (or start()).
+    """
+
+    def __init__(self, transport, store_path=NOTIFY_QUEUE_FILE, workers=NOTIFY_WORKERS, cooldown=NOTIFY_COOLDOWN,
+                 batch_window=NOTIFY_BATCH_WINDOW, batch_size=NOTIFY_BATCH_SIZE, max_attempts=NOTIFY_MAX_ATTEMPTS,
+                 backoff=NOTIFY_BACKOFF, queue_size=NOTIFY_QUEUE_SIZE):
+        self.transport = transport
+        self.store_path = store_path
+        self.workers = workers
+        self.cooldown = cooldown
+        self.batch_window = batch_window
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.queued = 0
+        self.suppressed = 0
+        self.dropped = 0
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.batches = 0
+        self._queue_size = queue_size
+        self._last_queued = {}   # (recipient, key) -> monotonic time
+        self._reset()
+        self._stopping = False
+        _dispatchers.append(self)
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        # Also run in forked workers: threads and the SQLite connection stay with the parent, the child opens its own
+        self._incoming = queue.Queue(self._queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._executor = None
+        self.store = None
+
+    def notify(self, recipient, key, text):
+        if not recipient:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            last = self._last_queued.get((recipient, key))
+            if last is not None and now - last < self.cooldown:
+                self.suppressed += 1
+                return False
+            self._ensure_running()
+            try:
+                self._incoming.put_nowait((recipient, key, text, time.time()))
+            except queue.Full:
+                # Not put in the cooldown, so the same alert gets through once there is room
+                self.dropped += 1
+                return False
+            self._last_queued[(recipient, key)] = now
+            self.queued += 1
+        return True
+
+    def start(self):
+        """Start now, e.g. to resend alerts left in the queue file by a previous run."""
+        with self._lock:
+            self._ensure_running()
+
+    def _ensure_running(self):
+        # Caller holds self._lock
+        if self._thread is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="notify")
+            self._thread = threading.Thread(target=self._run, name="notify-dispatcher", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        # Opened here so the first notify() does not wait for the file
+        self.store = AlertStore(self.store_path)
+        next_recover = time.monotonic() + NOTIFY_RECOVER_INTERVAL
+        while not self._stopping:
+            try:
+                alerts = [self._incoming.get(timeout=self._wait_time())]
+                while len(alerts) < 1000 and not self._incoming.empty():
+                    alerts.append(self._incoming.get_nowait())
+            except queue.Empty:
+                alerts = []
+            try:
+                if alerts:
+                    # Another process may have queued the same alert within the cooldown
+                    skipped = len(alerts) - self.store.add(alerts, time.time() + self.batch_window, self.cooldown)
+                    with self._lock:
+                        self.queued -= skipped
+                        self.suppressed += skipped
+                if time.monotonic() >= next_recover:
+                    next_recover = time.monotonic() + NOTIFY_RECOVER_INTERVAL
+                    self.store.recover(cooldown=self.cooldown)
+                self._dispatch_due()
+                self._forget_expired()
+            except Exception as e:
+                logger.error("Notification dispatcher error: %s", e)
+
+    def _wait_time(self):
+        next_due = self.store.next_due()
+        if next_due is None:
+            return 1.0
+        return min(max(next_due - time.time(), 0.0), 1.0)
+
+    def _dispatch_due(self):
+        by_recipient = {}
+        for row in self.store.take_due(time.time()):
+            by_recipient.setdefault(row[1], []).append(row)
+        for recipient, rows in by_recipient.items():
+            for i in range(0, len(rows), self.batch_size):
+                self._executor.submit(self._send, recipient, rows[i:i + self.batch_size])
+
+    def _send(self, recipient, rows):
+        ids = [row[0] for row in rows]
+        try:
+            self.transport.send(recipient, batch_text([row[2] for row in rows]))
+        except Exception as e:
+            attempts = max(row[3] for row in rows) + 1
+            given_up = self.store.retry(ids, time.time() + backoff_delay(attempts, self.backoff), str(e), self.max_attempts)
+            self.failed += given_up
+            self.retried += len(ids) - given_up
+            if given_up:
+                logger.error("Notification to %s failed after %d attempts: %s", recipient, attempts, e)
+            else:
+                logger.warning("Notification to %s failed (attempt %d), retrying: %s", recipient, attempts, e)
+            return
+        self.store.sent(ids)
+        self.sent += len(ids)
+        self.batches += 1
+
+    def _forget_expired(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, queued in self._last_queued.items() if now - queued >= self.cooldown]
+            for key in expired:
+                del self._last_queued[key]
+
+    def wait_idle(self, timeout=10.0):
+        """Block until every alert was sent or given up, including retries. True if that happened in time."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.sent + self.failed >= self.queued and (self.store is not None or self._thread is None):
+                counts = self.store.counts() if self.store else {}
+                if not counts.get(PENDING) and not counts.get(SENDING):
+                    return True
+            time.sleep(0.02)
+        return False
+
+    def close(self):
+        """Stop the dispatcher; unsent alerts stay in the queue file for the next start."""
+        self._stopping = True
+        if self._thread is not None:
+            self._thread.join()
+            self._executor.shutdown(wait=True)
+            self.store.close()
+            self._thread = None
+
+    def stats(self):
+        return {
+            "transport": type(self.transport).__name__,
+            "queued": self.queued,
+            "suppressed": self.suppressed,
+            "dropped": self.dropped,
+            "sent": self.sent,
+            "batches": self.batches,
+            "retried": self.retried,
+            "failed": self.failed,
+            "store": self.store.counts() if self.store else {},
+        }
+
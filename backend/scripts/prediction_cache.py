@@ -0,0 +1,93 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+RUL_CACHE_SIZE = int(os.environ.get("RUL_CACHE_SIZE", 10000))
+RUL_CACHE_TTL = float(os.environ.get("RUL_CACHE_TTL", 0))   # seconds, 0 = never expire
+RUL_CACHE_KEY = os.environ.get("RUL_CACHE_KEY", "features")  # "features" or "id"
+
+KEY_MODES = ("features", "id")
+
+
+class PredictionCache:
+    """
+    Bounded LRU (with optional TTL) in front of the RUL model.
+
+    Keys are either (machineID, time_in_cycles) or the full feature vector
+    in features_col order, so a replayed row becomes a dict lookup instead
+    of a model call.
+
+    clear() starts a new generation. A caller reads `generation` before it
+    scores a row and passes it to put(), so a prediction that was still being
+    computed when the model was swapped (and the cache cleared) is dropped
+    instead of being cached for the new model.
+    """
+
+    def __init__(self, features_col, maxsize=RUL_CACHE_SIZE, ttl=RUL_CACHE_TTL, key_mode=RUL_CACHE_KEY):
+        if key_mode not in KEY_MODES:
+            raise ValueError(f"Unknown cache key mode: {key_mode}")
+        self.features_col = list(features_col)
+        self.maxsize = maxsize
+        self.ttl = ttl or None
+        self.key_mode = key_mode
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale = 0
+        self.generation = 0
+        self._entries = OrderedDict()   # key -> (value, stored_at)
+        self._lock = threading.Lock()
+
+    def key(self, row):
+        if self.key_mode == "id":
+            return (row.get("machineID"), row.get("time_in_cycles"))
+        return tuple(row[col] for col in self.features_col)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, stored_at = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                self.stale += 1
+                return
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "key_mode": self.key_mode,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "stale": self.stale,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,175 @@
+"""
+Incremental readers for the data files: records are yielded as soon as they
+are parsed, so memory stays flat and the first record is available after
+reading one chunk, however large the file is.
+
+Supports a top-level JSON array of records (the current data/*.json files)
+and NDJSON / JSON Lines (*.ndjson, *.jsonl), one record per line.
+
+    python record_reader.py to-ndjson ../data/rtls.json ../data/rtls.ndjson
+"""
+import os
+import json
+
+CHUNK_SIZE = 64 * 1024
+NDJSON_SUFFIXES = (".ndjson", ".jsonl")
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+
+
+class RecordReader:
+    """
+    Iterating yields (record, offset) pairs. offset is how far into the file
+    the record ends (in characters, which equals bytes for ASCII data), so
+    offset / size gives replay progress without knowing the record count.
+
+    The file is opened in the constructor, so a missing file raises
+    FileNotFoundError right away; malformed or truncated content raises
+    json.JSONDecodeError when the reader gets to it (after the records
+    before it were yielded).
+    """
+
+    def __init__(self, path, chunk_size=CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.size = os.path.getsize(path)
+        self.ndjson = path.endswith(NDJSON_SUFFIXES)
+        self._file = open(path, "r", encoding="utf-8")
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self):
+        return self._iter_lines() if self.ndjson else self._iter_array()
+
+    def records(self):
+        for record, _ in self:
+            yield record
+
+    def batches(self, size):
+        """Lists of up to `size` (record, offset) pairs, for vectorized work per batch."""
+        batch = []
+        for item in self:
+            batch.append(item)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _iter_lines(self):
+        offset = 0
+        for number, line in enumerate(self._file, 1):
+            offset += len(line)
+            if line.strip():
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise json.JSONDecodeError(f"{e.msg} (line {number} of {self.path})", e.doc, e.pos) from None
+                yield record, offset
+
+    def _expect_end(self, rest):
+        # Only whitespace may follow the closing bracket
+        while True:
+            if rest.strip(_WHITESPACE):
+                raise json.JSONDecodeError("Extra data after the JSON array", rest, len(rest) - len(rest.lstrip(_WHITESPACE)))
+            rest = self._file.read(self.chunk_size)
+            if not rest:
+                return
+
+    def _iter_array(self):
+        buffer = ""
+        pos = 0
+        consumed = 0   # characters dropped from the front of buffer
+        eof = False
+        state = "start"   # start -> first -> separator <-> value
+
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos >= len(buffer):
+                if eof:
+                    if state == "start":
+                        raise json.JSONDecodeError("Expected a JSON array of records", buffer, pos)
+                    raise json.JSONDecodeError("Unterminated JSON array", buffer, pos)
+                consumed += pos
+                buffer = self._file.read(self.chunk_size)
+                pos = 0
+                eof = not buffer
+                continue
+
+            char = buffer[pos]
+            if state == "start":
+                if char != "[":
+                    raise json.JSONDecodeError("Expected a JSON array of records", buffer, pos)
+                state = "first"
+                pos += 1
+                continue
+            if state == "separator":
+                if char == "]":
+                    self._expect_end(buffer[pos + 1:])
+                    return
+                if char != ",":
+                    raise json.JSONDecodeError("Expected ',' or ']' between records", buffer, pos)
+                state = "value"
+                pos += 1
+                continue
+            if char == "]":
+                if state == "value":
+                    raise json.JSONDecodeError("Expected a record after ','", buffer, pos)
+                self._expect_end(buffer[pos + 1:])
+                return
+
+            try:
+                record, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                end = None
+            # A record touching the end of the buffer may be cut off (e.g. a number)
+            if end is None or (end == len(buffer) and not eof):
+                more = self._file.read(self.chunk_size)
+                if not more:
+                    eof = True
+                    if end is None:
+                        _decoder.raw_decode(buffer, pos)   # re-raise with context
+                consumed += pos
+                buffer = buffer[pos:] + more
+                pos = 0
+                continue
+
+            pos = end
+            state = "separator"
+            yield record, consumed + pos
+
+
+def iter_records(path):
+    with RecordReader(path) as reader:
+        yield from reader.records()
+
+
+def to_ndjson(source, destination):
+    count = 0
+    with open(destination, "w", encoding="utf-8") as out:
+        for record in iter_records(source):
+            out.write(json.dumps(record, separators=(",", ":")))
+            out.write("\n")
+            count += 1
+    return count
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) == 4 and sys.argv[1] == "to-ndjson":
+        print(f"Wrote {to_ndjson(sys.argv[2], sys.argv[3])} records to {sys.argv[3]}")
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,123 @@
+import os
+import time
+import json
+import threading
+import logging
+
+from columnar_cache import open_records
+from metrics import file_load_seconds
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_RELOAD_INTERVAL = float(os.environ.get("REGISTRY_RELOAD_INTERVAL", 5))
+
+
+def _group_by(records, field):
+    index = {}
+    for record in records:
+        index.setdefault(record.get(field), []).append(record)
+    return index
+
+
+class RegistrySnapshot:
+    """Immutable set of indexes, built once per (re)load."""
+
+    def __init__(self, employees, machines):
+        self.employees = employees
+        self.machines = machines
+        self.employee_by_mac = {e["mac_address"]: e for e in employees}
+        self.machine_by_id = {m["machine_id"]: m for m in machines}
+        self.machine_by_mac = {m["mac_address"]: m for m in machines}
+        self.employees_by = {field: _group_by(employees, field) for field in ("company", "floor", "role")}
+        self.machines_by = {field: _group_by(machines, field) for field in ("company", "floor")}
+
+
+class Registry:
+    """
+    Employees and machines indexed by MAC / machine_id, with secondary
+    indexes by company, floor and role.
+
+    Readers always go through the current snapshot, and reload() builds a new
+    one before swapping the reference, so lookups never see a half-built index
+    and the server does not need a restart when employee_table.json changes.
+    """
+
+    def __init__(self, employee_file, machines):
+        self.employee_file = employee_file
+        self._machines = list(machines)
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._watcher = None
+        self.snapshot = RegistrySnapshot([], self._machines)
+        self.reload()
+
+    def reload(self):
+        with self._lock:
+            try:
+                mtime = os.path.getmtime(self.employee_file)
+                with file_load_seconds.labels(os.path.basename(self.employee_file)).time():
+                    with open_records(self.employee_file) as records:
+                        employees = list(records.records())
+            except (OSError, json.JSONDecodeError) as e:
+                # Keep serving the previous snapshot
+                logger.error("Registry reload failed for %s: %s", self.employee_file, e)
+                return False
+            self.snapshot = RegistrySnapshot(employees, self._machines)
+            self._mtime = mtime
+        logger.info("Registry loaded: %d employees, %d machines", len(employees), len(self._machines))
+        return True
+
+    def reload_if_changed(self):
+        try:
+            mtime = os.path.getmtime(self.employee_file)
+        except OSError:
+            return False
+        if mtime != self._mtime:
+            return self.reload()
+        return False
+
+    def watch(self, interval=REGISTRY_RELOAD_INTERVAL):
+        """Poll the employee file in a daemon thread and reload on change."""
+        if self._watcher is not None or interval <= 0:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                self.reload_if_changed()
+
+        self._watcher = threading.Thread(target=run, name="registry-watch", daemon=True)
+        self._watcher.start()
+        os.register_at_fork(after_in_child=lambda: self._rewatch(interval))
+
+    def _rewatch(self, interval):
+        # Forked worker: the watcher thread (and maybe a reload holding the lock) stayed in the parent
+        self._lock = threading.Lock()
+        self._watcher = None
+        self.watch(interval)
+
+    def employee(self, mac):
+        return self.snapshot.employee_by_mac.get(mac)
+
+    def machine(self, machine_id):
+        return self.snapshot.machine_by_id.get(machine_id)
+
+    def machine_by_mac(self, mac):
+        return self.snapshot.machine_by_mac.get(mac)
+
+    def employees(self, company=None, floor=None, role=None):
+        return self._filter(self.snapshot.employees, self.snapshot.employees_by,
+                            company=company, floor=floor, role=role)
+
+    def machines(self, company=None, floor=None):
+        return self._filter(self.snapshot.machines, self.snapshot.machines_by,
+                            company=company, floor=floor)
+
+    @staticmethod
+    def _filter(records, indexes, **filters):
+        filters = {field: value for field, value in filters.items() if value is not None}
+        if not filters:
+            return records
+        # Start from the smallest matching bucket, then check the other fields
+        buckets = sorted((indexes[field].get(value, []) for field, value in filters.items()), key=len)
+        return [r for r in buckets[0] if all(r.get(field) == value for field, value in filters.items())]
@@ -0,0 +1,72 @@
+import os
+import time
+import datetime
+
+# ?speed=max replays without any sleeping, for benchmarking
+MAX_SPEED = "max"
+SPEED_LIMIT = 100000
+# Longest pause (in recorded seconds) between two records, so gaps of days in an export don't stall the stream
+REPLAY_MAX_GAP = float(os.environ.get("REPLAY_MAX_GAP", 60))
+
+
+def parse_speed(value):
+    """
+    Query parameter to a speed: None (default pacing), a float factor or
+    MAX_SPEED. Raises ValueError for anything else.
+    """
+    if value is None or value == "":
+        return None
+    if value.lower() == MAX_SPEED:
+        return MAX_SPEED
+    speed = float(value.lower().rstrip("x"))
+    if not 0 < speed <= SPEED_LIMIT:
+        raise ValueError(f"speed must be between 0 and {SPEED_LIMIT}")
+    return speed
+
+
+def record_time(row):
+    """Recorded time of an RTLS row in seconds: `timestamp` (epoch ms) or `localtime`."""
+    timestamp = row.get("timestamp")
+    if isinstance(timestamp, (int, float)):
+        return timestamp / 1000
+    localtime = row.get("localtime")
+    if localtime:
+        try:
+            return datetime.datetime.fromisoformat(localtime).timestamp()
+        except ValueError:
+            return None
+    return None
+
+
+class ReplayScheduler:
+    """
+    Maps record times onto the monotonic clock: a record at recorded time t
+    is due at start + (t - t0) / speed. delay() returns how long to wait from
+    now, computed against that absolute timeline rather than by summing
+    sleeps, so oversleeping or slow sends are caught up on the next records.
+
+    Records that go back in time or carry no time are due immediately, and
+    forward gaps longer than max_gap are shortened to max_gap.
+    """
+
+    def __init__(self, speed=1.0, max_gap=REPLAY_MAX_GAP, clock=time.monotonic):
+        self.speed = speed
+        self.max_gap = max_gap
+        self.clock = clock
+        self._start = None
+        self._last_time = None
+        self._elapsed = 0.0   # recorded seconds since the first record, gaps capped
+
+    def delay(self, recorded):
+        if self.speed == MAX_SPEED:
+            return 0.0
+        now = self.clock()
+        if self._start is None:
+            self._start = now
+        if recorded is not None:
+            if self._last_time is not None and recorded > self._last_time:
+                self._elapsed += min(recorded - self._last_time, self.max_gap)
+            if self._last_time is None or recorded > self._last_time:
+                self._last_time = recorded
+        due = self._start + self._elapsed / self.speed
+        return max(due - now, 0.0)
@@ -0,0 +1,123 @@
+"""
+Synthetic location engine: pushes RTLS updates to /ingest/rtls (NDJSON over
+keep-alive HTTP) or to the UDP listener, at a target rate.
+
+    python rtls_generator.py --rate 50000 --duration 10
+    python rtls_generator.py --udp 5005 --rate 50000
+
+Rows rejected with 429 are resent after Retry-After, so the reported
+"delivered" rate is what the server actually accepted.
+"""
+import json
+import time
+import random
+import socket
+import argparse
+import http.client
+
+EMPLOYEE_DATA_FILE = "../data/employee_table.json"
+FLOORS = ["Ground Floor", "1st Floor", "2nd Floor", "3rd Floor"]
+# Site bounding box around the zone thresholds in zones.py
+LAT_RANGE = (51.4600, 51.4610)
+LNG_RANGE = (-0.9335, -0.9320)
+# Keep datagrams under a typical MTU-friendly size
+UDP_ROWS_PER_DATAGRAM = 8
+
+
+def load_macs(path=EMPLOYEE_DATA_FILE):
+    try:
+        with open(path, "r") as file:
+            return [e["mac_address"] for e in json.load(file) if e.get("mac_address")]
+    except (OSError, json.JSONDecodeError):
+        return [f"00:00:00:00:{i // 256:02x}:{i % 256:02x}" for i in range(200)]
+
+
+def make_rows(macs, count):
+    now = int(time.time() * 1000)
+    return [json.dumps({
+        "ClientMacAddr": random.choice(macs),
+        "timestamp": now,
+        "lat": random.uniform(*LAT_RANGE),
+        "lng": random.uniform(*LNG_RANGE),
+        "level": random.choice(FLOORS),
+    }, separators=(",", ":")) for _ in range(count)]
+
+
+class RowPool:
+    """Pre-encoded rows handed out round-robin, so encoding doesn't cap the send rate."""
+
+    def __init__(self, macs, size=100000):
+        self.rows = make_rows(macs, size)
+        self.pos = 0
+
+    def take(self, count):
+        rows = self.rows[self.pos:self.pos + count]
+        self.pos = (self.pos + count) % len(self.rows)
+        return rows
+
+
+def post_batch(conn, lines):
+    """POST one batch; returns (accepted, retry_after) and keeps the rejected tail for the caller."""
+    conn.request("POST", "/ingest/rtls", body="\n".join(lines).encode(),
+                 headers={"Content-Type": "application/x-ndjson"})
+    response = conn.getresponse()
+    body = json.loads(response.read() or b"{}")
+    retry_after = float(response.getheader("Retry-After", 1)) if response.status == 429 else 0
+    if response.status not in (202, 429):
+        raise RuntimeError(f"HTTP {response.status}: {body}")
+    return body.get("accepted", 0), retry_after
+
+
+def run_http(args, pool):
+    conn = http.client.HTTPConnection(args.host, args.port, timeout=10)
+    sent = delivered = throttled = 0
+    pending = []
+    start = time.perf_counter()
+    while time.perf_counter() - start < args.duration:
+        due = int((time.perf_counter() - start) * args.rate)
+        if not pending and sent >= due:
+            time.sleep(0.001)
+            continue
+        if not pending:
+            pending = pool.take(min(args.batch, due - sent))
+            sent += len(pending)
+        accepted, retry_after = post_batch(conn, pending)
+        delivered += accepted
+        pending = pending[accepted:]
+        if pending:
+            throttled += 1
+            time.sleep(min(retry_after, 0.05))
+    return sent, delivered, throttled, time.perf_counter() - start
+
+
+def run_udp(args, pool):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sent = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < args.duration:
+        due = int((time.perf_counter() - start) * args.rate)
+        if sent >= due:
+            time.sleep(0.001)
+            continue
+        rows = pool.take(min(UDP_ROWS_PER_DATAGRAM, due - sent))
+        sock.sendto("\n".join(rows).encode(), (args.host, args.udp))
+        sent += len(rows)
+    # UDP has no acknowledgement; compare with accepted/rejected in /ingest/stats
+    return sent, None, 0, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--udp", type=int, default=0, help="send to this UDP port instead of HTTP")
+    parser.add_argument("--rate", type=float, default=50000, help="updates per second")
+    parser.add_argument("--batch", type=int, default=1000, help="rows per HTTP POST")
+    parser.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args()
+
+    pool = RowPool(load_macs())
+    sent, delivered, throttled, elapsed = (run_udp if args.udp else run_http)(args, pool)
+    print(f"sent {sent} updates in {elapsed:.1f}s ({sent / elapsed:,.0f}/s)")
+    if delivered is not None:
+        print(f"delivered {delivered} ({delivered / elapsed:,.0f}/s), {throttled} batches throttled with 429")
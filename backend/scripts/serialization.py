@@ -0,0 +1,111 @@
+"""
+Event serialization for the SSE streams.
+
+- dumps() uses orjson when it is installed (pip install orjson) and falls
+  back to the standard json module with compact separators.
+- utc_timestamp() formats the current UTC time at millisecond resolution and
+  reuses the string for every event within the same millisecond.
+- Fragments pre-encodes the static members of a device's payload (name,
+  company, floor, ...) once per registry entry, so per event only the
+  changing members are encoded.
+
+    python serialization.py --bench      events/s per core, old vs new path
+"""
+import json
+import time
+import datetime
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+if orjson is not None:
+    def dumps(value):
+        return orjson.dumps(value).decode()
+else:
+    def dumps(value):
+        return json.dumps(value, separators=(",", ":"))
+
+
+def sse_event(event, payload):
+    return f"event: {event}\ndata: {dumps(payload)}\n\n"
+
+
+_timestamp_ms = None
+_timestamp = None
+
+
+def utc_timestamp():
+    """UTC now as ISO 8601 with milliseconds, formatted at most once per millisecond."""
+    global _timestamp_ms, _timestamp
+    now_ms = time.time_ns() // 1_000_000
+    if now_ms != _timestamp_ms:
+        # Assigned together so a racing thread at worst formats the same millisecond twice
+        _timestamp = datetime.datetime.utcfromtimestamp(now_ms / 1000).isoformat(timespec="milliseconds")
+        _timestamp_ms = now_ms
+    return _timestamp
+
+
+class Fragments:
+    """
+    Pre-encoded leading JSON object members per device. get(key, source,
+    build) returns '{"a":1,"b":2,' for build(source) and caches it while the
+    source record is the same object, so a registry reload (which creates new
+    records) re-encodes it. Callers append the dynamic members and the '}'.
+    """
+
+    def __init__(self):
+        self._cache = {}
+
+    def get(self, key, source, build):
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] is source:
+            return cached[1]
+        members = build(source)
+        fragment = dumps(members)[:-1] + "," if members else "{"
+        self._cache[key] = (source, fragment)
+        return fragment
+
+    def __len__(self):
+        return len(self._cache)
+
+
+def benchmark(count=200_000):
+    """Old per-event dict + json.dumps + utcnow().isoformat() vs fragments, for one update event."""
+    employee = {"name": "Alfreda Mendelsohn", "company": "Samsung", "role": "quality_control", "floor": "Ground Floor"}
+    mac = "f0:18:98:20:75:b1"
+    location = [51.4604664733, -0.9325601792]
+    fragments = Fragments()
+
+    def build(e):
+        return {"mac_address": mac, "name": e["name"], "company": e["company"], "role": e["role"], "floor": e["floor"]}
+
+    start = time.perf_counter()
+    for _ in range(count):
+        payload = {"mac_address": mac, "name": employee["name"], "company": employee["company"],
+                   "role": employee["role"], "floor": employee["floor"], "location": location,
+                   "timestamp": datetime.datetime.utcnow().isoformat()}
+        old_message = f"event: update\ndata: {json.dumps(payload)}\n\n"
+    old = count / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(count):
+        prefix = fragments.get(mac, employee, build)
+        new_message = f'event: update\ndata: {prefix}"location":{dumps(location)},"timestamp":"{utc_timestamp()}"}}\n\n'
+    new = count / (time.perf_counter() - start)
+
+    assert json.loads(old_message.split("data: ")[1]).keys() == json.loads(new_message.split("data: ")[1]).keys()
+    print(f"encoder: {'orjson ' + orjson.__version__ if orjson else 'json (install orjson for the fast path)'}")
+    print(f"dict + json.dumps:     {old:12,.0f} events/s")
+    print(f"fragments + {'orjson' if orjson else 'json'}:  {new:12,.0f} events/s ({new / old:.1f}x)")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "--bench" in sys.argv:
+        benchmark()
+    else:
+        print(__doc__)
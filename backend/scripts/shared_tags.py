@@ -0,0 +1,146 @@
+"""
+Latest position and zone per RTLS tag, in memory shared by forked worker
+processes (see workers.py).
+
+The table is an anonymous shared mmap viewed as a numpy structured array,
+one row per tag. Rows are assigned from the registry's MACs when the table
+is created, and SHARED_TAG_SPARE_SLOTS more are left free for MACs a
+registry reload adds later. Any process can assign a spare row (under the
+table's lock); the MAC is stored in the row, so the other processes pick
+it up. Once the spare rows are used up, further new MACs are streamed only
+by the worker that ingested them (write() reports them).
+
+Writers stamp the rows of a batch with the next sequence number and
+publish it in the header afterwards, so a reader that asks for changes
+after its last sequence number sees every row once it is complete.
+A row rewritten while it is being read is picked up again (with its final
+value) on the next poll.
+"""
+import os
+import mmap
+import logging
+import multiprocessing
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SHARED_TAG_SPARE_SLOTS = int(os.environ.get("SHARED_TAG_SPARE_SLOTS", 1024))
+MAC_BYTES = 32
+TAG_DTYPE = np.dtype([("seq", np.uint64), ("lat", np.float64), ("lng", np.float64), ("zone", np.int16),
+                      ("mac", f"S{MAC_BYTES}")])
+NO_COMPANY = -1
+# Header words: latest sequence number, rows assigned
+SEQ, ASSIGNED = 0, 1
+
+
+class SharedTagTable:
+    """
+    Create before forking; every process then reads and writes the same rows.
+    known(mac) decides which new MACs may take a spare row (any MAC when
+    None), so unknown devices cannot use them up.
+    """
+
+    def __init__(self, macs, companies, spare=SHARED_TAG_SPARE_SLOTS, known=None):
+        self.macs = list(dict.fromkeys(macs))
+        self.slots = {mac: i for i, mac in enumerate(self.macs)}
+        self.capacity = len(self.macs) + spare
+        self.known = known
+        self.companies = [c for c in dict.fromkeys(companies) if c is not None]
+        self.company_codes = {c: i for i, c in enumerate(self.companies)}
+        # Trailing None so NO_COMPANY (-1) indexes it
+        self._company_names = np.array(self.companies + [None], dtype=object)
+        header = 2 * np.dtype(np.uint64).itemsize
+        self._mmap = mmap.mmap(-1, header + TAG_DTYPE.itemsize * max(self.capacity, 1))
+        self._header = np.frombuffer(self._mmap, dtype=np.uint64, count=2)
+        self.rows = np.frombuffer(self._mmap, dtype=TAG_DTYPE, count=self.capacity, offset=header)
+        self.rows["mac"][:len(self.macs)] = [mac.encode() for mac in self.macs]
+        self._header[ASSIGNED] = len(self.macs)
+        self._lock = multiprocessing.Lock()
+        self._full_logged = False
+
+    @classmethod
+    def for_registry(cls, registry, geofences=None, companies=(), spare=SHARED_TAG_SPARE_SLOTS):
+        macs = [employee["mac_address"] for employee in registry.employees()]
+        if geofences is not None:
+            companies = list(companies) + [zone.company for zone in geofences.zones]
+        # Looked up in each process's own registry, so MACs added by a hot reload get a row
+        return cls(macs, companies, spare, known=lambda mac: registry.employee(mac) is not None)
+
+    def __len__(self):
+        return int(self._header[ASSIGNED])
+
+    @property
+    def seq(self):
+        return int(self._header[SEQ])
+
+    def _sync(self):
+        # Caller holds self._lock: adopt the rows other processes assigned
+        for slot in range(len(self.macs), int(self._header[ASSIGNED])):
+            mac = self.rows["mac"][slot].decode()
+            self.macs.append(mac)
+            self.slots[mac] = slot
+
+    def _assign(self, mac):
+        """Row for a MAC that had none, -1 if it may not or cannot have one."""
+        if not isinstance(mac, str) or (self.known is not None and not self.known(mac)):
+            return -1
+        encoded = mac.encode()
+        if len(encoded) > MAC_BYTES:
+            return -1
+        if self._header[ASSIGNED] >= self.capacity and len(self.macs) == self.capacity:
+            return self._full(mac)
+        with self._lock:
+            self._sync()
+            slot = self.slots.get(mac)
+            if slot is not None:
+                return slot
+            slot = len(self.macs)
+            if slot >= self.capacity:
+                return self._full(mac)
+            self.rows["mac"][slot] = encoded
+            self._header[ASSIGNED] = slot + 1
+            self.macs.append(mac)
+            self.slots[mac] = slot
+        return slot
+
+    def _full(self, mac):
+        if not self._full_logged:
+            logger.warning("Shared tag table is full (%d rows), new tags such as %s are streamed only by "
+                           "the worker that ingests them; raise SHARED_TAG_SPARE_SLOTS", self.capacity, mac)
+            self._full_logged = True
+        return -1
+
+    def write(self, macs, lat, lng, zone_companies):
+        """Store one batch; returns the indexes of rows whose MAC has no slot."""
+        slots = np.fromiter((self.slots.get(mac, -1) for mac in macs), dtype=np.int64, count=len(macs))
+        for i in np.flatnonzero(slots < 0).tolist():
+            slots[i] = self._assign(macs[i])
+        known = np.flatnonzero(slots >= 0)
+        if len(known):
+            zones = np.fromiter((self.company_codes.get(c, NO_COMPANY) for c in zone_companies),
+                                dtype=np.int16, count=len(macs))
+            target = slots[known]
+            with self._lock:
+                seq = self._header[SEQ] + 1
+                self.rows["lat"][target] = np.asarray(lat, dtype=np.float64)[known]
+                self.rows["lng"][target] = np.asarray(lng, dtype=np.float64)[known]
+                self.rows["zone"][target] = zones[known]
+                self.rows["seq"][target] = seq
+                # Readers only look at rows up to the header, so this publishes the batch
+                self._header[SEQ] = seq
+        return np.flatnonzero(slots < 0)
+
+    def changes(self, after):
+        """(seq, [(mac, lat, lng, zone_company), ...]) for rows written after sequence number `after`."""
+        seq = self._header[SEQ]
+        # Rows are assigned before they are written, so this covers every row up to seq
+        if self._header[ASSIGNED] != len(self.macs):
+            with self._lock:
+                self._sync()
+        row_seq = self.rows["seq"]
+        changed = np.flatnonzero((row_seq > after) & (row_seq <= seq))
+        rows = self.rows[changed]
+        macs = [self.macs[i] for i in changed.tolist()]
+        return int(seq), list(zip(macs, rows["lat"].tolist(), rows["lng"].tolist(),
+                                  self._company_names[rows["zone"]].tolist()))
@@ -0,0 +1,147 @@
+"""
+Open many concurrent SSE connections against a running backend and report
+connections held, server RSS / thread count and event delivery latency.
+
+    python sse_load_test.py --clients 5000 --duration 60 --pid <server pid>
+
+Latency is measured from the payload "timestamp" (server clock, UTC) to the
+moment the event is read, so run it on the same host as the server.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import resource
+import time
+
+
+def read_proc_status(pid):
+    stats = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key == "VmRSS":
+                    stats["rss_mb"] = int(value.split()[0]) / 1024
+                elif key == "Threads":
+                    stats["threads"] = int(value)
+    except FileNotFoundError:
+        pass
+    return stats
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+class Results:
+    def __init__(self):
+        self.connected = 0
+        self.failed = 0
+        self.events = 0
+        self.latencies_ms = []
+
+
+async def sse_client(host, port, path, results, stop):
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        results.failed += 1
+        return
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n".encode())
+    await writer.drain()
+
+    status = await reader.readline()
+    if b" 200 " not in status:
+        results.failed += 1
+        writer.close()
+        return
+    results.connected += 1
+    try:
+        while not stop.is_set():
+            line = await reader.readline()
+            if not line:
+                break
+            if not line.startswith(b"data: "):
+                continue
+            received = datetime.datetime.utcnow()
+            results.events += 1
+            try:
+                payload = json.loads(line[6:])
+                # Compact frames carry the time as "t"
+                sent = datetime.datetime.fromisoformat(payload.get("timestamp") or payload["t"])
+                results.latencies_ms.append((received - sent).total_seconds() * 1000)
+            except (ValueError, KeyError, TypeError):
+                pass
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        results.connected -= 1
+        writer.close()
+
+
+async def run(args):
+    results = Results()
+    stop = asyncio.Event()
+    clients = []
+    for i in range(args.clients):
+        clients.append(asyncio.create_task(sse_client(args.host, args.port, args.path, results, stop)))
+        if args.ramp and i % 100 == 99:
+            await asyncio.sleep(args.ramp)
+
+    started = time.monotonic()
+    peak = 0
+    while time.monotonic() - started < args.duration:
+        await asyncio.sleep(1)
+        peak = max(peak, results.connected)
+        line = f"[{time.monotonic() - started:5.0f}s] held={results.connected} failed={results.failed} events={results.events}"
+        if args.pid:
+            line += " " + " ".join(f"{k}={v:.1f}" if isinstance(v, float) else f"{k}={v}" for k, v in read_proc_status(args.pid).items())
+        print(line, flush=True)
+
+    held = results.connected
+    stop.set()
+    for task in clients:
+        task.cancel()
+    await asyncio.gather(*clients, return_exceptions=True)
+
+    report = {
+        "clients": args.clients,
+        "connections_held": held,
+        "peak_connections": peak,
+        "failed": results.failed,
+        "events": results.events,
+        "latency_p50_ms": percentile(results.latencies_ms, 50),
+        "latency_p99_ms": percentile(results.latencies_ms, 99),
+    }
+    if args.pid:
+        report.update({f"server_{k}": v for k, v in read_proc_status(args.pid).items()})
+    print(json.dumps(report, indent=2))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--path", default="/stream/rtls")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=30, help="seconds to hold the connections")
+    parser.add_argument("--ramp", type=float, default=0.05, help="pause after every 100 connects")
+    parser.add_argument("--pid", type=int, help="server pid, for RSS and thread count")
+    args = parser.parse_args()
+
+    # Each client needs a file descriptor
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < args.clients + 100:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, args.clients + 100), hard))
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
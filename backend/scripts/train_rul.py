@@ -0,0 +1,329 @@
+"""
+Local, out-of-core training for the RUL model (the same model as the Colab
+script model_training_machine_prediction.py, without loading the CSV).
+
+The CSV (columns of remaining_useful_life.csv) is read in CSV_CHUNK_ROWS
+row chunks as float32 and never held in memory as a whole:
+
+1. A first pass collects the column means used for missing features, the
+   `model` values behind model_encoded and the row counts.
+2. An xgboost.DataIter re-reads the file chunk by chunk for every
+   DMatrix. By default it feeds an ExtMemQuantileDMatrix, which keeps the
+   quantized pages on disk under --cache-dir (--in-memory: QuantileDMatrix).
+   What stays in RAM is about 25 bytes per row (labels, gradients).
+3. Every row gets a fixed random split from a per-chunk seed: TEST_SIZE of
+   the rows are held out, the rest are spread over --folds CV folds. The
+   folds train in parallel processes that share the cores, as many at
+   once as fit in TRAIN_MEMORY_GB (16).
+4. The final model is trained on every non-test row and written as
+   <output>.json (booster), <output>.pkl (XGBRegressor, loadable like
+   ../model/xgboost_model.pkl) and <output>.manifest.json (feature schema,
+   encodings, fill values, metrics).
+
+    python train_rul.py train remaining_useful_life.csv [--output ../model/rul_model] [--folds 5] [--jobs N]
+    python train_rul.py synth data.csv --rows 1000000   labelled CSV from sample_rul.csv and the current model
+"""
+import os
+import json
+import time
+import shutil
+import logging
+import argparse
+import datetime
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+logger = logging.getLogger(__name__)
+
+CSV_CHUNK_ROWS = int(os.environ.get("CSV_CHUNK_ROWS", 1_000_000))
+# 1 cycle = 24 hours; the model predicts hours
+CYCLE_TO_HOUR_FACTOR = 24.0
+TEST_SIZE = 0.2
+SEED = 42
+NUM_BOOST_ROUND = 200
+# RAM for all fold processes together; with external memory XGBoost still keeps
+# about 25 bytes per training row (labels, gradients, predictions) plus ~250 MB
+TRAIN_MEMORY_GB = float(os.environ.get("TRAIN_MEMORY_GB", 16))
+ROW_BYTES = 32
+PROCESS_BYTES = 512 * 2 ** 20
+PARAMS = {"objective": "reg:squarederror", "learning_rate": 0.05, "max_depth": 6, "seed": SEED,
+          "tree_method": "hist"}
+
+FEATURES = ['time_in_cycles', 'voltmean_24h', 'rotatemean_24h', 'pressuremean_24h',
+            'vibrationmean_24h', 'voltsd_24h', 'rotatesd_24h', 'pressuresd_24h',
+            'vibrationsd_24h', 'voltmean_5d', 'rotatemean_5d', 'pressuremean_5d',
+            'vibrationmean_5d', 'voltsd_5d', 'rotatesd_5d', 'pressuresd_5d',
+            'vibrationsd_5d', 'error1', 'error2', 'error3', 'error4', 'error5',
+            'comp1', 'comp2', 'comp3', 'comp4', 'age', 'model_encoded', 'DI']
+# Columns the CSV may leave out, filled with 0 as in load_and_preprocess_data; others become missing
+ZERO_DEFAULTS = {'error1', 'error2', 'error3', 'error4', 'error5', 'comp1', 'comp2', 'comp3', 'comp4',
+                 'age', 'time_in_cycles', 'DI'}
+NUMERIC = [col for col in FEATURES if col != "model_encoded"]
+TEST = -1
+
+
+def read_chunks(path, chunk_rows=CSV_CHUNK_ROWS):
+    """Chunks of the columns we need, numbers as float32, rows without RUL dropped."""
+    header = pd.read_csv(path, nrows=0).columns
+    columns = [col for col in NUMERIC + ["model", "RUL"] if col in header]
+    if "RUL" not in columns:
+        raise ValueError(f"{path} has no RUL column")
+    dtype = {col: np.float32 for col in columns if col != "model"}
+    dtype["model"] = str
+    with pd.read_csv(path, usecols=columns, dtype=dtype, chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            yield chunk[chunk["RUL"].notna()]
+
+
+def scan(path, chunk_rows=CSV_CHUNK_ROWS):
+    """First pass: fill values, model categories and row count."""
+    sums = {}
+    counts = {}
+    models = set()
+    rows = 0
+    for chunk in read_chunks(path, chunk_rows):
+        rows += len(chunk)
+        for col in NUMERIC:
+            if col in chunk:
+                values = chunk[col].to_numpy(np.float64)
+                sums[col] = sums.get(col, 0.0) + np.nansum(values)
+                counts[col] = counts.get(col, 0) + int(np.count_nonzero(~np.isnan(values)))
+        if "model" in chunk:
+            models.update(chunk["model"].fillna("unknown").unique())
+    if not rows:
+        raise ValueError(f"No rows with RUL in {path}")
+    fill_values = {}
+    for col in NUMERIC:
+        if col in counts:
+            fill_values[col] = sums[col] / counts[col] if counts[col] else None
+        else:
+            fill_values[col] = 0.0 if col in ZERO_DEFAULTS else None
+    # Sorted like sklearn's LabelEncoder
+    return {"rows": rows, "fill_values": fill_values, "model_categories": sorted(models or {"unknown"})}
+
+
+def chunk_matrix(chunk, schema):
+    """(float32 features in FEATURES order, float32 RUL in hours)."""
+    matrix = np.empty((len(chunk), len(FEATURES)), dtype=np.float32)
+    fill_values = schema["fill_values"]
+    categories = np.array(schema["model_categories"])
+    for i, col in enumerate(FEATURES):
+        if col == "model_encoded":
+            models = chunk["model"].fillna("unknown").to_numpy(str) if "model" in chunk else np.full(len(chunk), "unknown")
+            matrix[:, i] = np.searchsorted(categories, models)
+        elif col in chunk:
+            fill = fill_values[col]
+            matrix[:, i] = chunk[col].fillna(fill).to_numpy(np.float32) if fill is not None else chunk[col].to_numpy(np.float32)
+        else:
+            matrix[:, i] = fill_values[col] if fill_values[col] is not None else np.nan
+    return matrix, chunk["RUL"].to_numpy(np.float32) * np.float32(CYCLE_TO_HOUR_FACTOR)
+
+
+def split_ids(chunk_index, n, folds, seed=SEED):
+    """TEST or a fold number per row; the same on every pass over the file."""
+    u = np.random.default_rng([seed, chunk_index]).random(n)
+    fold = ((u - TEST_SIZE) / (1 - TEST_SIZE) * folds).astype(np.int64)
+    return np.where(u < TEST_SIZE, TEST, np.minimum(fold, folds - 1))
+
+
+def select(splits, part, fold=None):
+    """Rows of a part: "train" (all non-test), "test", "fit" (non-test minus `fold`) or "validate" (`fold`)."""
+    if part == "train":
+        return splits != TEST
+    if part == "test":
+        return splits == TEST
+    if part == "fit":
+        return (splits != TEST) & (splits != fold)
+    if part == "validate":
+        return splits == fold
+    raise ValueError(f"Unknown part {part}")
+
+
+def selected_chunks(path, schema, folds, part, fold=None, chunk_rows=CSV_CHUNK_ROWS):
+    for index, chunk in enumerate(read_chunks(path, chunk_rows)):
+        matrix, label = chunk_matrix(chunk, schema)
+        mask = select(split_ids(index, len(label), folds), part, fold)
+        if mask.any():
+            yield matrix[mask], label[mask]
+
+
+class ChunkIter(xgb.DataIter):
+    """Feeds one part of the CSV to XGBoost a chunk at a time."""
+
+    def __init__(self, path, schema, folds, part, fold=None, cache_prefix=None, chunk_rows=CSV_CHUNK_ROWS):
+        self._args = (path, schema, folds, part, fold)
+        self._chunk_rows = chunk_rows
+        self._chunks = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        if self._chunks is None:
+            self._chunks = selected_chunks(*self._args, chunk_rows=self._chunk_rows)
+        batch = next(self._chunks, None)
+        if batch is None:
+            return False
+        input_data(data=batch[0], label=batch[1])
+        return True
+
+    def reset(self):
+        if self._chunks is not None:
+            self._chunks.close()
+        self._chunks = None
+
+
+def build_dmatrix(path, schema, folds, part, fold=None, cache_dir=None, nthread=None):
+    """ExtMemQuantileDMatrix with a disk cache under cache_dir, QuantileDMatrix when cache_dir is None."""
+    if cache_dir is None:
+        return xgb.QuantileDMatrix(ChunkIter(path, schema, folds, part, fold), nthread=nthread)
+    prefix = os.path.join(cache_dir, f"{part}-{fold if fold is not None else 'all'}")
+    return xgb.ExtMemQuantileDMatrix(ChunkIter(path, schema, folds, part, fold, cache_prefix=prefix), nthread=nthread)
+
+
+def rmse(booster, path, schema, folds, part, fold=None):
+    """RMSE in hours over one part, predicted chunk by chunk."""
+    squared = 0.0
+    rows = 0
+    for matrix, label in selected_chunks(path, schema, folds, part, fold):
+        error = booster.inplace_predict(matrix).astype(np.float64) - label
+        squared += float(error @ error)
+        rows += len(label)
+    return float(np.sqrt(squared / rows)) if rows else None
+
+
+def train_part(path, schema, folds, part, fold, cache_dir, nthread, rounds):
+    dtrain = build_dmatrix(path, schema, folds, part, fold, cache_dir, nthread)
+    return xgb.train({**PARAMS, "nthread": nthread}, dtrain, num_boost_round=rounds)
+
+
+def cv_fold(path, schema, folds, fold, cache_dir, nthread, rounds):
+    """Runs in a worker process: train without `fold`, score on it."""
+    start = time.perf_counter()
+    booster = train_part(path, schema, folds, "fit", fold, cache_dir, nthread, rounds)
+    score = rmse(booster, path, schema, folds, "validate", fold)
+    logger.info("Fold %d: RMSE %.2f hours (%.0f s)", fold, score, time.perf_counter() - start)
+    return score
+
+
+def train(path, output, folds=5, jobs=None, cache_dir="../data/.cache/train", in_memory=False, rounds=NUM_BOOST_ROUND):
+    start = time.perf_counter()
+    schema = scan(path)
+    logger.info("%s: %d rows with RUL, model categories %s", path, schema["rows"], schema["model_categories"])
+    cores = os.cpu_count() or 1
+    jobs = max(1, min(jobs or cores, folds))
+    fold_bytes = schema["rows"] * (1 - TEST_SIZE) * ROW_BYTES + PROCESS_BYTES
+    if not in_memory and jobs * fold_bytes > TRAIN_MEMORY_GB * 2 ** 30:
+        jobs = max(1, int(TRAIN_MEMORY_GB * 2 ** 30 // fold_bytes))
+        logger.info("Training %d folds at a time to stay within TRAIN_MEMORY_GB=%g", jobs, TRAIN_MEMORY_GB)
+    work_dir = None
+    if not in_memory:
+        os.makedirs(cache_dir, exist_ok=True)
+        work_dir = tempfile.mkdtemp(prefix="rul-", dir=cache_dir)
+    try:
+        cv_rmse = []
+        if folds > 1:
+            # Each fold process gets its share of the cores
+            nthread = max(1, cores // jobs)
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                futures = [pool.submit(cv_fold, path, schema, folds, fold, work_dir, nthread, rounds)
+                           for fold in range(folds)]
+                cv_rmse = [future.result() for future in futures]
+            logger.info("Cross-validation RMSE: %.2f ± %.2f hours", np.mean(cv_rmse), np.std(cv_rmse))
+        booster = train_part(path, schema, folds, "train", None, work_dir, cores, rounds)
+        test_rmse = rmse(booster, path, schema, folds, "test")
+        logger.info("Test RMSE: %.2f hours", test_rmse)
+    finally:
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    booster.feature_names = FEATURES
+    return save(booster, output, {
+        "source": os.path.abspath(path),
+        "rows": schema["rows"],
+        "fill_values": schema["fill_values"],
+        "model_categories": schema["model_categories"],
+        "cv_rmse_hours": cv_rmse,
+        "test_rmse_hours": test_rmse,
+        "training_seconds": round(time.perf_counter() - start, 1),
+        "params": {**PARAMS, "num_boost_round": rounds, "folds": folds, "test_size": TEST_SIZE},
+    })
+
+
+def save(booster, output, info):
+    """Write <output>.json, <output>.pkl and <output>.manifest.json; returns the manifest."""
+    import joblib
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    booster.save_model(output + ".json")
+    model = xgb.XGBRegressor()
+    model.load_model(output + ".json")
+    joblib.dump(model, output + ".pkl")
+    manifest = {
+        "model": os.path.basename(output) + ".pkl",
+        "booster": os.path.basename(output) + ".json",
+        "features": FEATURES,
+        "dtype": "float32",
+        "target": "RUL_hours",
+        "cycle_to_hour_factor": CYCLE_TO_HOUR_FACTOR,
+        "created": datetime.datetime.utcnow().isoformat(),
+        "xgboost": xgb.__version__,
+        **info,
+    }
+    with open(output + ".manifest.json", "w") as file:
+        json.dump(manifest, file, indent=2)
+    logger.info("Wrote %s.json, %s.pkl and %s.manifest.json", output, output, output)
+    return manifest
+
+
+def synthesize(output, rows, model_file="../model/xgboost_model.pkl", sample_file="../data/sample_rul.csv",
+               chunk_rows=CSV_CHUNK_ROWS, seed=SEED):
+    """Jittered sample_rul.csv rows labelled with the current model, written chunk by chunk."""
+    import joblib
+
+    sample = pd.read_csv(sample_file)
+    categories = sorted(sample["model"].fillna("unknown").unique())
+    sample["model_encoded"] = np.searchsorted(categories, sample["model"].fillna("unknown"))
+    model = joblib.load(model_file)
+    rng = np.random.default_rng(seed)
+    start = datetime.datetime(2015, 1, 1)
+    written = 0
+    while written < rows:
+        n = min(chunk_rows, rows - written)
+        chunk = sample.iloc[rng.integers(0, len(sample), n)].reset_index(drop=True)
+        for col in NUMERIC:
+            if col.endswith(("_24h", "_5d", "DI")):
+                chunk[col] *= rng.normal(1.0, 0.03, n)
+        hours = np.maximum(model.predict(chunk[FEATURES].to_numpy(np.float32)), 0)
+        chunk["RUL"] = hours / CYCLE_TO_HOUR_FACTOR + rng.normal(0, 0.5, n)
+        chunk["datetime"] = start + pd.to_timedelta(chunk["time_in_cycles"], unit="D")
+        chunk.drop(columns=["model_encoded"]).to_csv(output, mode="a" if written else "w", header=not written,
+                                                     index=False)
+        written += n
+        logger.info("Wrote %d / %d rows", written, rows)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    train_args = commands.add_parser("train", help="train, cross-validate and write the model")
+    train_args.add_argument("csv")
+    train_args.add_argument("--output", default="../model/rul_model", help="path prefix of the written files")
+    train_args.add_argument("--folds", type=int, default=5, help="CV folds, 1 = no cross-validation")
+    train_args.add_argument("--jobs", type=int, default=None, help="folds trained at once (default: cores)")
+    train_args.add_argument("--rounds", type=int, default=NUM_BOOST_ROUND)
+    train_args.add_argument("--cache-dir", default="../data/.cache/train", help="external-memory page cache")
+    train_args.add_argument("--in-memory", action="store_true", help="QuantileDMatrix instead of external memory")
+    synth_args = commands.add_parser("synth", help="write a labelled CSV to try the pipeline")
+    synth_args.add_argument("csv")
+    synth_args.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    if args.command == "train":
+        manifest = train(args.csv, args.output, args.folds, args.jobs, args.cache_dir, args.in_memory, args.rounds)
+        print(json.dumps({key: manifest[key] for key in ("rows", "cv_rmse_hours", "test_rmse_hours", "training_seconds")}))
+    else:
+        synthesize(args.csv, args.rows)
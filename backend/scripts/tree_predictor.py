@@ -0,0 +1,225 @@
+"""
+Faster scoring backends for the pickled XGBRegressor (../model/xgboost_model.pkl).
+
+RUL_PREDICTOR selects what predict_rul and the BatchPredictor call:
+
+    sklearn   model.predict() through the sklearn wrapper, which builds a DMatrix per call
+    inplace   booster.inplace_predict() straight on the float32 matrix
+    numpy     TreeEnsemble: the trees flattened into NumPy arrays and walked level
+              by level for every row and every tree at once
+
+All of them return the same float32 predictions as the pickle.
+
+    python tree_predictor.py --check    parity of every backend against model.predict
+    python tree_predictor.py --bench    single-row and batch latency per backend
+"""
+import os
+import json
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+RUL_PREDICTOR = os.environ.get("RUL_PREDICTOR", "sklearn")
+
+
+class InplacePredictor:
+    """Booster.inplace_predict without the sklearn wrapper and DMatrix construction."""
+
+    def __init__(self, booster):
+        self.booster = booster
+
+    def predict(self, matrix):
+        return self.booster.inplace_predict(np.asarray(matrix, dtype=np.float32))
+
+
+class TreeEnsemble:
+    """
+    A gbtree regression model as flat arrays.
+
+    Every tree is padded to a complete binary tree of the ensemble's depth (a
+    leaf above the bottom level is copied into every bottom slot below it), so
+    every row takes exactly `depth` steps of node = left[node] + go_right.
+    Split nodes of all trees come first in node numbering, then the leaves.
+    Features are compared as float32 like XGBoost does, missing values (NaN)
+    follow the node's default direction, and the leaves are added to
+    base_score in tree order in float32, so the output is bit-identical to the
+    booster's.
+    """
+
+    def __init__(self, feature, threshold, default_right, leaves, base_score, num_features):
+        self.n_trees, n_inner = feature.shape
+        self.depth = int(np.log2(n_inner + 1))
+        self.num_features = num_features
+        self.base_score = np.float32(base_score)
+        self._feature = feature.astype(np.intp).ravel()
+        self._threshold = threshold.astype(np.float32).ravel()
+        self._default_right = default_right.astype(bool).ravel()
+        self._leaves = leaves.astype(np.float32).ravel()
+        self._n_split = self._feature.size
+        self._roots = np.arange(self.n_trees, dtype=np.intp) * n_inner
+        # Heap children of local node i are 2i+1 and 2i+2; in the bottom split
+        # level they are leaf slots 2i+1-n_inner and 2i+2-n_inner of the tree
+        tree = np.repeat(np.arange(self.n_trees, dtype=np.intp), n_inner)
+        child = np.tile(2 * np.arange(n_inner, dtype=np.intp) + 1, self.n_trees)
+        self._left = np.where(child < n_inner, tree * n_inner + child,
+                              self._n_split + tree * (n_inner + 1) + child - n_inner)
+
+    @classmethod
+    def from_booster(cls, booster):
+        learner = json.loads(booster.save_raw("json"))["learner"]
+        objective = learner["objective"]["name"]
+        if objective not in ("reg:squarederror", "reg:linear"):
+            raise ValueError(f"TreeEnsemble only supports identity-link regression, not {objective}")
+        if learner["gradient_booster"]["name"] != "gbtree":
+            raise ValueError("TreeEnsemble only supports gbtree models")
+        param = learner["learner_model_param"]
+        trees = learner["gradient_booster"]["model"]["trees"]
+        if any(any(tree["split_type"]) for tree in trees):
+            raise ValueError("TreeEnsemble does not support categorical splits")
+
+        depth = max(tree_depth(tree) for tree in trees)
+        n_inner = 2 ** depth - 1
+        feature = np.zeros((len(trees), n_inner), dtype=np.intp)
+        threshold = np.zeros((len(trees), n_inner), dtype=np.float32)
+        default_right = np.zeros((len(trees), n_inner), dtype=bool)
+        leaves = np.zeros((len(trees), n_inner + 1), dtype=np.float32)
+        for t, tree in enumerate(trees):
+            left, right = tree["left_children"], tree["right_children"]
+            # (node, heap position, level)
+            stack = [(0, 0, 0)]
+            while stack:
+                node, pos, level = stack.pop()
+                if level == depth:
+                    leaves[t, pos - n_inner] = tree["split_conditions"][node]
+                elif left[node] == -1:
+                    stack += [(node, 2 * pos + 1, level + 1), (node, 2 * pos + 2, level + 1)]
+                else:
+                    feature[t, pos] = tree["split_indices"][node]
+                    threshold[t, pos] = tree["split_conditions"][node]
+                    default_right[t, pos] = not tree["default_left"][node]
+                    stack += [(left[node], 2 * pos + 1, level + 1), (right[node], 2 * pos + 2, level + 1)]
+        base_score = float(param["base_score"].strip("[]"))
+        return cls(feature, threshold, default_right, leaves, base_score, int(param["num_feature"]))
+
+    def __len__(self):
+        return self.n_trees
+
+    def predict(self, matrix):
+        x = np.asarray(matrix, dtype=np.float32)
+        if x.ndim == 1:
+            x = x.reshape(1, -1)
+        if x.shape[1] != self.num_features:
+            raise ValueError(f"Expected {self.num_features} features, got {x.shape[1]}")
+        margins = np.empty((len(x), self.n_trees + 1), dtype=np.float32)
+        margins[:, 0] = self.base_score
+        margins[:, 1:] = self._leaves_one(x[0]) if len(x) == 1 else self._leaves_many(x)
+        # cumsum adds left to right, the same order XGBoost accumulates trees in
+        return np.cumsum(margins, axis=1, dtype=np.float32)[:, -1]
+
+    def _leaves_one(self, x):
+        # One row: evaluate every split up front, then only follow the results
+        value = x[self._feature]
+        go_right = value >= self._threshold
+        if np.isnan(x).any():
+            go_right |= np.isnan(value) & self._default_right
+        node = self._roots
+        for _ in range(self.depth):
+            node = self._left[node] + go_right[node]
+        return self._leaves[node - self._n_split]
+
+    def _leaves_many(self, x):
+        flat = np.ascontiguousarray(x).ravel()
+        missing = np.isnan(flat).any()
+        # (rows, trees) node indexes; rows offset into the flattened matrix
+        node = np.broadcast_to(self._roots, (len(x), self.n_trees))
+        row_offset = np.arange(len(x), dtype=np.intp)[:, None] * self.num_features
+        for _ in range(self.depth):
+            value = flat[self._feature[node] + row_offset]
+            go_right = value >= self._threshold[node]
+            if missing:
+                go_right |= np.isnan(value) & self._default_right[node]
+            node = self._left[node] + go_right
+        return self._leaves[node - self._n_split]
+
+
+def tree_depth(tree):
+    left, right = tree["left_children"], tree["right_children"]
+    depth = 0
+    stack = [(0, 0)]
+    while stack:
+        node, level = stack.pop()
+        if left[node] == -1:
+            depth = max(depth, level)
+        else:
+            stack += [(left[node], level + 1), (right[node], level + 1)]
+    return depth
+
+
+PREDICTORS = ("sklearn", "inplace", "numpy")
+
+
+def make_predictor(model, kind=RUL_PREDICTOR):
+    """Wrap the pickled XGBRegressor; the result has the same predict(matrix) call."""
+    if kind == "sklearn":
+        return model
+    if kind == "inplace":
+        return InplacePredictor(model.get_booster())
+    if kind == "numpy":
+        return TreeEnsemble.from_booster(model.get_booster())
+    raise ValueError(f"Unknown RUL_PREDICTOR {kind!r}, expected one of {', '.join(PREDICTORS)}")
+
+
+def parity_rows(rows, features_col, seed=0):
+    """Sample rows, jittered copies and copies with missing values."""
+    rng = np.random.default_rng(seed)
+    base = np.array([[row[col] for col in features_col] for row in rows], dtype=np.float64)
+    jittered = base * rng.normal(1.0, 0.05, base.shape)
+    missing = base.copy()
+    missing[rng.random(base.shape) < 0.2] = np.nan
+    return np.vstack([base, jittered, missing])
+
+
+def check(model, matrix):
+    expected = model.predict(matrix)
+    ok = True
+    for kind in PREDICTORS[1:]:
+        got = np.asarray(make_predictor(model, kind).predict(matrix))
+        mismatched = int(np.count_nonzero(got != expected))
+        print(f"{kind:8s} rows {len(matrix)}  mismatched {mismatched}  max abs diff {np.max(np.abs(got - expected)):.3g}")
+        ok = ok and mismatched == 0
+    # Single rows take a different path through TreeEnsemble
+    ensemble = make_predictor(model, "numpy")
+    single = np.concatenate([ensemble.predict(row) for row in matrix])
+    mismatched = int(np.count_nonzero(single != expected))
+    print(f"{'numpy':8s} rows {len(matrix)}  mismatched {mismatched}  (one row per call)")
+    return ok and mismatched == 0
+
+
+def benchmark(model, matrix, repeat=2000):
+    import timeit
+
+    row = matrix[:1]
+    print(f"{'backend':8s} {'1 row':>12s} {f'{len(matrix)} rows':>14s}")
+    for kind in PREDICTORS:
+        predictor = make_predictor(model, kind)
+        single = min(timeit.repeat(lambda: predictor.predict(row), number=repeat, repeat=3)) / repeat
+        batch = min(timeit.repeat(lambda: predictor.predict(matrix), number=20, repeat=3)) / 20
+        print(f"{kind:8s} {single * 1e6:9.1f} us {batch * 1e3:11.2f} ms")
+
+
+if __name__ == "__main__":
+    import sys
+    import joblib
+
+    rul_model = joblib.load("../model/xgboost_model.pkl")
+    features_col = rul_model.get_booster().feature_names
+    with open("../data/filtered_sample_rul.json", "r") as file:
+        data = [row for row in json.load(file) if all(col in row for col in features_col)]
+    if "--check" in sys.argv:
+        sys.exit(0 if check(rul_model, parity_rows(data, features_col)) else 1)
+    elif "--bench" in sys.argv:
+        benchmark(rul_model, parity_rows(data, features_col)[:len(data)])
+    else:
+        print(__doc__)
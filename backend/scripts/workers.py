@@ -0,0 +1,131 @@
+"""
+Multi-process serving: N asgi_app workers on one port.
+
+The parent imports the app once (registry, geofences, ...), waits for the
+model registry's first load and forks the workers, so that read-only data
+is shared copy-on-write; gc.freeze() keeps the garbage collector from
+writing to those pages. The listening socket is inherited and the kernel
+spreads connections across workers.
+
+Live tag positions go into a shared_tags.SharedTagTable: whichever worker
+receives an ingest request (or UDP datagram) classifies the rows and
+writes them there, and every worker streams the changes to its own
+clients. Zone-violation SMS are raised only by that ingesting worker, and
+all workers share the notification queue file, including its cooldowns
+(notifications.AlertStore). Replays, /metrics, /ingest/stats and the
+prediction cache are per worker.
+
+    python workers.py --workers 4 [--host 127.0.0.1] [--port 5000]
+"""
+import gc
+import os
+import time
+import signal
+import socket
+import logging
+
+from shared_tags import SharedTagTable
+from zones import ZONE_COMPANIES
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.environ.get("WORKERS", os.cpu_count() or 1))
+# Threads per worker for model.predict; the workers already use every core
+WORKER_MODEL_THREADS = int(os.environ.get("WORKER_MODEL_THREADS", 1))
+# Seconds the parent waits for the initial model load before forking
+MODEL_LOAD_TIMEOUT = float(os.environ.get("MODEL_LOAD_TIMEOUT", 60))
+SSE_BACKLOG = int(os.environ.get("SSE_BACKLOG", 8192))
+RESTART_DELAY = 1.0
+
+
+def listen(host, port, backlog=SSE_BACKLOG):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(index, config, sock):
+    import uvicorn
+    import asgi_app
+
+    # uvicorn installs its own handlers for a graceful shutdown
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    # Also applied to model versions the registry loads later
+    asgi_app.backend.model_registry.set_threads(WORKER_MODEL_THREADS)
+    logger.info("Worker %d serving (pid %d)", index, os.getpid())
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve(workers=WORKERS, host="127.0.0.1", port=5000):
+    import uvicorn
+    import asgi_app
+    import log_pipeline
+
+    backend = asgi_app.backend
+    asgi_app.tag_table = SharedTagTable.for_registry(backend.registry, backend.geofences, ZONE_COMPANIES)
+    sock = listen(host, port)
+    config = uvicorn.Config(asgi_app.application, access_log=False, lifespan="on")
+    # Load the model before forking so workers share it and restarted workers need not load it again
+    if not backend.model_registry.wait(MODEL_LOAD_TIMEOUT):
+        logger.warning("Starting workers without a RUL model (%s)", backend.model_registry.stats()["model_dir"])
+    logger.info("Starting %d workers on http://%s:%d (%d shared tags)", workers, host, port, len(asgi_app.tag_table))
+    # Everything loaded so far stays shared between the workers
+    gc.freeze()
+
+    children = {}
+    stopping = False
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(index, config, sock)
+            except Exception as e:
+                logger.error("Worker %d failed: %s", index, e)
+                code = 1
+            finally:
+                log_pipeline.stop()
+                os._exit(code)
+        children[pid] = index
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for index in range(workers):
+        spawn(index)
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        if index is not None and not stopping:
+            logger.warning("Worker %d (pid %d) exited with status %d, restarting", index, pid, status)
+            # Don't spin if workers die right after starting
+            time.sleep(RESTART_DELAY)
+            spawn(index)
+    logger.info("All workers stopped")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run asgi_app in several worker processes")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
+    serve(args.workers, args.host, args.port)
@@ -0,0 +1,81 @@
+import numpy as np
+
+# Region boundaries inside the building (see border.py)
+NVIDIA_LNG = -0.9328
+APPLE_LAT = 51.46051109286201
+
+# Zone codes, index into ZONE_COMPANIES
+NVIDIA, APPLE, SAMSUNG = 0, 1, 2
+ZONE_COMPANIES = np.array(["Nvidia", "Apple", "Samsung"], dtype=object)
+UNKNOWN = -1
+
+
+def get_zone_company(lat, lng):
+    if lng < NVIDIA_LNG:
+        return "Nvidia"
+    if lat > APPLE_LAT:
+        return "Apple"
+    return "Samsung"
+
+
+def zone_codes(lat, lng):
+    """Vectorized get_zone_company: arrays of lat/lng to an int8 array of zone codes."""
+    lat = np.asarray(lat, dtype=np.float64)
+    lng = np.asarray(lng, dtype=np.float64)
+    codes = np.full(lat.shape, SAMSUNG, dtype=np.int8)
+    codes[lat > APPLE_LAT] = APPLE
+    # Nvidia wins over Apple, same order as the scalar checks
+    codes[lng < NVIDIA_LNG] = NVIDIA
+    return codes
+
+
+def zone_companies(lat, lng):
+    return ZONE_COMPANIES[zone_codes(lat, lng)]
+
+
+def classify_zones(floors, lat, lng, geofences=None):
+    """
+    Zone company per point, the rule the streams use: the geofence polygons
+    when a geofence.GeofenceIndex is loaded (None outside every zone), else
+    the thresholds above. floors is one label or one per point.
+    """
+    if geofences is not None:
+        return geofences.classify_companies(floors, lat, lng)
+    return zone_companies(lat, lng)
+
+
+def zone_violations(zones, expected_companies):
+    """
+    True where a point's zone (from classify_zones) is known and is not its
+    expected company, like the per-row check in app.rtls_events. Points
+    outside every zone or without an expected company are never violations.
+    """
+    zones = np.asarray(zones, dtype=object)
+    expected = np.asarray(expected_companies, dtype=object)
+    known = np.fromiter((isinstance(zone, str) and isinstance(company, str) for zone, company in zip(zones, expected)),
+                        dtype=bool, count=len(zones))
+    return known & (zones != expected)
+
+
+def company_codes(companies):
+    """
+    Company names to zone codes, UNKNOWN for anything else (None, NaN, other
+    companies). One elementwise comparison per zone, no per-row Python.
+    """
+    companies = np.asarray(companies, dtype=object)
+    codes = np.full(companies.shape, UNKNOWN, dtype=np.int8)
+    for code, company in enumerate(ZONE_COMPANIES):
+        codes[companies == company] = code
+    return codes
+
+
+def violation_mask(lat, lng, expected_companies):
+    """
+    True where a point lies outside the zone of its expected company.
+    Points without a known expected company never count as violations.
+    expected_companies may be names or codes from company_codes().
+    """
+    expected = np.asarray(expected_companies)
+    if expected.dtype.kind not in "iu":
+        expected = company_codes(expected)
+    return (expected != UNKNOWN) & (zone_codes(lat, lng) != expected)
@@ -0,0 +1,66 @@
+"""
+The app's RUL path for one machine row: loading a model version, predict_rul,
+and score_row with the prediction cache missed (model through the batcher)
+and hit. Building the feature row from raw telemetry is in
+bench_feature_engine.py.
+"""
+import os
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+app = pytest.importorskip("app")
+
+from batch_inference import BatchPredictor
+from model_registry import ModelRegistry
+from prediction_cache import PredictionCache
+
+MODEL_FILE = "xgboost_model.pkl"
+
+
+@pytest.fixture(scope="module")
+def model_registry(rul_model, tmp_path_factory):
+    if list(rul_model.get_booster().feature_names) != app.features_col:
+        pytest.skip("xgboost_model.pkl does not use the app's features_col")
+    model_dir = tmp_path_factory.mktemp("models")
+    os.symlink(os.path.abspath(f"../model/{MODEL_FILE}"), model_dir / MODEL_FILE)
+    registry = ModelRegistry(str(model_dir), app.features_col)
+    registry.load_initial()
+    assert registry.active is not None
+    return registry
+
+
+@pytest.fixture
+def scoring(model_registry, monkeypatch):
+    """The app scoring with the sample model and an empty cache."""
+    monkeypatch.setattr(app, "rul_batcher", BatchPredictor(model_registry, app.features_col))
+    monkeypatch.setattr(app, "rul_cache", PredictionCache(app.features_col))
+    return app
+
+
+@pytest.fixture
+def row(rul_rows):
+    return rul_rows[0][0]
+
+
+def test_model_load(benchmark, model_registry):
+    version = benchmark.pedantic(model_registry.load, args=(MODEL_FILE,), rounds=3)
+    assert version.name == MODEL_FILE
+
+
+def test_predict_rul(benchmark, rul_model, row):
+    assert benchmark(app.predict_rul, row, rul_model, app.features_col) is not None
+
+
+def test_score_row_cache_miss(benchmark, scoring, row):
+    def cleared():
+        scoring.rul_cache.clear()
+        return (row,), {}
+
+    assert benchmark.pedantic(scoring.score_row, setup=cleared, rounds=200) is not None
+    assert scoring.rul_cache.stats()["hits"] == 0
+
+
+def test_score_row_cache_hit(benchmark, scoring, row):
+    expected = scoring.score_row(row)
+    assert benchmark(scoring.score_row, row) == expected
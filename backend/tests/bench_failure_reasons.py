@@ -0,0 +1,40 @@
+"""Failure reasons: one row, and a DataFrame row-wise vs reason_codes over whole columns."""
+import numpy as np
+import pytest
+
+from failure_reasons import ERROR_COLUMNS, COMP_COLUMNS, THRESHOLDS, infer_failure_reason, reason_code, \
+    reason_codes, reason_texts
+
+pytest.importorskip("pytest_benchmark")
+pd = pytest.importorskip("pandas")
+
+
+@pytest.fixture(scope="module")
+def frame():
+    # Mostly healthy rows, like the telemetry: a few errors / components, readings near the limits
+    rng = np.random.default_rng(0)
+    rows = 20_000
+    frame = pd.DataFrame({col: (rng.random(rows) < 0.02).astype(np.int64) for col in ERROR_COLUMNS + COMP_COLUMNS})
+    for col, limit, _ in THRESHOLDS:
+        frame[col] = rng.normal(limit * 0.9, limit * 0.06, rows)
+    return frame
+
+
+def test_reason_code_one_row(benchmark, frame):
+    row = frame.iloc[0].to_dict()
+    assert benchmark(reason_code, row) == reason_code(row)
+
+
+def test_infer_failure_reason_row_wise(benchmark, frame):
+    reasons = benchmark.pedantic(frame.apply, args=(infer_failure_reason,), kwargs={"axis": 1}, rounds=3)
+    assert len(reasons) == len(frame)
+
+
+def test_reason_codes(benchmark, frame):
+    codes = benchmark(reason_codes, frame)
+    assert (reason_texts(codes) == frame.apply(infer_failure_reason, axis=1).to_numpy()).all()
+
+
+def test_reason_texts(benchmark, frame):
+    codes = reason_codes(frame)
+    assert len(benchmark(reason_texts, codes)) == len(frame)
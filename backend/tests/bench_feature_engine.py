@@ -0,0 +1,37 @@
+"""FeatureEngine updates from raw telemetry and the feature row the model scores."""
+import itertools
+
+import pytest
+
+from feature_engine import FeatureEngine, SENSORS, synthetic_telemetry
+
+pytest.importorskip("pytest_benchmark")
+
+FEATURES_COL = ["time_in_cycles", *(f"{sensor}{stat}" for sensor in SENSORS
+                                    for stat in ("mean_24h", "sd_24h", "mean_5d", "sd_5d"))]
+
+
+@pytest.fixture
+def engine():
+    engine = FeatureEngine(FEATURES_COL)
+    for reading in synthetic_telemetry(machines=3, days=6):
+        engine.add(*reading)
+    return engine
+
+
+def test_add(benchmark, engine):
+    # One reading a minute after the history, so none of them is late
+    clock = itertools.count(max(window.slot + 1 for window in engine.machines.values()) * engine.slot_seconds, 60)
+    readings = itertools.cycle(synthetic_telemetry(machines=3, days=1, seed=1))
+
+    def add():
+        machine_id, _, *values = next(readings)
+        engine.add(machine_id, float(next(clock)), *values)
+
+    benchmark(add)
+    assert engine.stats()["late"] == 0
+
+
+def test_row(benchmark, engine):
+    row = benchmark(engine.row, 1)
+    assert set(FEATURES_COL) <= set(row)
@@ -0,0 +1,40 @@
+"""Encoding of the RTLS stream: compact frames and SSE events."""
+import pytest
+
+from frames import FrameCoalescer, compact_location
+from serialization import sse_event
+
+pytest.importorskip("pytest_benchmark")
+
+
+def tag(row):
+    return {"name": "Tim", "company": "Apple", "role": "Technician", "floor": row.get("Level"),
+            "zone_violation": None, "location": [row["lat"], row["lng"]]}
+
+
+def test_compact_location(benchmark, rtls_rows):
+    location = [rtls_rows[0]["lat"], rtls_rows[0]["lng"]]
+    benchmark(compact_location, location)
+
+
+def test_frame_1000_tags(benchmark, rtls_rows):
+    coalescer = FrameCoalescer()
+    tags = [tag(row) for row in rtls_rows]
+    moved = [{**payload, "location": [payload["location"][0] + 0.001, payload["location"][1]]} for payload in tags]
+    rounds = iter(range(10 ** 9))
+
+    def frame():
+        # 1000 tags (keyed like MACs) that all move each round, so every flush writes all of them
+        payloads = moved if next(rounds) % 2 else tags
+        for key, payload in enumerate(payloads):
+            coalescer.offer(f"tag-{key}", payload)
+        return coalescer.flush()
+
+    assert benchmark(frame) is not None
+
+
+def test_sse_event(benchmark, rtls_rows):
+    row = rtls_rows[0]
+    payload = {"name": "Tim", "company": "Apple", "location": [row["lat"], row["lng"]],
+               "timestamp": "2024-01-01T00:00:00.000"}
+    benchmark(sse_event, "zone_violation", payload)
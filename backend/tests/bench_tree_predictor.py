@@ -0,0 +1,24 @@
+"""RUL scoring with each tree_predictor backend, one row and a batch."""
+import pytest
+
+from tree_predictor import PREDICTORS, make_predictor, parity_rows
+
+pytest.importorskip("pytest_benchmark")
+
+
+@pytest.fixture(scope="module")
+def matrix(rul_rows):
+    rows, features_col = rul_rows
+    return parity_rows(rows, features_col)[:len(rows)]
+
+
+@pytest.mark.parametrize("kind", PREDICTORS)
+def test_predict_one_row(benchmark, rul_model, matrix, kind):
+    predictor = make_predictor(rul_model, kind)
+    benchmark(predictor.predict, matrix[:1])
+
+
+@pytest.mark.parametrize("kind", PREDICTORS)
+def test_predict_batch(benchmark, rul_model, matrix, kind):
+    predictor = make_predictor(rul_model, kind)
+    assert len(benchmark(predictor.predict, matrix)) == len(matrix)
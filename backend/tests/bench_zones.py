@@ -0,0 +1,28 @@
+"""Zone classification of RTLS rows: scalar thresholds, vectorized thresholds and polygon geofences."""
+import pytest
+
+from zones import get_zone_company, zone_companies
+from geofence import load_geofences
+
+pytest.importorskip("pytest_benchmark")
+
+
+def test_get_zone_company(benchmark, rtls_rows):
+    row = rtls_rows[0]
+    benchmark(get_zone_company, row["lat"], row["lng"])
+
+
+def test_zone_companies_1000_rows(benchmark, rtls_rows):
+    lat = [row["lat"] for row in rtls_rows]
+    lng = [row["lng"] for row in rtls_rows]
+    zones = benchmark(zone_companies, lat, lng)
+    assert len(zones) == len(rtls_rows)
+
+
+def test_geofences_1000_rows(benchmark, rtls_rows):
+    geofences = load_geofences("../data/geofences.json")
+    floors = [row.get("level") or row.get("Level") for row in rtls_rows]
+    lat = [row["lat"] for row in rtls_rows]
+    lng = [row["lng"] for row in rtls_rows]
+    zones = benchmark(geofences.classify_companies, floors, lat, lng)
+    assert len(zones) == len(rtls_rows)
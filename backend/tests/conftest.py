@@ -0,0 +1,45 @@
+"""
+The tests import the modules in backend/scripts and run from that directory,
+like the scripts themselves (they open ../data and ../model relative to it).
+"""
+import os
+import json
+import sys
+import tempfile
+
+import pytest
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
+sys.path.insert(0, SCRIPTS_DIR)
+# Tests that import app need no model; its loader thread would import xgboost while rul_model does
+os.environ["MODEL_DIR"] = tempfile.mkdtemp(prefix="models-")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def scripts_dir():
+    cwd = os.getcwd()
+    os.chdir(SCRIPTS_DIR)
+    yield SCRIPTS_DIR
+    os.chdir(cwd)
+
+
+@pytest.fixture(scope="session")
+def rtls_rows(scripts_dir):
+    with open("../data/rtls.json") as file:
+        return json.load(file)[:1000]
+
+
+@pytest.fixture(scope="session")
+def rul_model(scripts_dir):
+    joblib = pytest.importorskip("joblib")
+    pytest.importorskip("xgboost")
+    return joblib.load("../model/xgboost_model.pkl")
+
+
+@pytest.fixture(scope="session")
+def rul_rows(rul_model):
+    """Sample rows that have every model feature, and the feature order."""
+    features_col = rul_model.get_booster().feature_names
+    with open("../data/filtered_sample_rul.json") as file:
+        rows = [row for row in json.load(file) if all(col in row for col in features_col)]
+    return rows, features_col
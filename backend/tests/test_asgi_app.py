@@ -0,0 +1,59 @@
+"""Blocking handlers of the ASGI app run in the executor, not on the event loop."""
+import json
+import asyncio
+import threading
+
+import pytest
+
+asgi_app = pytest.importorskip("asgi_app")
+
+
+def call(method, path, query=b""):
+    """Run one request through the ASGI application; returns (status, decoded JSON body)."""
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": method, "path": path, "query_string": query, "headers": []}
+    asyncio.run(asgi_app.application(scope, receive, send))
+    return messages[0]["status"], json.loads(messages[1]["body"])
+
+
+@pytest.fixture
+def threads(monkeypatch):
+    """Thread names the patched handlers ran on."""
+    seen = []
+
+    def telemetry_features(machine_id=None):
+        seen.append(threading.current_thread().name)
+        if machine_id == "x":
+            raise ValueError("invalid literal for int() with base 10: 'x'")
+        return {"machines": {}, "stats": {}}
+
+    def reload():
+        seen.append(threading.current_thread().name)
+        return True
+
+    monkeypatch.setattr(asgi_app.backend, "telemetry_features", telemetry_features)
+    monkeypatch.setattr(asgi_app.backend.registry, "reload", reload)
+    return seen
+
+
+def test_telemetry_features_runs_in_the_executor(threads):
+    assert call("GET", "/telemetry/features", b"machineID=1") == (200, {"machines": {}, "stats": {}})
+    assert threads[0].startswith("inference")
+
+
+def test_telemetry_features_error_is_still_a_400(threads):
+    status, body = call("GET", "/telemetry/features", b"machineID=x")
+    assert status == 400 and "invalid literal" in body["error"]
+
+
+def test_registry_reload_runs_in_the_executor(threads):
+    status, body = call("POST", "/registry/reload")
+    assert status == 200 and set(body) == {"employees", "machines"}
+    assert threads[0].startswith("inference")
@@ -0,0 +1,126 @@
+"""Hub fan-out and the per-client slow consumer policies."""
+import asyncio
+import threading
+
+import pytest
+
+from broadcaster import Hub, AsyncHub, Subscription, DROP_OLDEST, COALESCE
+
+
+def update(key, n):
+    return f"event: update\ndata: {{\"mac\": \"{key}\", \"n\": {n}}}\n\n"
+
+
+def drain(sub):
+    messages = []
+    while (message := sub.get(timeout=0)) is not None:
+        messages.append(message)
+    return messages
+
+
+def body(message):
+    # Strip the "id: N" line the hub adds
+    return message.split("\n", 1)[1]
+
+
+def test_drop_oldest_keeps_the_newest_events():
+    hub = Hub("test", None)
+    slow = hub.subscribe(maxsize=3, policy=DROP_OLDEST)
+    for n in range(10):
+        hub.publish(None, update("a", n))
+    assert [body(message) for message in drain(slow)] == [update("a", n) for n in (7, 8, 9)]
+    assert slow.dropped == 7 and hub.dropped_total() == 7
+
+
+def test_coalesce_keeps_the_latest_event_per_key():
+    hub = Hub("test", None)
+    slow = hub.subscribe(maxsize=10, policy=COALESCE)
+    for n in range(5):
+        hub.publish("a", update("a", n))
+    hub.publish("b", update("b", 0))
+    hub.publish("a", update("a", 5))
+    # Unkeyed events (violations, errors) are never coalesced
+    hub.publish(None, "event: zone_violation\ndata: {}\n\n")
+    hub.publish(None, "event: zone_violation\ndata: {}\n\n")
+    assert [body(message) for message in drain(slow)] == [
+        update("b", 0), update("a", 5), "event: zone_violation\ndata: {}\n\n", "event: zone_violation\ndata: {}\n\n"]
+    assert slow.dropped == 5
+
+
+def test_slow_subscriber_does_not_block_publish_or_other_subscribers():
+    hub = Hub("test", None)
+    stuck = hub.subscribe(maxsize=2)
+    received = []
+    fast = hub.subscribe(maxsize=10000)
+
+    def consume():
+        for message in fast:
+            received.append(body(message))
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    publisher = threading.Thread(target=lambda: [hub.publish(None, update("a", n)) for n in range(5000)])
+    publisher.start()
+    # `stuck` never reads: publish must still return
+    publisher.join(timeout=10)
+    assert not publisher.is_alive()
+    hub.finish()
+    consumer.join(timeout=10)
+    assert received == [update("a", n) for n in range(5000)]
+    assert len(drain(stuck)) == 2 and stuck.dropped == 4998
+
+
+def test_producer_runs_once_for_every_subscriber():
+    started = threading.Event()
+    release = threading.Event()
+    runs = []
+
+    def producer(hub):
+        runs.append(1)
+        started.set()
+        release.wait(10)
+        for n in range(3):
+            hub.publish(None, update("a", n))
+        hub.finish()
+
+    hub = Hub("test", producer, linger=0)
+    subs = [hub.subscribe() for _ in range(3)]
+    assert started.wait(10)
+    release.set()
+    for sub in subs:
+        assert [body(message) for message in sub] == [update("a", n) for n in range(3)]
+    assert runs == [1]
+
+
+def test_async_subscriber_is_woken_by_publish():
+    async def run():
+        hub = AsyncHub("test", None)
+        sub = hub.subscribe(maxsize=2, policy=COALESCE)
+        waiting = asyncio.ensure_future(sub.aget(timeout=5))
+        await asyncio.sleep(0)
+        hub.publish("a", update("a", 0))
+        first = await waiting
+        for n in range(1, 4):
+            hub.publish("a", update("a", n))
+        return first, await sub.aget(timeout=0), await sub.aget(timeout=0)
+
+    first, latest, empty = asyncio.run(run())
+    assert body(first) == update("a", 0) and body(latest) == update("a", 3) and empty is None
+
+
+def test_closed_subscription_leaves_the_hub():
+    hub = Hub("test", None, linger=0)
+    sub = hub.subscribe(maxsize=1)
+    hub.publish(None, update("a", 0))
+    hub.publish(None, update("a", 1))
+    sub.close()
+    assert hub.subscriber_count() == 0 and not hub.active
+    # Its drops still count for the stream
+    assert hub.dropped_total() == 1
+    hub.publish(None, update("a", 2))
+    assert sub.get(timeout=0) is None
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError, match="newest_only"):
+        Subscription(Hub("test", None), 10, "newest_only")
@@ -0,0 +1,93 @@
+"""Columnar cache round trip, null handling and cache keys."""
+import os
+import json
+
+import numpy as np
+import pytest
+
+from columnar_cache import build_cache, cache_path, open_table, open_records
+from record_reader import RecordReader
+
+ROWS = [
+    {"ClientMacAddr": "aa:00", "machineID": 49, "lat": 51.46, "level": 1, "active": True},
+    {"ClientMacAddr": "aa:01", "lat": 51.47, "level": 2.5, "active": False},
+    {"ClientMacAddr": None, "machineID": 3_000_000_000, "lat": None, "level": 3, "active": None},
+    {"machineID": -7, "lat": 51.48, "level": 4, "active": True, "note": "only here"},
+]
+
+
+def write(path, rows):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(rows))
+    return str(path)
+
+
+def test_round_trip(tmp_path):
+    source = write(tmp_path / "rtls.json", ROWS)
+    cache_dir = str(tmp_path / "cache")
+    assert build_cache(source, cache_dir) == len(ROWS)
+    table = open_table(source, cache_dir)
+    # Missing and null values are both left out of the record
+    expected = [{k: v for k, v in row.items() if v is not None} for row in ROWS]
+    assert list(table.records()) == expected
+    assert [offset for _, offset in table] == [1, 2, 3, 4]
+    records = list(table.records())
+    assert [type(r["machineID"]) for r in records if "machineID" in r] == [int, int, int]
+    assert [type(r["active"]) for r in records if "active" in r] == [bool, bool, bool]
+
+
+def test_nullable_int_columns_stay_int(tmp_path):
+    source = write(tmp_path / "rtls.json", ROWS)
+    cache_dir = str(tmp_path / "cache")
+    build_cache(source, cache_dir)
+    table = open_table(source, cache_dir)
+    assert table.column("machineID").dtype == np.int64
+    assert table.mask("machineID").tolist() == [False, True, False, False]
+    assert table.column("active").dtype == np.bool_
+    assert table.mask("lat") is None and np.isnan(table.column("lat")[2])
+    assert table.strings("ClientMacAddr").tolist() == ["aa:00", "aa:01", None, None]
+
+
+def test_frame_keeps_nullable_ints(tmp_path):
+    pytest.importorskip("pandas")
+    source = write(tmp_path / "rtls.json", ROWS)
+    cache_dir = str(tmp_path / "cache")
+    build_cache(source, cache_dir)
+    frame = open_table(source, cache_dir).to_frame()
+    assert str(frame["machineID"].dtype) == "Int64"
+    assert frame["machineID"].tolist()[0] == 49 and frame["machineID"].isna().tolist() == [False, True, False, False]
+    assert str(frame["active"].dtype) == "boolean"
+
+
+def test_same_file_name_in_different_directories(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    first = write(tmp_path / "a" / "rtls.json", ROWS[:1])
+    second = write(tmp_path / "b" / "rtls.json", ROWS[:2])
+    assert cache_path(first, cache_dir) != cache_path(second, cache_dir)
+    build_cache(first, cache_dir)
+    assert open_table(second, cache_dir) is None
+    build_cache(second, cache_dir)
+    assert len(open_table(first, cache_dir)) == 1 and len(open_table(second, cache_dir)) == 2
+
+
+def test_cache_for_another_source_is_not_used(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    source = write(tmp_path / "rtls.json", ROWS)
+    build_cache(source, cache_dir)
+    manifest_path = os.path.join(cache_path(source, cache_dir), "manifest.json")
+    with open(manifest_path) as file:
+        manifest = json.load(file)
+    manifest["source"] = str(tmp_path / "elsewhere" / "rtls.json")
+    with open(manifest_path, "w") as file:
+        json.dump(manifest, file)
+    assert open_table(source, cache_dir) is None
+    with open_records(source, cache_dir) as records:
+        assert isinstance(records, RecordReader)
+
+
+def test_stale_cache_is_ignored(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    source = write(tmp_path / "rtls.json", ROWS)
+    build_cache(source, cache_dir)
+    write(tmp_path / "rtls.json", ROWS[:2])
+    assert open_table(source, cache_dir) is None
@@ -0,0 +1,111 @@
+"""failure_reasons gives the same text as the row-wise function it replaced, for every rule combination."""
+import itertools
+
+import numpy as np
+import pytest
+
+import failure_reasons
+from failure_reasons import ERROR_COLUMNS, COMP_COLUMNS, THRESHOLDS, reason_code, reason_codes, reason_text, \
+    reason_texts
+
+pd = pytest.importorskip("pandas")
+
+COLUMNS = ERROR_COLUMNS + COMP_COLUMNS + tuple(col for col, _, _ in THRESHOLDS)
+LIMITS = {**{col: 0 for col in ERROR_COLUMNS + COMP_COLUMNS}, **{col: limit for col, limit, _ in THRESHOLDS}}
+
+
+# As app.py and model_training_machine_prediction.py had it before failure_reasons.py
+def original_infer_failure_reason(row):
+    errors = ['error1', 'error2', 'error3', 'error4', 'error5']
+    active_errors = [err for err in errors if err in row and row[err] > 0]
+    if active_errors:
+        return f"Error codes: {', '.join(active_errors)}"
+
+    comps = ['comp1', 'comp2', 'comp3', 'comp4']
+    active_comps = [comp for comp in comps if comp in row and row[comp] > 0]
+    if active_comps:
+        return f"Maintenance on: {', '.join([c.replace('comp', 'component ') for c in active_comps])}"
+
+    if 'vibrationmean_24h' in row and row['vibrationmean_24h'] > 45:
+        return "High vibration"
+    if 'voltmean_24h' in row and row['voltmean_24h'] > 180:
+        return "High voltage"
+    if 'pressuremean_24h' in row and row['pressuremean_24h'] > 110:
+        return "High pressure"
+    if 'rotatemean_24h' in row and row['rotatemean_24h'] > 500:
+        return "High rotation speed"
+    return "Unknown or general wear"
+
+
+def every_combination():
+    """One row per combination of rule columns above / below their limit."""
+    rows = []
+    for above in itertools.product((False, True), repeat=len(COLUMNS)):
+        rows.append({col: LIMITS[col] + (1.5 if hit else -0.5) for col, hit in zip(COLUMNS, above)})
+    return pd.DataFrame(rows)
+
+
+def random_rows(n=5000, seed=0):
+    """Each column above, at or below its limit, NaN or missing, independently per row."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for _ in range(n):
+        row = {}
+        for col in COLUMNS:
+            state = rng.integers(5)
+            if state < 4:
+                row[col] = [LIMITS[col] + 1, LIMITS[col], LIMITS[col] - 1, np.nan][state]
+        rows.append(row)
+    return rows
+
+
+def check_frame(frame):
+    expected = frame.apply(original_infer_failure_reason, axis=1).to_numpy()
+    codes = reason_codes(frame, n=len(frame))
+    assert codes.dtype == np.int16
+    assert (reason_texts(codes) == expected).all()
+    # Dicts of arrays give the same codes as the DataFrame
+    assert np.array_equal(reason_codes({col: frame[col].to_numpy() for col in frame}, n=len(frame)), codes)
+    return codes, expected
+
+
+def test_every_combination_matches():
+    codes, expected = check_frame(every_combination())
+    # 31 error masks, 15 component masks, 4 thresholds and general wear
+    assert len(np.unique(codes)) == 51 and len(set(expected)) == 51
+
+
+@pytest.mark.parametrize("col", COLUMNS)
+def test_nan_and_missing_columns_match(col):
+    frame = every_combination()
+    frame[col] = np.nan
+    check_frame(frame)
+    check_frame(frame.drop(columns=[col]))
+
+
+def test_no_rule_columns():
+    frame = pd.DataFrame({"machineID": [1, 2, 3]})
+    codes, expected = check_frame(frame)
+    assert codes.tolist() == [failure_reasons.GENERAL_WEAR] * 3
+
+
+def test_one_row_matches():
+    frame = every_combination()
+    for row in frame.to_dict("records") + random_rows():
+        expected = original_infer_failure_reason(row)
+        assert reason_text(reason_code(row)) == expected
+        assert failure_reasons.infer_failure_reason(row) == expected
+    # pandas rows, as DataFrame.apply passes them
+    for _, row in frame.sample(200, random_state=0).iterrows():
+        assert failure_reasons.infer_failure_reason(row) == original_infer_failure_reason(row)
+
+
+def test_mixed_rows_as_a_frame():
+    # Rows that lack a column become NaN in the frame, which the original function treats the same way
+    frame = pd.DataFrame(random_rows(), columns=list(COLUMNS))
+    check_frame(frame)
+    # Integer columns, as the training CSV loads error and component counts
+    frame = every_combination()
+    for col in ERROR_COLUMNS + COMP_COLUMNS:
+        frame[col] = (frame[col] > 0).astype(np.int64)
+    check_frame(frame)
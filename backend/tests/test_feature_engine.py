@@ -0,0 +1,78 @@
+"""Rolling telemetry features: pandas parity, and rows rejected whole."""
+import math
+
+import pytest
+
+from feature_engine import FeatureEngine, synthetic_telemetry, SENSORS, CYCLE_SECONDS, WINDOW_SECONDS, DAILY_MEANS
+
+READING = {"machineID": 1, "timestamp": 1420070400000, "volt": 170.0, "rotate": 446.0, "pressure": 100.0, "vibration": 40.0}
+
+
+def test_features_match_pandas_rolling_windows():
+    pd = pytest.importorskip("pandas")
+    # Slots of 60 s line up with the per-minute readings, so the result must match exactly
+    slot_seconds = 60
+    rows = synthetic_telemetry()
+    frame = pd.DataFrame(rows, columns=["machineID", "t", *SENSORS])
+    frame["cycle"] = (frame["t"] // CYCLE_SECONDS).astype(int)
+    engine = FeatureEngine(["time_in_cycles"], slot_seconds)
+    worst = 0.0
+    checked = 0
+    last_cycle = None
+    for row in rows:
+        cycle = int(row[1] // CYCLE_SECONDS)
+        if last_cycle is not None and cycle > last_cycle:
+            for machine_id, window in engine.machines.items():
+                # The engine's window ends with its newest slot
+                end = (window.slot + 1) * slot_seconds
+                readings = frame[(frame["machineID"] == machine_id) & (frame["t"] < end)]
+                last_24h = readings[readings["t"] >= end - WINDOW_SECONDS][list(SENSORS)]
+                daily = readings[readings["cycle"] < window.cycle].groupby("cycle")[list(SENSORS)].mean()
+                daily = pd.concat([daily.tail(DAILY_MEANS - 1), last_24h.mean().to_frame().T])
+                features = window.features()
+                for sensor in SENSORS:
+                    expected = {
+                        f"{sensor}mean_24h": last_24h[sensor].mean(),
+                        f"{sensor}sd_24h": last_24h[sensor].std(),
+                        f"{sensor}mean_5d": daily[sensor].mean(),
+                        f"{sensor}sd_5d": daily[sensor].std(),
+                    }
+                    for col, value in expected.items():
+                        worst = max(worst, abs(features[col] - value) / abs(value))
+                checked += 1
+        last_cycle = cycle
+        engine.add(*row)
+    assert checked > 20 and worst < 1e-9
+
+
+@pytest.mark.parametrize("change", [
+    {"volt": math.nan}, {"rotate": math.inf}, {"pressure": -math.inf}, {"vibration": True}, {"volt": "170"},
+    {"volt": None}, {"comp1": math.nan}, {"age": "18"}, {"timestamp": math.nan, "datetime": None},
+    {"timestamp": math.inf}, {"machineID": math.nan},
+])
+def test_non_finite_values_are_rejected(change):
+    engine = FeatureEngine(["voltmean_24h"])
+    assert engine.add_rows([{**READING, **change}]) == {"accepted": 0, "invalid": 1}
+    assert engine.machines == {} and engine.stats()["readings"] == 0
+
+
+def test_invalid_row_is_not_half_applied():
+    engine = FeatureEngine(["voltmean_24h", "comp1"])
+    assert engine.add_rows([READING]) == {"accepted": 1, "invalid": 0}
+    # Valid reading and state, unknown error: nothing of the row is stored
+    bad = {**READING, "timestamp": READING["timestamp"] + 60000, "volt": 500.0, "comp1": 3.0, "errorID": "error9"}
+    assert engine.add_rows([bad]) == {"accepted": 0, "invalid": 1}
+    assert engine.stats()["readings"] == 1 and engine.stats()["invalid"] == 1
+    assert engine.row(1) == {"machineID": 1, "voltmean_24h": 170.0, "comp1": 0}
+    # A new machine is not created by a rejected row either
+    assert engine.add_rows([{**READING, "machineID": 2, "errorID": 0.5}])["invalid"] == 1
+    assert 2 not in engine.machines
+
+
+def test_one_row_carries_reading_error_and_state():
+    engine = FeatureEngine(["voltmean_24h", "error2", "comp1"])
+    rows = [{**READING, "errorID": "error2", "comp1": 3.0}, {"machineID": 1, "timestamp": READING["timestamp"], "errorID": 2}]
+    assert engine.add_rows(rows) == {"accepted": 2, "invalid": 0}
+    assert engine.row(1) == {"machineID": 1, "voltmean_24h": 170.0, "error2": 2, "comp1": 3.0}
+    # Errors and state need earlier telemetry from the machine
+    assert engine.add_rows([{"machineID": 3, "comp1": 1.0}, {"machineID": 3, "timestamp": 0, "errorID": 1}])["invalid"] == 2
@@ -0,0 +1,147 @@
+"""Compact delta frames, resync of a client that fell behind, and restarting a compact hub."""
+import json
+import asyncio
+import threading
+
+from broadcaster import Hub, AsyncHub
+from frames import FrameCoalescer
+
+# Frames are flushed by hand (hub.snapshot()), the flusher thread never fires
+FRAME_RATE = 0.001
+
+
+def tag(lat, lng=-0.93, **fields):
+    return {"name": "Tim", "company": "Apple", "role": "mechanic", "floor": "Ground Floor",
+            "zone_violation": None, "location": [lat, lng], **fields}
+
+
+def parse(message):
+    """'event: frame\\ndata: {...}' -> ('frame', tags)."""
+    lines = dict(line.split(": ", 1) for line in message.strip().split("\n"))
+    return lines["event"], json.loads(lines["data"])["tags"]
+
+
+def drain(sub):
+    messages = []
+    while (message := sub.get(timeout=0)) is not None:
+        messages.append(parse(message))
+    return messages
+
+
+def test_frames_carry_only_what_changed():
+    frames = FrameCoalescer(min_move=0.5)
+    frames.offer("aa:00", tag(51.46))
+    frames.offer("aa:01", tag(51.47, name="Ann"))
+    assert parse(frames.flush())[1] == {"aa:00": {**tag(51.46), "location": [51.46, -0.93]},
+                                        "aa:01": {**tag(51.47, name="Ann"), "location": [51.47, -0.93]}}
+    # Latest payload per tag wins, and only changed fields are sent
+    frames.offer("aa:00", tag(51.4610))
+    frames.offer("aa:00", tag(51.4620, zone_violation="Nvidia"))
+    assert parse(frames.flush())[1] == {"aa:00": {"location": [51.462, -0.93], "zone_violation": "Nvidia"}}
+    # 0.1 m of jitter is not a move; nothing changed means no frame at all
+    frames.offer("aa:00", tag(51.462001, zone_violation="Nvidia"))
+    frames.offer("aa:01", tag(51.47, name="Ann"))
+    assert frames.flush() is None
+    assert frames.stats() == {"tags": 2, "offered": 6, "sent": 3, "suppressed": 2}
+    assert frames.state()["aa:00"]["location"] == [51.462, -0.93]
+    assert parse(frames.snapshot())[1]["aa:01"]["name"] == "Ann"
+
+
+def test_compact_subscriber_gets_a_snapshot_then_deltas():
+    hub = Hub("test", None, frames=FrameCoalescer(), frame_rate=FRAME_RATE)
+    hub.frames.offer("aa:00", tag(51.46))
+    hub.snapshot()
+    sub = hub.subscribe(compact=True)
+    hub.frames.offer("aa:00", tag(51.47))
+    hub.frames.offer("aa:01", tag(51.46))
+    hub.snapshot()
+    # Full events reach compact clients only when published with compact=True
+    hub.publish("aa:00", "event: update\ndata: {}\n\n")
+    hub.publish(None, 'event: error\ndata: {"tags": {}}\n\n', compact=True)
+    assert drain(sub) == [
+        ("snapshot", {"aa:00": {**tag(51.46), "location": [51.46, -0.93]}}),
+        ("frame", {"aa:00": {"location": [51.47, -0.93]}, "aa:01": {**tag(51.46), "location": [51.46, -0.93]}}),
+        ("error", {}),
+    ]
+
+
+def test_client_that_falls_behind_is_resynced_with_a_snapshot():
+    hub = Hub("test", None, frames=FrameCoalescer(), frame_rate=FRAME_RATE)
+    sub = hub.subscribe(maxsize=2, compact=True)
+    for n in range(5):
+        hub.frames.offer(f"aa:{n:02x}", tag(51.46 + n / 1000))
+        hub.snapshot()
+    # The backlog of deltas was replaced by one snapshot holding every tag
+    messages = drain(sub)
+    assert [event for event, _ in messages] == ["snapshot", "frame"]
+    assert sorted(messages[0][1]) == ["aa:00", "aa:01", "aa:02", "aa:03"]
+    assert list(messages[1][1]) == ["aa:04"]
+    # Two overflows of 3 pending messages each
+    assert sub.dropped == 6
+    # Deltas resume after the snapshot
+    hub.frames.offer("aa:00", tag(51.5))
+    hub.snapshot()
+    assert drain(sub) == [("frame", {"aa:00": {"location": [51.5, -0.93]}})]
+
+
+class Runs:
+    """Producer that offers one tag per run and waits until told to stop."""
+
+    def __init__(self):
+        self.started = []
+        self.stop = []
+        self._changed = threading.Condition()
+
+    def __call__(self, hub):
+        stop = threading.Event()
+        with self._changed:
+            run = len(self.started)
+            hub.frames.offer(f"run{run}", tag(51.46 + run / 100))
+            self.started.append(run)
+            self.stop.append(stop)
+            self._changed.notify_all()
+        stop.wait(5)
+
+    def wait_for(self, count):
+        with self._changed:
+            assert self._changed.wait_for(lambda: len(self.started) >= count, timeout=5)
+
+
+def test_compact_only_hub_restarts_its_producer_with_fresh_frames():
+    runs = Runs()
+    hub = Hub("test", runs, frames=FrameCoalescer(), frame_rate=FRAME_RATE, linger=0)
+    sub = hub.subscribe(compact=True)
+    runs.wait_for(1)
+    assert list(hub.snapshot()[0]) == ["run0"]
+    # The producer exits while the compact client is still connected
+    runs.stop[0].set()
+    runs.wait_for(2)
+    assert list(hub.snapshot()[0]) == ["run1"]
+    assert [(event, list(tags)) for event, tags in drain(sub)] == [
+        ("snapshot", []), ("frame", ["run0"]), ("snapshot", []), ("frame", ["run1"]),
+    ]
+    sub.close()
+    runs.stop[1].set()
+
+
+def test_async_compact_only_hub_restarts_its_producer():
+    async def main():
+        runs = []
+
+        async def producer(hub):
+            runs.append(len(runs))
+            hub.frames.offer(f"run{len(runs) - 1}", tag(51.46))
+            if len(runs) == 1:
+                return
+            await asyncio.sleep(5)
+
+        hub = AsyncHub("test", producer, frames=FrameCoalescer(), frame_rate=FRAME_RATE)
+        sub = hub.subscribe(compact=True)
+        for _ in range(10):
+            await asyncio.sleep(0)
+        assert runs == [0, 1]
+        assert list(hub.snapshot()[0]) == ["run1"]
+        sub.close()
+        hub._task.cancel()
+
+    asyncio.run(main())
@@ -0,0 +1,74 @@
+"""Point-in-polygon and the per-floor grid index against a naive loop over every zone."""
+import json
+
+import numpy as np
+import pytest
+
+from geofence import Zone, GeofenceIndex, NO_ZONE, load_geofences, _random_zones
+
+# An L: the square (0,0)-(2,2) without its top-right quarter
+L_SHAPE = [[0, 0], [2, 0], [2, 1], [1, 1], [1, 2], [0, 2]]
+
+
+def naive(zones, floor, xs, ys):
+    floor = str(floor).strip().lower()
+    result = []
+    for x, y in zip(xs, ys):
+        hits = [i for i, z in enumerate(zones) if z.floor in (floor, "*") and z.contains(x, y)]
+        result.append(hits[0] if hits else NO_ZONE)
+    return result
+
+
+def test_concave_polygon():
+    zone = Zone("L", "Apple", "*", L_SHAPE)
+    assert zone.contains(0.5, 1.5) and zone.contains(1.5, 0.5)
+    assert not zone.contains(1.5, 1.5) and not zone.contains(3, 0.5)
+    xs, ys = np.array([0.5, 1.5, 1.5, -1.0]), np.array([1.5, 0.5, 1.5, 0.5])
+    assert zone.contains_many(xs, ys).tolist() == [True, True, False, False]
+
+
+def test_first_listed_zone_wins_where_zones_overlap():
+    index = GeofenceIndex([Zone("a", "Apple", "*", L_SHAPE), Zone("b", "Nvidia", "*", [[0, 0], [3, 0], [3, 3], [0, 3]])])
+    assert index.locate_company("Ground Floor", 0.5, 0.5) == "Apple"
+    assert index.locate_company("Ground Floor", 1.5, 1.5) == "Nvidia"
+    assert index.locate_company("Ground Floor", 5, 5) is None
+    # locate/classify take (lat, lng): y first
+    assert list(index.classify_companies("Ground Floor", [0.5, 1.5, 5], [0.5, 1.5, 5])) == ["Apple", "Nvidia", None]
+
+
+def test_zones_per_floor_and_wildcard():
+    square = [[0, 0], [1, 0], [1, 1], [0, 1]]
+    index = GeofenceIndex([Zone("g", "Apple", "Ground Floor", square), Zone("all", "Nvidia", "*", [[0, 0], [4, 0], [4, 4], [0, 4]])])
+    # Floor names are compared trimmed and case-insensitively
+    assert index.locate_company(" ground floor", 0.5, 0.5) == "Apple"
+    assert index.locate_company("1st Floor", 0.5, 0.5) == "Nvidia"
+    assert index.locate_company(None, 0.5, 0.5) == "Nvidia"
+    floors = ["Ground Floor", "1st Floor", "Ground Floor", "2nd Floor"]
+    assert list(index.classify_companies(floors, [0.5, 0.5, 3, 9], [0.5, 0.5, 3, 9])) == ["Apple", "Nvidia", "Nvidia", None]
+
+
+@pytest.mark.parametrize("zone_count", [3, 300])
+def test_grid_index_matches_naive_loop(zone_count):
+    # 3 zones takes the zone-major path of locate_many, 300 the cell-major one
+    rng = np.random.default_rng(zone_count)
+    floors = ["ground floor", "1st floor", "*"]
+    zones = _random_zones(zone_count, floors, rng)
+    index = GeofenceIndex(zones, grid_size=8)
+    xs = rng.uniform(-0.941, -0.929, 5000)
+    ys = rng.uniform(51.454, 51.466, 5000)
+    for floor in ("Ground Floor", "1st Floor", "Basement"):
+        expected = naive(zones, floor, xs, ys)
+        assert index.classify(floor, ys, xs).tolist() == expected
+        assert [index.locate(floor, y, x) for x, y in zip(xs[:500], ys[:500])] == expected[:500]
+        assert sum(zone != NO_ZONE for zone in expected) > 0
+
+
+def test_load_geofences(tmp_path):
+    assert load_geofences(str(tmp_path / "missing.json")) is None
+    path = tmp_path / "zones.json"
+    path.write_text(json.dumps({"zones": [{"company": "Apple", "polygon": L_SHAPE}]}))
+    index = load_geofences(str(path))
+    assert index.zones[0].name == "Apple" and index.locate_company("any", 0.5, 0.5) == "Apple"
+    path.write_text(json.dumps({"zones": [{"company": "Apple", "polygon": [[0, 0], [1, 1]]}]}))
+    with pytest.raises(ValueError, match="at least 3"):
+        load_geofences(str(path))
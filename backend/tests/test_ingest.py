@@ -0,0 +1,80 @@
+"""Live ingestion ring buffer: partial accepts, the 429 path and per-row failure isolation."""
+import json
+
+import pytest
+
+from ingest import RingBuffer, parse_ndjson, process_rows
+
+
+def ndjson(rows):
+    return "\n".join(json.dumps(row) for row in rows).encode()
+
+
+def rows(count, start=0):
+    return [{"ClientMacAddr": f"aa:{i:02x}", "lat": 51.46, "lng": -0.93} for i in range(start, start + count)]
+
+
+def test_full_buffer_accepts_the_head_and_rejects_the_tail():
+    buffer = RingBuffer(capacity=5, name="test")
+    assert buffer.offer_many(rows(3)) == 3
+    assert buffer.offer_many(rows(4, start=3)) == 2
+    assert buffer.offer_many(rows(1, start=7)) == 0
+    assert [row["ClientMacAddr"] for row in buffer.drain()] == [f"aa:{i:02x}" for i in range(5)]
+    stats = buffer.stats()
+    assert (stats["accepted"], stats["rejected"], stats["consumed"], stats["depth"], stats["high_watermark"]) == (5, 3, 5, 0, 5)
+    # Draining frees the space again
+    assert buffer.offer_many(rows(2)) == 2
+
+
+def test_offer_ndjson_counts_invalid_rows():
+    buffer = RingBuffer(capacity=2, name="test")
+    body = ndjson(rows(3)) + b'\n\nnot json\n{"lat": "51.46", "lng": -0.93}\n{"lat": NaN, "lng": -0.93}\n[1]\n'
+    assert buffer.offer_ndjson(body) == {"accepted": 2, "rejected": 1, "invalid": 4}
+    assert buffer.stats()["invalid"] == 4
+
+
+def test_parse_ndjson_requires_finite_numbers():
+    parsed, invalid = parse_ndjson('{"lat": 1, "lng": 2}\n{"lat": true, "lng": 2}\n{"lat": Infinity, "lng": 2}\n{"lng": 2}',
+                                   numeric=("lat", "lng"))
+    assert parsed == [{"lat": 1, "lng": 2}] and invalid == 3
+
+
+def test_take_waits_for_rows():
+    buffer = RingBuffer(capacity=2, name="test")
+    assert buffer.take(timeout=0.01) == []
+    buffer.offer_many(rows(1))
+    assert len(buffer.take(timeout=0.01)) == 1
+
+
+def test_failing_row_is_dropped_without_its_batch():
+    buffer = RingBuffer(name="test")
+
+    def process(batch):
+        if any(row["ClientMacAddr"] == "aa:01" for row in batch):
+            raise ValueError("bad row")
+        return [(row["ClientMacAddr"], "message") for row in batch]
+
+    events = process_rows(process, rows(3), buffer)
+    assert [key for key, _ in events] == ["aa:00", "aa:02"]
+    assert buffer.failed == 1
+
+
+@pytest.fixture
+def app(monkeypatch):
+    app = pytest.importorskip("app")
+    monkeypatch.setattr(app, "live_buffer", RingBuffer(capacity=3, name="test"))
+    monkeypatch.setattr(app, "ensure_live_ingest", lambda: None)
+    return app
+
+
+def test_http_ingest_returns_429_with_the_rejected_count(app):
+    client = app.app.test_client()
+    response = client.post("/ingest/rtls", data=ndjson(rows(2)))
+    assert response.status_code == 202 and response.get_json() == {"accepted": 2, "rejected": 0, "invalid": 0}
+    response = client.post("/ingest/rtls", data=ndjson(rows(3, start=2)))
+    assert response.status_code == 429 and response.headers["Retry-After"] == "1"
+    assert response.get_json() == {"accepted": 1, "rejected": 2, "invalid": 0}
+    app.live_buffer.drain()
+    # The client resends the rejected tail
+    response = client.post("/ingest/rtls", data=ndjson(rows(3, start=2)[1:]))
+    assert response.status_code == 202 and response.get_json()["accepted"] == 2
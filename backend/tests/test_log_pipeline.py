@@ -0,0 +1,131 @@
+"""Sampling, rate limiting and warning summaries of the logging pipeline."""
+import time
+import logging
+import threading
+
+import pytest
+
+import log_pipeline
+from log_pipeline import SampleFilter, RateLimitFilter, WarningAggregator, flush_warnings
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(log_pipeline.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def records():
+    """Messages logged to a private logger."""
+    logger = logging.getLogger("test.log_pipeline")
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    messages = []
+
+    class ListHandler(logging.Handler):
+        def emit(self, record):
+            messages.append(record.getMessage())
+
+    handler = ListHandler()
+    logger.addHandler(handler)
+    yield logger, messages
+    logger.removeHandler(handler)
+
+
+def record(msg="event"):
+    return logging.LogRecord("test", logging.DEBUG, __file__, 1, msg, (), None)
+
+
+@pytest.mark.parametrize("rate, kept", [(0.01, 100), (0.1, 1000), (1, 10000), (0, 0)])
+def test_sample_filter_keeps_one_in_every(rate, kept):
+    sample = SampleFilter(rate)
+    assert sum(sample.filter(record()) for _ in range(10000)) == kept
+    assert sample.seen == 10000 and sample.skipped == 10000 - kept
+
+
+def test_sample_filter_counts_exactly_across_threads():
+    sample = SampleFilter(0.1)
+    kept = []
+
+    def log():
+        kept.append(sum(sample.filter(record()) for _ in range(20000)))
+
+    threads = [threading.Thread(target=log) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sample.seen == 160000 and sum(kept) == 16000 and sample.skipped == 144000
+
+
+def test_rate_limit_filter_notes_the_suppressed_count(clock):
+    limit = RateLimitFilter(rate=2)
+    passed = [limit.filter(record(f"event {n}")) for n in range(5)]
+    assert passed == [True, True, False, False, False] and limit.suppressed == 3
+    clock.now += 0.5
+    first_after = record("event 5")
+    assert limit.filter(first_after) and first_after.msg == "event 5 (3 similar messages suppressed)"
+    assert not limit.filter(record())
+    clock.now += 10
+    # The bucket refills up to the burst only
+    assert sum(limit.filter(record()) for _ in range(5)) == 2
+
+
+def test_repeated_warnings_are_summarized_once_per_interval(clock, records):
+    logger, messages = records
+    aggregator = WarningAggregator(logger, interval=60, top=2)
+    for mac in ["aa:00", "aa:01", "aa:00", "aa:02", "aa:00", "aa:01"]:
+        aggregator.warning(mac, "No employee info found for mac_address %s", mac)
+    assert messages == [f"No employee info found for mac_address {mac} (repeats are summarized every 60s)"
+                        for mac in ("aa:00", "aa:01", "aa:02")]
+    aggregator.flush_if_due()
+    assert len(messages) == 3
+    clock.now += 60
+    aggregator.flush_if_due()
+    assert messages[3] == "3 repeated warnings for 2 keys in the last 60s, top: aa:00 x2, aa:01 x1"
+    # Nothing repeated since: no summary
+    clock.now += 60
+    aggregator.flush_if_due()
+    assert len(messages) == 4
+
+
+def test_summary_is_written_without_further_warnings(records):
+    logger, messages = records
+    aggregator = WarningAggregator(logger, interval=0.05)
+    for _ in range(3):
+        aggregator.warning("aa:00", "unknown %s", "aa:00")
+    deadline = time.monotonic() + 5
+    while len(messages) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert messages[1].startswith("2 repeated warnings for 1 keys")
+
+
+def test_pending_summaries_are_flushed_at_shutdown(records):
+    logger, messages = records
+    aggregator = WarningAggregator(logger, interval=3600)
+    for _ in range(4):
+        aggregator.warning(("machine", 7), "No machine found for machine_id %s", 7)
+    flush_warnings()
+    assert messages[-1].startswith("3 repeated warnings for 1 keys") and "('machine', 7) x3" in messages[-1]
+
+
+def test_forgotten_keys_are_counted_as_other_keys(clock, records):
+    logger, messages = records
+    aggregator = WarningAggregator(logger, interval=60, max_keys=2)
+    for key in ["a", "b", "a", "b", "c", "c", "a"]:
+        aggregator.warning(key, "unknown %s", key)
+    # "a" was forgotten when "c" arrived, so it is logged again
+    assert messages == [f"unknown {key} (repeats are summarized every 60s)" for key in ("a", "b", "c", "a")]
+    clock.now += 60
+    aggregator.flush_if_due()
+    assert messages[-1] == "3 repeated warnings for 2 keys in the last 60s, top: a x1, b x1 (+1 for other keys)"
@@ -0,0 +1,104 @@
+"""Text exposition format of /metrics."""
+import re
+
+import pytest
+
+import metrics
+from metrics import Counter, Histogram, Gauge, render
+
+# name{label="value",...} number, as in the 0.0.4 text format
+SAMPLE = re.compile(r'[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_][a-zA-Z0-9_]*="([^"\\]|\\.)*",?)*\})? (\+Inf|-Inf|NaN|-?[0-9.e+-]+)')
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    # Only the metrics created by the test are rendered
+    monkeypatch.setattr(metrics, "_registry", [])
+
+
+def check_format(text):
+    assert text.endswith("\n")
+    for line in text.splitlines():
+        if line.startswith("#"):
+            assert re.fullmatch(r"# (HELP|TYPE) [a-zA-Z_:][a-zA-Z0-9_:]* .+", line), line
+        else:
+            assert SAMPLE.fullmatch(line), line
+
+
+def test_counter_with_labels(registry):
+    counter = Counter("events_total", "Events by stream", ("stream", "event"))
+    counter.labels("rtls", "update").inc()
+    counter.labels(stream="rtls", event="update").inc(2)
+    counter.labels("machine", "status").inc(0.5)
+    text = render()
+    check_format(text)
+    assert text == (
+        "# HELP events_total Events by stream\n"
+        "# TYPE events_total counter\n"
+        'events_total{stream="rtls",event="update"} 3\n'
+        'events_total{stream="machine",event="status"} 0.5\n'
+    )
+
+
+def test_label_values_are_escaped(registry):
+    counter = Counter("escaped_total", "Escaping", ("path",))
+    counter.labels('C:\\data\n"rtls".json').inc()
+    text = render()
+    check_format(text)
+    assert 'escaped_total{path="C:\\\\data\\n\\"rtls\\".json"} 1' in text.splitlines()
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    histogram = Histogram("load_seconds", "Load time", ("file",), buckets=(0.1, 1))
+    child = histogram.labels("rtls.json")
+    for value in (0.05, 0.1, 0.5, 3):
+        child.observe(value)
+    text = render()
+    check_format(text)
+    assert text.splitlines()[2:] == [
+        'load_seconds_bucket{file="rtls.json",le="0.1"} 2',
+        'load_seconds_bucket{file="rtls.json",le="1"} 3',
+        'load_seconds_bucket{file="rtls.json",le="+Inf"} 4',
+        'load_seconds_sum{file="rtls.json"} 3.65',
+        'load_seconds_count{file="rtls.json"} 4',
+    ]
+    assert "# TYPE load_seconds histogram" in text
+
+
+def test_histogram_timer(registry):
+    histogram = Histogram("work_seconds", "Work", buckets=(10,))
+    with histogram.time():
+        pass
+    child = histogram.labels()
+    assert child.count == 1 and 0 <= child.sum < 10 and child.counts == [1, 0]
+    check_format(render())
+
+
+def test_gauges(registry):
+    Gauge("depth", "Queue depth", lambda: 3)
+    Gauge("rows_total", "Rows by outcome", lambda: {("live", "accepted"): 5, ("live", "rejected"): 0},
+          ("buffer", "outcome"), kind="counter")
+    Gauge("broken", "Raises", lambda: 1 / 0)
+    Gauge("absent", "Nothing to report", lambda: None)
+    updated = Gauge("connections", "Open connections")
+    updated.inc(3)
+    updated.dec()
+    text = render()
+    check_format(text)
+    assert text.splitlines() == [
+        "# HELP depth Queue depth", "# TYPE depth gauge", "depth 3",
+        "# HELP rows_total Rows by outcome", "# TYPE rows_total counter",
+        'rows_total{buffer="live",outcome="accepted"} 5', 'rows_total{buffer="live",outcome="rejected"} 0',
+        # A failing callback drops only its own metric; None still gets a header
+        "# HELP absent Nothing to report", "# TYPE absent gauge",
+        "# HELP connections Open connections", "# TYPE connections gauge", "connections 2",
+    ]
+
+
+def test_app_metrics_endpoint():
+    app = pytest.importorskip("app")
+    response = app.app.test_client().get("/metrics")
+    assert response.status_code == 200 and response.headers["Content-Type"] == metrics.CONTENT_TYPE
+    text = response.get_data(as_text=True)
+    check_format(text)
+    assert "# TYPE sse_events_published_total counter" in text and "# TYPE file_load_seconds histogram" in text
@@ -0,0 +1,43 @@
+"""Following MODEL_DIR/ACTIVE and dropping predictions across a model swap."""
+import os
+
+from model_registry import ModelRegistry, ACTIVE_FILE
+from prediction_cache import PredictionCache
+
+FEATURES_COL = ["volt", "rotate"]
+
+
+def write(path, text):
+    with open(path, "w") as file:
+        file.write(text)
+
+
+def test_broken_active_version_is_not_retried_until_it_changes(tmp_path):
+    write(tmp_path / "broken.pkl", "not a pickle")
+    write(tmp_path / ACTIVE_FILE, "broken.pkl\n")
+    registry = ModelRegistry(str(tmp_path), FEATURES_COL)
+    registry.load_initial()
+    assert registry.active is None and registry.failed == 1
+    for _ in range(3):
+        registry.scan()
+    assert registry.failed == 1
+
+    # A new copy of the file is tried again
+    os.utime(tmp_path / "broken.pkl", (1, 1))
+    registry.scan()
+    assert registry.failed == 2
+    registry.scan()
+    assert registry.failed == 2
+
+
+def test_prediction_from_before_a_swap_is_not_cached():
+    cache = PredictionCache(FEATURES_COL)
+    row = {"volt": 170.0, "rotate": 446.0}
+    generation = cache.generation
+    # The model is swapped while the row is being scored
+    cache.clear()
+    cache.put(cache.key(row), 100.0, generation)
+    assert cache.get(cache.key(row)) is None and cache.stats()["stale"] == 1
+
+    cache.put(cache.key(row), 90.0, cache.generation)
+    assert cache.get(cache.key(row)) == 90.0
@@ -0,0 +1,177 @@
+"""notifications.Dispatcher against StubTransport, with the queue file in tmp_path."""
+import time
+import queue
+import threading
+
+import pytest
+
+from notifications import Dispatcher, AlertStore, StubTransport, PENDING, SENDING, FAILED
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "notifications.db")
+
+
+@pytest.fixture
+def dispatchers():
+    started = []
+    yield started
+    for dispatcher in started:
+        dispatcher.close()
+
+
+def wait_until(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_notify_does_not_wait_for_the_provider(path, dispatchers):
+    dispatcher = Dispatcher(StubTransport(latency=0.2), path, batch_window=0)
+    dispatchers.append(dispatcher)
+    dispatcher.start()
+    start = time.perf_counter()
+    for i in range(5):
+        dispatcher.notify("+15550001", ("zone", i), f"alert {i}")
+    assert time.perf_counter() - start < 0.2
+    assert dispatcher.wait_idle()
+
+
+def test_cooldown_suppresses_repeats(path, dispatchers):
+    stub = StubTransport()
+    dispatcher = Dispatcher(stub, path, batch_window=0)
+    dispatchers.append(dispatcher)
+    assert dispatcher.notify("+15550001", ("zone", 0), "alert 0")
+    assert not dispatcher.notify("+15550001", ("zone", 0), "alert 0 again")
+    assert dispatcher.notify("+15550002", ("zone", 0), "alert for someone else")
+    assert dispatcher.wait_idle()
+    assert sorted(stub.sent) == [("+15550001", "alert 0"), ("+15550002", "alert for someone else")]
+    assert dispatcher.suppressed == 1
+
+
+class FullQueue(queue.Queue):
+    def put_nowait(self, item):
+        raise queue.Full
+
+
+def test_alert_dropped_on_a_full_queue_is_not_in_the_cooldown(path, dispatchers):
+    stub = StubTransport()
+    dispatcher = Dispatcher(stub, path, batch_window=0)
+    dispatchers.append(dispatcher)
+    dispatcher._incoming = FullQueue()
+    assert not dispatcher.notify("+15550001", ("zone", 0), "alert 0")
+    assert (dispatcher.dropped, dispatcher.queued, dispatcher.suppressed) == (1, 0, 0)
+    # Room again: the same alert goes through instead of being suppressed for the cooldown
+    dispatcher._incoming = queue.Queue()
+    assert dispatcher.notify("+15550001", ("zone", 0), "alert 0")
+    assert dispatcher.wait_idle()
+    assert stub.sent == [("+15550001", "alert 0")] and dispatcher.suppressed == 0
+
+
+def test_queued_count_is_exact_under_concurrent_notify(path, dispatchers):
+    dispatcher = Dispatcher(StubTransport(), path, batch_window=0, queue_size=100000)
+    dispatchers.append(dispatcher)
+
+    def notify(thread):
+        for i in range(500):
+            dispatcher.notify("+15550001", ("zone", thread, i), f"alert {thread}/{i}")
+
+    threads = [threading.Thread(target=notify, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert dispatcher.queued == 4000
+    assert dispatcher.wait_idle(30) and dispatcher.sent == 4000
+
+
+def test_alerts_within_the_window_are_batched(path, dispatchers):
+    stub = StubTransport()
+    dispatcher = Dispatcher(stub, path, batch_window=0.2)
+    dispatchers.append(dispatcher)
+    for i in range(3):
+        dispatcher.notify("+15550001", ("zone", i), f"alert {i}")
+    assert dispatcher.wait_idle()
+    assert stub.sent == [("+15550001", "3 alerts:\nalert 0\nalert 1\nalert 2")]
+    assert dispatcher.batches == 1 and dispatcher.sent == 3
+
+
+def test_failed_sends_are_retried_with_backoff(path, dispatchers):
+    stub = StubTransport(failures=2)
+    dispatcher = Dispatcher(stub, path, batch_window=0, backoff=0.05)
+    dispatchers.append(dispatcher)
+    dispatcher.notify("+15550001", ("zone", 0), "alert 0")
+    assert dispatcher.wait_idle()
+    assert stub.attempts == 3 and stub.sent == [("+15550001", "alert 0")]
+    assert dispatcher.retried == 2 and dispatcher.failed == 0
+
+
+def test_alerts_are_given_up_after_max_attempts(path, dispatchers):
+    dispatcher = Dispatcher(StubTransport(failures=10 ** 6), path, batch_window=0, backoff=0.01, max_attempts=3)
+    dispatchers.append(dispatcher)
+    dispatcher.notify("+15550001", ("zone", 0), "alert 0")
+    assert dispatcher.wait_idle()
+    assert dispatcher.failed == 1 and dispatcher.transport.attempts == 3
+    assert dispatcher.store.counts() == {FAILED: 1}
+
+
+def test_pending_alerts_survive_a_restart(path, dispatchers):
+    # Provider down: the alert stays in the queue file
+    dispatcher = Dispatcher(StubTransport(failures=10 ** 6), path, batch_window=0, backoff=0.2)
+    dispatcher.notify("+15550003", ("maintenance", 49), "machine 49 breakdown")
+    assert wait_until(lambda: dispatcher.retried == 1)
+    dispatcher.close()
+
+    stub = StubTransport()
+    dispatcher = Dispatcher(stub, path, batch_window=0, backoff=0.05)
+    dispatchers.append(dispatcher)
+    dispatcher.start()
+    assert dispatcher.wait_idle()
+    assert stub.sent == [("+15550003", "machine 49 breakdown")]
+
+
+def test_dispatchers_sharing_a_file_send_an_alert_once(path, dispatchers):
+    # Two workers raising the same alert: the cooldown in the file lets only one through
+    stub = StubTransport()
+    first = Dispatcher(stub, path, batch_window=0.1)
+    second = Dispatcher(stub, path, batch_window=0.1)
+    dispatchers.extend([first, second])
+    assert first.notify("+15550001", ("zone", 7), "alert 7")
+    assert second.notify("+15550001", ("zone", 7), "alert 7")
+    second.notify("+15550001", ("zone", 8), "alert 8")
+    # Either store may send what the other one queued
+    assert wait_until(lambda: first.sent + second.sent == 2)
+    time.sleep(0.2)
+    assert first.suppressed + second.suppressed == 1
+    assert sorted(text for _, text in stub.sent) in (["2 alerts:\nalert 7\nalert 8"], ["alert 7", "alert 8"])
+
+
+def test_opening_a_store_keeps_alerts_another_store_is_sending(path):
+    sender = AlertStore(path)
+    sender.add([("+15550001", ("zone", 0), "alert 0", time.time())], time.time())
+    assert len(sender.take_due(time.time())) == 1
+    other = AlertStore(path)
+    assert other.recover() == 0
+    assert other.counts() == {SENDING: 1}
+    sender.close()
+    other.close()
+
+
+def test_alerts_of_a_closed_or_expired_store_are_sent_again(path):
+    now = time.time()
+    sender = AlertStore(path)
+    sender.add([("+15550001", ("zone", 0), "alert 0", now), ("+15550001", ("zone", 1), "alert 1", now)], now)
+    assert len(sender.take_due(now)) == 2
+    other = AlertStore(path)
+    # No heartbeat within the lease
+    assert other.recover(lease=0) == 2
+    assert other.counts() == {PENDING: 2}
+
+    assert len(sender.take_due(time.time())) == 2
+    sender.close()
+    assert other.recover() == 2
+    other.close()
@@ -0,0 +1,103 @@
+"""Incremental JSON array / NDJSON reading, with records and strings split across chunk boundaries."""
+import json
+
+import pytest
+
+from record_reader import RecordReader, iter_records
+
+RECORDS = [
+    {"ClientMacAddr": "aa:00", "lat": 51.4601, "lng": -0.9341, "note": 'say "hi" ]} [{'},
+    {"ClientMacAddr": "aa:01", "path": "C:\\floor\\\"1\"", "tags": [[1, 2], {"]": "["}]},
+    12345678,
+    "a \\\" ] string",
+    {"unicode": "caf\u00e9 \u2603", "empty": {}, "list": []},
+]
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def read(path, chunk_size):
+    with RecordReader(path, chunk_size=chunk_size) as reader:
+        return list(reader)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7, 64])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_array_split_across_chunks(tmp_path, chunk_size, indent):
+    text = json.dumps(RECORDS, indent=indent)
+    path = write(tmp_path, "records.json", text)
+    pairs = read(path, chunk_size)
+    assert [record for record, _ in pairs] == RECORDS
+    offsets = [offset for _, offset in pairs]
+    assert offsets == sorted(offsets) and offsets[-1] < len(text)
+
+
+def test_offsets_point_at_the_end_of_each_record(tmp_path):
+    text = " [ " + " , ".join(json.dumps(record) for record in RECORDS) + " ] \n"
+    path = write(tmp_path, "records.json", text)
+    for record, offset in read(path, 3):
+        assert text[:offset].endswith(json.dumps(record))
+
+
+def test_ndjson_skips_blank_lines(tmp_path):
+    text = "\n" + "\n\n".join(json.dumps(record) for record in RECORDS) + "\n  \n"
+    path = write(tmp_path, "records.ndjson", text)
+    pairs = read(path, 2)
+    assert [record for record, _ in pairs] == RECORDS
+    assert pairs[-1][1] == len(text) - len("  \n")
+
+
+@pytest.mark.parametrize("text", ["[]", "  [ \n ]  \n"])
+def test_empty_array(tmp_path, text):
+    assert read(write(tmp_path, "empty.json", text), 1) == []
+
+
+def test_batches(tmp_path):
+    path = write(tmp_path, "records.json", json.dumps(RECORDS))
+    with RecordReader(path, chunk_size=4) as reader:
+        assert [len(batch) for batch in reader.batches(2)] == [2, 2, 1]
+    assert list(iter_records(path)) == RECORDS
+
+
+@pytest.mark.parametrize("text, message", [
+    ("", "Expected a JSON array"),
+    ("  \n", "Expected a JSON array"),
+    ('{"a": 1}', "Expected a JSON array"),
+    ("[", "Unterminated JSON array"),
+    ('[{"a": 1}', "Unterminated JSON array"),
+    ('[{"a": 1},', "Unterminated JSON array"),
+    ('[{"a": 1}, {"b"', "Expecting"),
+    ('[{"a": "unterminated', "Unterminated string"),
+    ("[1, 2", "Unterminated JSON array"),
+    ("[1 2]", "Expected ',' or ']'"),
+    ("[1,]", "Expected a record after ','"),
+    ("[1,,2]", "Expecting value"),
+    ("[1] x", "Extra data"),
+    ("[1]\n\n[2]", "Extra data"),
+])
+@pytest.mark.parametrize("chunk_size", [1, 4, 64])
+def test_malformed_or_truncated_input_raises(tmp_path, text, message, chunk_size):
+    path = write(tmp_path, "bad.json", text)
+    with pytest.raises(json.JSONDecodeError, match=message):
+        read(path, chunk_size)
+
+
+def test_truncated_file_raises_after_the_complete_records(tmp_path):
+    text = json.dumps(RECORDS)
+    path = write(tmp_path, "cut.json", text[:text.index('"tags"')])
+    yielded = []
+    with pytest.raises(json.JSONDecodeError):
+        with RecordReader(path, chunk_size=5) as reader:
+            for record, _ in reader:
+                yielded.append(record)
+    assert yielded == RECORDS[:1]
+
+
+def test_ndjson_error_names_the_line(tmp_path):
+    path = write(tmp_path, "bad.jsonl", '{"a": 1}\n\n{"b": \n')
+    with pytest.raises(json.JSONDecodeError, match="line 3 of"):
+        read(path, 64)
@@ -0,0 +1,64 @@
+"""Registry indexes and hot reload of the employee file."""
+import os
+import json
+
+import pytest
+
+from registry import Registry
+
+MACHINES = [
+    {"machine_id": 49, "mac_address": "28:3a:4d:31:a1:8d", "company": "SamSung", "floor": "Ground Floor"},
+    {"machine_id": 41, "mac_address": "9c:b6:d0:bc:4b:c1", "company": "Nividia", "floor": "Ground Floor"},
+]
+EMPLOYEES = [
+    {"mac_address": "aa:00", "name": "Tim", "company": "Apple", "floor": "Ground Floor", "role": "mechanic"},
+    {"mac_address": "aa:01", "name": "Ann", "company": "Apple", "floor": "1st Floor", "role": "mechanic"},
+    {"mac_address": "aa:02", "name": "Bo", "company": "Samsung", "floor": "Ground Floor", "role": "logistics"},
+]
+
+
+def write_employees(path, employees, mtime=None):
+    with open(path, "w") as file:
+        json.dump(employees, file)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def employee_file(tmp_path):
+    path = str(tmp_path / "employees_registry_test.json")
+    write_employees(path, EMPLOYEES, mtime=1_000_000)
+    return path
+
+
+def test_lookups_and_filters(employee_file):
+    registry = Registry(employee_file, MACHINES)
+    assert registry.employee("aa:01")["name"] == "Ann"
+    assert registry.employee("ff:ff") is None
+    assert registry.machine(49)["mac_address"] == "28:3a:4d:31:a1:8d"
+    assert registry.machine_by_mac("9c:b6:d0:bc:4b:c1")["machine_id"] == 41
+    assert [e["name"] for e in registry.employees(company="Apple", role="mechanic")] == ["Tim", "Ann"]
+    assert [e["name"] for e in registry.employees(company="Apple", floor="Ground Floor")] == ["Tim"]
+    assert registry.employees(company="Intel") == []
+    assert len(registry.employees()) == 3
+    assert [m["machine_id"] for m in registry.machines(company="Nividia")] == [41]
+
+
+def test_reload_picks_up_a_changed_file(employee_file):
+    registry = Registry(employee_file, MACHINES)
+    assert not registry.reload_if_changed()
+    write_employees(employee_file, EMPLOYEES + [{"mac_address": "aa:03", "name": "Cy", "company": "Nvidia",
+                                                 "floor": "Ground Floor", "role": "mechanic"}], mtime=2_000_000)
+    assert registry.reload_if_changed()
+    assert registry.employee("aa:03")["name"] == "Cy"
+    assert [e["name"] for e in registry.employees(role="mechanic")] == ["Tim", "Ann", "Cy"]
+
+
+def test_failed_reload_keeps_the_previous_snapshot(employee_file):
+    registry = Registry(employee_file, MACHINES)
+    snapshot = registry.snapshot
+    with open(employee_file, "w") as file:
+        file.write('[{"mac_address": "aa:09", ')
+    os.utime(employee_file, (3_000_000, 3_000_000))
+    assert not registry.reload()
+    assert registry.snapshot is snapshot and registry.employee("aa:00")["name"] == "Tim"
@@ -0,0 +1,77 @@
+"""Replay pacing against a fake monotonic clock."""
+import datetime
+
+import pytest
+
+from replay import ReplayScheduler, MAX_SPEED, SPEED_LIMIT, parse_speed, record_time
+
+
+class FakeClock:
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_speed_scales_recorded_gaps():
+    clock = FakeClock()
+    scheduler = ReplayScheduler(speed=10, clock=clock)
+    assert [scheduler.delay(t) for t in (1000, 1010, 1030)] == [0.0, 1.0, 3.0]
+
+
+def test_delays_follow_the_absolute_timeline():
+    clock = FakeClock()
+    scheduler = ReplayScheduler(speed=2, clock=clock)
+    assert scheduler.delay(0) == 0.0
+    assert scheduler.delay(4) == 2.0
+    # Overslept by 0.5 s: the next record's wait is shortened, not added on top
+    clock.now += 2.5
+    assert scheduler.delay(8) == pytest.approx(1.5)
+    # A send so slow that the next record is already overdue
+    clock.now += 10
+    assert scheduler.delay(10) == 0.0
+    assert scheduler.delay(30) == pytest.approx(2.5)
+
+
+def test_backwards_and_missing_times_are_due_immediately():
+    clock = FakeClock()
+    scheduler = ReplayScheduler(speed=1, clock=clock)
+    scheduler.delay(50)
+    assert scheduler.delay(60) == 10.0
+    assert scheduler.delay(55) == 10.0   # no earlier than the record before it
+    assert scheduler.delay(None) == 10.0
+    # The timeline carries on from the latest time seen, not the record that went back
+    assert scheduler.delay(61) == 11.0
+
+
+def test_long_gaps_are_capped():
+    clock = FakeClock()
+    scheduler = ReplayScheduler(speed=1, max_gap=5, clock=clock)
+    assert [scheduler.delay(t) for t in (0, 3, 3 + 86400, 3 + 86401)] == [0.0, 3.0, 8.0, 9.0]
+
+
+def test_max_speed_never_waits():
+    scheduler = ReplayScheduler(speed=MAX_SPEED, clock=FakeClock())
+    assert [scheduler.delay(t) for t in (0, 100, 10000)] == [0.0, 0.0, 0.0]
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, None), ("", None), ("max", MAX_SPEED), ("MAX", MAX_SPEED), ("10", 10.0), ("2.5x", 2.5), (str(SPEED_LIMIT), SPEED_LIMIT),
+])
+def test_parse_speed(value, expected):
+    assert parse_speed(value) == expected
+
+
+@pytest.mark.parametrize("value", ["0", "-1", "fast", str(SPEED_LIMIT + 1), "nan"])
+def test_parse_speed_rejects(value):
+    with pytest.raises(ValueError):
+        parse_speed(value)
+
+
+def test_record_time():
+    assert record_time({"timestamp": 1_700_000_000_500}) == 1_700_000_000.5
+    localtime = "2024-03-01T12:00:30"
+    assert record_time({"localtime": localtime}) == datetime.datetime.fromisoformat(localtime).timestamp()
+    assert record_time({"localtime": "yesterday"}) is None
+    assert record_time({}) is None
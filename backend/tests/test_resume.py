@@ -0,0 +1,104 @@
+"""Last-Event-ID resume: the backlog hands over to live events without a gap, stale ids resync."""
+import threading
+
+from broadcaster import Hub
+from frames import FrameCoalescer
+
+
+def update(n):
+    return f"event: update\ndata: {{\"n\": {n}}}\n\n"
+
+
+def event_id(message):
+    return int(message.split("\n", 1)[0][len("id: "):])
+
+
+def event(message):
+    return message.split("\n", 2)[1]
+
+
+def drain(sub):
+    messages = []
+    while (message := sub.get(timeout=0)) is not None:
+        messages.append(message)
+    return messages
+
+
+def test_backlog_hands_over_to_live_events_while_publishing():
+    for attempt in range(10):
+        hub = Hub("test", None, maxsize=100000, log_size=100000)
+        first = hub.last_event_id
+        publishing = threading.Event()
+
+        def publish():
+            for n in range(20000):
+                hub.publish(None, update(n))
+                if n == 1000:
+                    publishing.set()
+
+        publisher = threading.Thread(target=publish)
+        publisher.start()
+        assert publishing.wait(10)
+        # Resume from an id that is already in the log while events keep coming
+        resume_from = hub.last_event_id - 500
+        sub = hub.subscribe(last_event_id=resume_from)
+        publisher.join(10)
+        ids = [event_id(message) for message in drain(sub)]
+        assert ids == list(range(resume_from + 1, first + 20001)), f"attempt {attempt}"
+
+
+def test_resume_from_the_oldest_logged_event():
+    hub = Hub("test", None, log_size=5)
+    for n in range(20):
+        hub.publish(None, update(n))
+    # The event just before the log's first one is the earliest id that still resumes without a gap
+    oldest = hub.last_event_id - 5
+    assert [event_id(message) for message in drain(hub.subscribe(last_event_id=oldest))] == list(range(oldest + 1, oldest + 6))
+
+
+def test_current_id_has_no_backlog():
+    hub = Hub("test", None)
+    hub.publish(None, update(0))
+    sub = hub.subscribe(last_event_id=hub.last_event_id)
+    assert drain(sub) == []
+    hub.publish(None, update(1))
+    assert [event_id(message) for message in drain(sub)] == [hub.last_event_id]
+
+
+def resync_hub():
+    hub = Hub("test", None, log_size=5, frames=FrameCoalescer(), frame_rate=0.001)
+    for n in range(20):
+        hub.frames.offer("aa:00", {"location": [51.46 + n / 100, -0.93]})
+        hub.publish("aa:00", update(n))
+    return hub
+
+
+def assert_resynced(hub, sub):
+    snapshot, = drain(sub)
+    assert event(snapshot) == "event: snapshot" and event_id(snapshot) == hub.last_event_id
+    assert '"location":[51.65,-0.93]' in snapshot
+    # Live events continue from the snapshot's id
+    hub.publish("aa:00", update(20))
+    assert [event_id(message) for message in drain(sub)] == [event_id(snapshot) + 1]
+
+
+def test_expired_id_resyncs():
+    hub = resync_hub()
+    assert_resynced(hub, hub.subscribe(last_event_id=hub.last_event_id - 10))
+
+
+def test_unknown_id_resyncs():
+    hub = resync_hub()
+    assert_resynced(hub, hub.subscribe(last_event_id=hub.last_event_id + 1000))
+    # An id from before the hub existed, e.g. from the previous server process
+    fresh = Hub("test", None, frames=FrameCoalescer(), frame_rate=0.001)
+    messages = drain(fresh.subscribe(last_event_id=fresh.last_event_id - 1))
+    assert [event(message) for message in messages] == ["event: snapshot"]
+
+
+def test_expired_id_without_frames_gets_the_whole_log():
+    hub = Hub("test", None, log_size=5)
+    for n in range(20):
+        hub.publish(None, update(n))
+    ids = [event_id(message) for message in drain(hub.subscribe(last_event_id=hub.last_event_id - 10))]
+    assert ids == list(range(hub.last_event_id - 4, hub.last_event_id + 1))
@@ -0,0 +1,74 @@
+"""Event encoding: compact JSON, cached timestamps and pre-encoded fragments."""
+import re
+import json
+import datetime
+
+import pytest
+
+import serialization
+from serialization import dumps, sse_event, utc_timestamp, Fragments
+
+VALUES = [
+    {"mac_address": "aa:00", "name": "Zoë \"Z\" O'Neil", "location": [51.4604664733, -0.9325601792]},
+    {"nested": {"a": [1, 2.5, None, True, False]}, "empty": {}, "list": []},
+    "caf\u00e9 \u2603 \\ \n",
+    [0, -1, 1e-7, 12345678901234],
+]
+
+
+@pytest.mark.parametrize("value", VALUES)
+def test_dumps_round_trips_without_whitespace(value):
+    encoded = dumps(value)
+    assert json.loads(encoded) == value
+    # No padding: never longer than json with compact separators (orjson leaves non-ASCII unescaped)
+    assert len(encoded) <= len(json.dumps(value, separators=(",", ":")))
+
+
+def test_sse_event():
+    assert sse_event("update", {"a": 1}) == 'event: update\ndata: {"a":1}\n\n'
+
+
+def test_utc_timestamp_is_formatted_once_per_millisecond(monkeypatch):
+    now_ns = 1_700_000_000_123_456_789
+    monkeypatch.setattr(serialization.time, "time_ns", lambda: now_ns)
+    first = utc_timestamp()
+    assert first == "2023-11-14T22:13:20.123"
+    assert utc_timestamp() is first
+    now_ns += 1_000_000
+    assert utc_timestamp() == "2023-11-14T22:13:20.124"
+
+
+def test_utc_timestamp_is_now():
+    before = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    stamp = utc_timestamp()
+    assert re.fullmatch(r"\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d\.\d{3}", stamp)
+    assert abs(datetime.datetime.fromisoformat(stamp) - before) < datetime.timedelta(seconds=1)
+
+
+def test_fragments_are_cached_per_record_object():
+    fragments = Fragments()
+    calls = []
+
+    def build(record):
+        calls.append(record)
+        return {"name": record["name"], "company": record["company"]}
+
+    record = {"name": "Tim \"T\"", "company": "Apple"}
+    prefix = fragments.get("aa:00", record, build)
+    assert fragments.get("aa:00", record, build) is prefix and len(calls) == 1
+    assert json.loads(prefix + '"location":[1,2]}') == {"name": "Tim \"T\"", "company": "Apple", "location": [1, 2]}
+    # A registry reload creates new records, which are encoded again
+    reloaded = {"name": "Tim", "company": "Nvidia"}
+    assert json.loads(fragments.get("aa:00", reloaded, build) + '"x":1}') == {"name": "Tim", "company": "Nvidia", "x": 1}
+    assert len(calls) == 2 and len(fragments) == 1
+    assert fragments.get("aa:01", record, lambda r: {}) + '"x":1}' == '{"x":1}'
+
+
+def test_update_event_matches_the_plain_dict_encoding():
+    app = pytest.importorskip("app")
+    employee = app.registry.employees()[0]
+    row = {"ClientMacAddr": employee["mac_address"], "lat": 51.4604664733, "lng": -0.9325601792}
+    (key, message), = app.rtls_events(row, zone_company=None, notify=False)
+    assert key == employee["mac_address"] and message.startswith("event: update\ndata: ")
+    payload = json.loads(message[len("event: update\ndata: "):])
+    assert payload == {**app.employee_members(employee), "location": [row["lat"], row["lng"]], "timestamp": payload["timestamp"]}
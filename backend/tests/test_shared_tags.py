@@ -0,0 +1,75 @@
+"""Shared tag table: changes since a sequence number, and rows for MACs added after the fork."""
+import json
+import multiprocessing
+
+import pytest
+
+from registry import Registry
+from shared_tags import SharedTagTable
+
+EMPLOYEES = [
+    {"mac_address": "aa:00", "name": "Tim", "company": "Apple", "floor": "Ground Floor", "role": "mechanic"},
+    {"mac_address": "aa:01", "name": "Ann", "company": "Samsung", "floor": "Ground Floor", "role": "mechanic"},
+]
+NEW_EMPLOYEE = {"mac_address": "aa:02", "name": "Bo", "company": "Nvidia", "floor": "1st Floor", "role": "logistics"}
+
+
+@pytest.fixture
+def registry(tmp_path):
+    path = tmp_path / "employees.json"
+    path.write_text(json.dumps(EMPLOYEES))
+    return Registry(str(path), [])
+
+
+def add_employee(registry, employee):
+    """Rewrite the employee file with one more employee and hot reload it."""
+    with open(registry.employee_file, "w") as file:
+        json.dump(EMPLOYEES + [employee], file)
+    assert registry.reload()
+
+
+def test_changes_after_a_sequence_number():
+    table = SharedTagTable(["aa:00", "aa:01"], ["Apple", "Samsung"], spare=0)
+    assert table.changes(0) == (0, [])
+    assert table.write(["aa:00", "ff:ff"], [51.46, 1.0], [-0.93, 1.0], ["Samsung", None]).tolist() == [1]
+    seq, changes = table.changes(0)
+    assert seq == 1 and changes == [("aa:00", 51.46, -0.93, "Samsung")]
+    table.write(["aa:01", "aa:00"], [51.47, 51.48], [-0.94, -0.95], [None, "Intel"])
+    assert table.changes(seq) == (2, [("aa:00", 51.48, -0.95, None), ("aa:01", 51.47, -0.94, None)])
+
+
+def test_mac_added_by_a_registry_reload_gets_a_row(registry):
+    table = SharedTagTable.for_registry(registry, spare=4)
+    assert len(table) == 2
+    # Not in the registry (yet): no row, the ingesting worker streams it itself
+    assert table.write(["aa:02", "ee:ee"], [51.46, 51.46], [-0.93, -0.93], [None, None]).tolist() == [0, 1]
+    add_employee(registry, NEW_EMPLOYEE)
+    assert table.write(["aa:02", "ee:ee"], [51.46, 51.46], [-0.93, -0.93], [None, None]).tolist() == [1]
+    assert len(table) == 3
+    assert table.changes(0)[1] == [("aa:02", 51.46, -0.93, None)]
+
+
+def write_new_mac(table, registry):
+    add_employee(registry, NEW_EMPLOYEE)
+    table.write(["aa:02"], [51.47], [-0.94], ["Apple"])
+
+
+def test_row_assigned_in_another_process_is_read_with_its_mac(registry):
+    table = SharedTagTable.for_registry(registry, companies=["Apple"], spare=4)
+    # The child reloads its own copy of the registry, like a worker would
+    child = multiprocessing.get_context("fork").Process(target=write_new_mac, args=(table, registry))
+    child.start()
+    child.join(10)
+    assert child.exitcode == 0
+    assert table.changes(0) == (1, [("aa:02", 51.47, -0.94, "Apple")])
+    # This process can write the row the child assigned
+    table.write(["aa:02"], [51.48], [-0.95], [None])
+    assert len(table) == 3 and table.changes(1) == (2, [("aa:02", 51.48, -0.95, None)])
+
+
+def test_full_table_reports_new_macs(caplog):
+    table = SharedTagTable(["aa:00"], [], spare=1)
+    assert table.write(["aa:01", "aa:02", "aa:00"], [1, 2, 3], [1, 2, 3], [None] * 3).tolist() == [1]
+    assert table.write(["aa:03"], [1], [1], [None]).tolist() == [0]
+    assert [mac for mac, *_ in table.changes(0)[1]] == ["aa:00", "aa:01"]
+    assert sum("Shared tag table is full" in message for message in caplog.messages) == 1
@@ -0,0 +1,23 @@
+"""Import-time budget of the app modules, measured with python -X importtime in a fresh interpreter."""
+import os
+
+import pytest
+
+from benchmarks import import_times, IMPORT_BUDGET_MS, DEFERRED_MODULES
+
+
+@pytest.fixture(scope="module", params=["app", "asgi_app"])
+def imported(request, tmp_path_factory):
+    # An empty MODEL_DIR, so the registry's loader thread does not import joblib/xgboost during the measurement
+    env = {**os.environ, "LOG_LEVEL": "WARNING", "MODEL_DIR": str(tmp_path_factory.mktemp("models"))}
+    return request.param, import_times(request.param, env)
+
+
+def test_import_within_budget(imported):
+    module, times = imported
+    assert times[module] / 1000 < IMPORT_BUDGET_MS
+
+
+def test_heavy_modules_are_not_imported(imported):
+    _, times = imported
+    assert sorted({name.split(".")[0] for name in times} & set(DEFERRED_MODULES)) == []
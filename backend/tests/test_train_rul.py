@@ -0,0 +1,92 @@
+"""Out-of-core RUL training on a small CSV: schema pass, splits, and the written model."""
+import os
+import json
+
+import numpy as np
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("xgboost")
+joblib = pytest.importorskip("joblib")
+
+import train_rul
+from train_rul import FEATURES, CYCLE_TO_HOUR_FACTOR, TEST, scan, chunk_matrix, read_chunks, split_ids, train
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    """RUL falls with time_in_cycles; a few rows have no RUL or no voltmean_24h, comp4 and DI are missing."""
+    rng = np.random.default_rng(0)
+    n = 3000
+    frame = pd.DataFrame({
+        "time_in_cycles": rng.integers(1, 300, n).astype(float),
+        "voltmean_24h": rng.normal(170, 5, n),
+        "rotatemean_24h": rng.normal(446, 20, n),
+        "error1": rng.integers(0, 3, n),
+        "comp1": rng.normal(50, 10, n),
+        "age": rng.integers(0, 20, n),
+        "model": rng.choice(["model3", "model1", "model4"], n),
+    })
+    frame["RUL"] = 300 - frame["time_in_cycles"]
+    frame.loc[:9, "RUL"] = np.nan
+    frame.loc[10:19, "voltmean_24h"] = np.nan
+    frame.loc[20:29, "model"] = None
+    path = tmp_path / "rul.csv"
+    frame.to_csv(path, index=False)
+    return str(path), frame
+
+
+def test_scan_fills_missing_values(csv_path):
+    path, frame = csv_path
+    schema = scan(path, chunk_rows=700)
+    labelled = frame[frame["RUL"].notna()]
+    assert schema["rows"] == len(labelled)
+    assert schema["model_categories"] == ["model1", "model3", "model4", "unknown"]
+    fill = schema["fill_values"]
+    assert fill["voltmean_24h"] == pytest.approx(labelled["voltmean_24h"].mean(), rel=1e-6)
+    # Absent columns: 0 where load_and_preprocess_data filled 0, missing otherwise
+    assert fill["comp4"] == 0.0 and fill["DI"] == 0.0 and fill["pressuremean_24h"] is None
+
+
+def test_chunk_matrix_follows_features_order(csv_path):
+    path, frame = csv_path
+    schema = scan(path)
+    chunk = next(read_chunks(path))
+    matrix, label = chunk_matrix(chunk, schema)
+    assert matrix.shape == (len(frame) - 10, len(FEATURES)) and matrix.dtype == np.float32
+    column = dict(zip(FEATURES, matrix.T))
+    assert np.array_equal(label, ((300 - frame["time_in_cycles"][10:]) * CYCLE_TO_HOUR_FACTOR).to_numpy(np.float32))
+    assert not np.isnan(column["voltmean_24h"]).any() and np.isnan(column["pressuremean_24h"]).all()
+    assert (column["comp4"] == 0).all()
+    models = np.array(schema["model_categories"])[column["model_encoded"].astype(int)]
+    assert models[:10].tolist() == frame["model"][10:20].tolist() and (models[10:20] == "unknown").all()
+
+
+def test_splits_are_stable_and_cover_every_fold():
+    splits = split_ids(3, 100_000, folds=5)
+    assert np.array_equal(splits, split_ids(3, 100_000, folds=5))
+    assert not np.array_equal(splits, split_ids(4, 100_000, folds=5))
+    assert set(np.unique(splits).tolist()) == {TEST, 0, 1, 2, 3, 4}
+    assert np.mean(splits == TEST) == pytest.approx(train_rul.TEST_SIZE, abs=0.01)
+
+
+@pytest.mark.parametrize("in_memory", [True, False])
+def test_train_writes_a_loadable_model(csv_path, tmp_path, in_memory):
+    path, frame = csv_path
+    output = str(tmp_path / "model" / "rul_model")
+    cache_dir = str(tmp_path / "cache")
+    manifest = train(path, output, folds=2, jobs=1, cache_dir=cache_dir, in_memory=in_memory, rounds=50)
+    assert len(manifest["cv_rmse_hours"]) == 2 and manifest["rows"] == len(frame) - 10
+    # RUL is a function of time_in_cycles, so the model has to learn it (the labels span 0..7000 hours)
+    assert manifest["test_rmse_hours"] < 200 and max(manifest["cv_rmse_hours"]) < 200
+    with open(output + ".manifest.json") as file:
+        assert json.load(file) == manifest
+    assert manifest["features"] == FEATURES and manifest["params"]["num_boost_round"] == 50
+    model = joblib.load(output + ".pkl")
+    matrix, label = chunk_matrix(next(read_chunks(path)), scan(path))
+    assert np.abs(model.predict(matrix) - label).mean() < 200
+    # The external-memory page cache is removed after training
+    if in_memory:
+        assert not os.path.exists(cache_dir)
+    else:
+        assert os.listdir(cache_dir) == []
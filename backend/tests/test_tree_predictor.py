@@ -0,0 +1,26 @@
+"""The inplace and NumPy backends give exactly model.predict's RUL, including rows with missing values."""
+import numpy as np
+import pytest
+
+from tree_predictor import make_predictor, parity_rows
+
+
+@pytest.fixture(scope="module")
+def matrix(rul_rows):
+    return parity_rows(*rul_rows)
+
+
+@pytest.fixture(scope="module")
+def expected(rul_model, matrix):
+    return rul_model.predict(matrix)
+
+
+@pytest.mark.parametrize("kind", ["inplace", "numpy"])
+def test_batch_matches_model(rul_model, matrix, expected, kind):
+    np.testing.assert_array_equal(np.asarray(make_predictor(rul_model, kind).predict(matrix)), expected)
+
+
+def test_numpy_single_rows_match_model(rul_model, matrix, expected):
+    # One row per call takes a different path through TreeEnsemble
+    ensemble = make_predictor(rul_model, "numpy")
+    np.testing.assert_array_equal(np.concatenate([ensemble.predict(row) for row in matrix]), expected)
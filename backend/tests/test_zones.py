@@ -0,0 +1,61 @@
+"""The offline filter (data_filter.py) and the stream agree on which rows are zone violations."""
+import numpy as np
+import pytest
+
+from zones import classify_zones, zone_violations, get_zone_company
+from geofence import load_geofences
+
+pd = pytest.importorskip("pandas")
+app = pytest.importorskip("app")
+data_filter = pytest.importorskip("data_filter")
+
+COMPANIES = {"aa:00": "Apple", "aa:01": "Samsung", "aa:02": "Nvidia", "aa:03": "Intel"}
+
+
+@pytest.fixture(params=["geofences", "thresholds"])
+def geofences(request, monkeypatch):
+    geofences = load_geofences("../data/geofences.json") if request.param == "geofences" else None
+    monkeypatch.setattr(app, "geofences", geofences)
+    return geofences
+
+
+@pytest.fixture
+def rows():
+    # Around the site and beyond the geofence polygons, which then classify as no zone
+    rng = np.random.default_rng(0)
+    macs = list(COMPANIES) + ["ff:ff"]
+    return pd.DataFrame({
+        "ClientMacAddr": rng.choice(macs, 2000),
+        "lat": rng.uniform(51.4585, 51.4625, 2000),
+        "lng": rng.uniform(-0.9355, -0.9300, 2000),
+        "level": rng.choice(["Ground Floor", "1st Floor"], 2000),
+    })
+
+
+def test_data_filter_matches_the_stream(rows, geofences):
+    mask = data_filter.wrong_zone_mask(rows, COMPANIES, geofences)
+    expected = []
+    for row in rows.to_dict("records"):
+        zone = app.locate_zone(row)
+        company = COMPANIES.get(row["ClientMacAddr"])
+        expected.append(company is not None and zone is not None and company != zone)
+    assert mask.tolist() == expected
+    assert 0 < mask.sum() < len(rows)
+
+
+def test_batch_classification_matches_one_row_at_a_time(rows, geofences):
+    records = rows.to_dict("records")
+    assert list(app.rtls_zones(records)) == [app.locate_zone(row) for row in records]
+
+
+def test_points_outside_every_polygon_are_not_violations():
+    geofences = load_geofences("../data/geofences.json")
+    zones = classify_zones(["Ground Floor", "Ground Floor"], [51.0, 51.4605], [-0.5, -0.934], geofences)
+    assert zones[0] is None and zones[1] == "Nvidia"
+    assert zone_violations(zones, ["Apple", "Apple"]).tolist() == [False, True]
+
+
+def test_thresholds_without_geofences():
+    lat, lng = [51.4600, 51.4610, 51.4600], [-0.934, -0.932, -0.932]
+    assert list(classify_zones(None, lat, lng)) == [get_zone_company(a, b) for a, b in zip(lat, lng)]
+    assert zone_violations(classify_zones(None, lat, lng), ["Nvidia", None, float("nan")]).tolist() == [False] * 3
@@ -11,6 +11,8 @@ export const StreamProvider = ({ children }) => {
   const [zoneViolations, setZoneViolations] = useState([]);
   const machineSourceRef = useRef(null);
   const rtlsSourceRef = useRef(null);
+  const lastMachineEventIdRef = useRef(null);
+  const rtlsTagsRef = useRef({}); // Latest tag state from compact RTLS frames
 
   console.log("StreamProvider initialized:", {
     zoneViolations,
@@ -75,13 +77,16 @@ export const StreamProvider = ({ children }) => {
   useEffect(() => {
     const connectMachineStream = (attempt = 1, maxAttempts = 5) => {
       console.log(`Connecting to machine stream, attempt ${attempt}`);
-      machineSourceRef.current = new EventSource("http://localhost:5000/stream/machine");
+      // Resume after the last event we saw instead of replaying from the start
+      const resume = lastMachineEventIdRef.current ? `?lastEventId=${lastMachineEventIdRef.current}` : "";
+      machineSourceRef.current = new EventSource(`http://localhost:5000/stream/machine${resume}`);
 
       machineSourceRef.current.onopen = () => {
         console.log("Machine EventSource connected");
       };
 
       machineSourceRef.current.addEventListener("machine", (event) => {
+        lastMachineEventIdRef.current = event.lastEventId;
         try {
           const data = JSON.parse(event.data);
           console.log("Machine status log:", {
@@ -100,6 +105,7 @@ export const StreamProvider = ({ children }) => {
       });
 
       machineSourceRef.current.addEventListener("maintenance", (event) => {
+        lastMachineEventIdRef.current = event.lastEventId;
         try {
           const data = JSON.parse(event.data);
           console.log("Maintenance notification:", data);
@@ -135,7 +141,8 @@ export const StreamProvider = ({ children }) => {
   useEffect(() => {
     const connectRtlsStream = (attempt = 1, maxAttempts = 5) => {
       console.log(`Connecting to RTLS stream, attempt ${attempt}`);
-      rtlsSourceRef.current = new EventSource("http://localhost:5000/stream/rtls");
+      // Compact mode: one snapshot, then coalesced frames carrying only changed fields
+      rtlsSourceRef.current = new EventSource("http://localhost:5000/stream/rtls?mode=compact");
 
       rtlsSourceRef.current.onopen = () => {
         console.log("RTLS EventSource connected");
@@ -157,6 +164,47 @@ export const StreamProvider = ({ children }) => {
         }
       });
 
+      // Merge a snapshot/frame into rtlsData; a tag whose zone_violation turns on is reported like a zone_violation event
+      const applyTags = (data, replace) => {
+        const prev = rtlsTagsRef.current;
+        const next = replace ? {} : { ...prev };
+        const violations = [];
+        Object.entries(data.tags).forEach(([mac, changes]) => {
+          const tag = { ...prev[mac], ...changes, mac_address: mac, timestamp: data.t };
+          if (tag.zone_violation && !(prev[mac] && prev[mac].zone_violation)) {
+            violations.push({
+              ...tag,
+              type: "zone_violation",
+              zone_company: tag.zone_violation,
+              message: `${tag.name} (${tag.company}) entered restricted zone (${tag.zone_violation})`
+            });
+          }
+          next[mac] = tag;
+        });
+        rtlsTagsRef.current = next;
+        setRtlsData(next);
+        if (violations.length > 0) {
+          setZoneViolations((prevViolations) => [...violations, ...prevViolations]);
+          setNotificationHistory((prevHistory) => [...violations, ...prevHistory]);
+        }
+      };
+
+      rtlsSourceRef.current.addEventListener("snapshot", (event) => {
+        try {
+          applyTags(JSON.parse(event.data), true);
+        } catch (error) {
+          console.error("Error parsing RTLS snapshot:", error);
+        }
+      });
+
+      rtlsSourceRef.current.addEventListener("frame", (event) => {
+        try {
+          applyTags(JSON.parse(event.data), false);
+        } catch (error) {
+          console.error("Error parsing RTLS frame:", error);
+        }
+      });
+
       // Updated RTLS stream handler in StreamProvider
       rtlsSourceRef.current.addEventListener("zone_violation", (event) => {
         try {